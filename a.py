@@ -4,18 +4,16 @@ import json
 import logging
 from datetime import datetime
 import threading
+import signal
 from flask import Flask, jsonify
 import os
 from dotenv import load_dotenv
-from nse2bot2 import poll_updates
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pandas as pd
+import lease
+from datetime import timezone
+import watchlist
+from cpr import cpr_band, PATTERN_THRESHOLDS
+from trading_calendar import IST
+# selenium, pandas and nse2bot2 are imported where they are used (fast restarts)
 
 
 
@@ -39,6 +37,9 @@ OANDA_URL = os.getenv('OANDA_URL')
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+# Overlapping instances (rolling deploys) share LEASE_BACKEND; only the holder sends
+elector = lease.from_env()
+
 # Track sent alerts to prevent duplicates
 sent_alerts = {}
 ALERT_EXPIRY = 1800  # 30 minutes in seconds
@@ -79,16 +80,22 @@ def mark_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type if level_type else ''}"
     sent_alerts[key] = time.time()
 
-def send_telegram_alert(message):
-    
+def send_telegram_alert(message, chat_id=None):
+    # Only the lease holder sends; a standby keeps the alert for a bar and sends
+    # it if it takes over before the old leader recorded it (see lease.py)
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    if not elector.deliver(lease.alert_key(chat_id, message), lambda: _post_telegram(message, chat_id)):
+        print("Standby replica; holding alert")
+
+def _post_telegram(message, chat_id):
     try:
         if not message or not message.strip():
             #logger.error("Cannot send empty message to Telegram")
-            return
+            return False
         print(message,'messagepassss!')        
         url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
         payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
+            "chat_id": chat_id,
             "text": message,
             "parse_mode": "HTML"
         }
@@ -97,14 +104,16 @@ def send_telegram_alert(message):
         response.raise_for_status()
         #logger.info(f"Telegram alert sent: {message}")
         print(response,'response')
+        return True
     except requests.exceptions.RequestException as e:
         #logger.error(f"Failed to send Telegram alert: {str(e)}")
         if hasattr(e.response, 'json'):
             error_data = e.response.json()
             #logger.error(f"Telegram API error: {error_data}")
+        return False
     except Exception as e:
         #logger.error(f"Unexpected error sending Telegram alert: {str(e)}")
-        pass
+        return False
 
 def get_chat_id():
     try:
@@ -142,6 +151,14 @@ def test_telegram_bot():
     send_telegram_alert(test_message)
 
 def fetch_investing_calendar():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    import pandas as pd
+
     # Set up headless Chrome options
     options = Options()
     options.add_argument("--headless")
@@ -214,7 +231,6 @@ def convert_to_indian_time(time_str):
     try:
         # Parse the time string (assuming it's in GMT/UTC)
         from datetime import datetime, timedelta
-        import pytz
         
         # Create a datetime object for today with the given time
         today = datetime.now().date()
@@ -228,11 +244,10 @@ def convert_to_indian_time(time_str):
             
         # Create datetime object in UTC
         utc_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-        utc_time = pytz.utc.localize(utc_time)
+        utc_time = utc_time.replace(tzinfo=timezone.utc)
         
         # Convert to Indian time (IST = UTC+5:30)
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        ist_time = utc_time.astimezone(ist_tz)
+        ist_time = utc_time.astimezone(IST)
         
         # Format in 12-hour format
         return ist_time.strftime('%I:%M %p')
@@ -245,11 +260,9 @@ def is_event_within_30_minutes(time_str):
     """Check if event is within 30 minutes from now"""
     try:
         from datetime import datetime, timedelta
-        import pytz
         
         # Get current time in IST
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist_tz)
+        now = datetime.now(IST)
         
         # Parse the event time
         today = now.date()
@@ -260,7 +273,7 @@ def is_event_within_30_minutes(time_str):
             
         # Create event time in IST
         event_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-        event_time = ist_tz.localize(event_time)
+        event_time = event_time.replace(tzinfo=IST)
         
         # Calculate time difference
         time_diff = event_time - now
@@ -472,7 +485,7 @@ def check_cpr_engulfing1(instrument, timeframe):
         return False
 
 
-def check_cpr_engulfing(instrument, timeframe):
+def check_cpr_engulfing(instrument, timeframe, chat_id=None, range_mult=None, min_pips=None):
     """
     Detect bullish or bearish engulfing near CPR levels based on previous day's CPR.
     Only alert:
@@ -501,8 +514,7 @@ def check_cpr_engulfing(instrument, timeframe):
 
         prev, curr = recent_candles[-2], recent_candles[-1]
 
-        # Looser threshold for proximity (~10 pips for forex)
-        threshold = max((high - low) * 0.01, 0.0010)
+        threshold = cpr_band(instrument, high, low, range_mult, min_pips)
 
         near_tc = abs(curr["close"] - tc) <= threshold
         near_bc = abs(curr["close"] - bc) <= threshold
@@ -532,7 +544,7 @@ def check_cpr_engulfing(instrument, timeframe):
                   f"CPR {level_type}: {level_val:.5f}\n" \
                   f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
-        send_telegram_alert(message)
+        send_telegram_alert(message, chat_id)
         mark_alert_sent(instrument, timeframe, pattern_type, level_type)
         return True
 
@@ -543,7 +555,7 @@ def check_cpr_engulfing(instrument, timeframe):
 
 
 
-def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
+def check_engulfing(instrument="EUR_GBP", timeframe="M1", chat_id=None):
     try:
         candles = get_candles(instrument, timeframe)
         if len(candles) < 2:
@@ -562,7 +574,7 @@ def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
                      f"Open: {curr['open']:.5f}\n" \
                      f"Close: {curr['close']:.5f}\n" \
                      f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BULLISH")
             return message
         elif is_bearish_engulfing(prev, curr):
@@ -576,7 +588,7 @@ def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
                      f"Open: {curr['open']:.5f}\n" \
                      f"Close: {curr['close']:.5f}\n" \
                      f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BEARISH")
             return message
         return None
@@ -627,7 +639,7 @@ def check_prev_day_breakout1(instrument, timeframe):
         return False
 
 
-def check_prev_day_breakout(instrument, timeframe):
+def check_prev_day_breakout(instrument, timeframe, chat_id=None):
     try:
         if 'D' in timeframe or 'W' in timeframe or 'M' in timeframe:
             print(f"Skipping non-intraday timeframe: {timeframe}")
@@ -667,7 +679,7 @@ def check_prev_day_breakout(instrument, timeframe):
                       f"Open: {open_price:.5f}\nClose: {close_price:.5f}\n" \
                       f"Prev High: {prev_high:.5f}\n" \
                       f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BREAKOUT", alert_key)
             return True
 
@@ -682,7 +694,7 @@ def check_prev_day_breakout(instrument, timeframe):
                       f"Open: {open_price:.5f}\nClose: {close_price:.5f}\n" \
                       f"Prev Low: {prev_low:.5f}\n" \
                       f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BREAKOUT", alert_key)
             return True
 
@@ -706,25 +718,35 @@ def get_next_interval():
     seconds_until_next = minutes_until_next * 60
     return seconds_until_next
 
-def monitor_instrument(instrument, timeframes):
-    """Continuously monitor an instrument for patterns"""
+PATTERN_CHECKS = {
+    "engulfing": check_engulfing,
+    "cpr_engulfing": check_cpr_engulfing,
+    "body_breakout": check_prev_day_breakout,
+}
+# Entries without "patterns" keep this bot's original engulfing-only scan
+DEFAULT_PATTERNS = ("engulfing",)
+
+def monitor_instrument(instrument, timeframes, runner=None):
+    """Continuously monitor an instrument for patterns (until it leaves the watchlist)"""
+    patterns, thresholds, chat = DEFAULT_PATTERNS, {}, None
     while True:
         try:
             # Wait until next 30-minute interval
             wait_seconds = get_next_interval()
             print(f"Waiting {wait_seconds//60} minutes until next check for {instrument} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             time.sleep(wait_seconds)
+            if runner is not None:
+                job = runner.job(instrument)
+                if job is None:
+                    return
+                timeframes, patterns, thresholds, chat = job.timeframes, job.patterns, job.thresholds, job.chat
             
             # Clear expired alerts at the start of each monitoring cycle
             clear_expired_alerts()
             
             for tf in timeframes:
-                signal = check_engulfing(instrument, tf)
-                # cpr_signal = check_cpr_engulfing(instrument, tf)
-                # breakout_signal = check_prev_day_breakout(instrument, tf)
-                if signal or cpr_signal:
-                    #logger.info(signal)
-                    pass
+                for name in patterns:
+                    PATTERN_CHECKS[name](instrument, tf, chat_id=chat, **thresholds.get(name, {}))
                 time.sleep(1)  # Small delay to avoid hitting rate limits
             
         except Exception as e:
@@ -754,7 +776,15 @@ def keep_server_alive():
             pass
         time.sleep(60)
 
+def poll_updates():
+    from nse2bot2 import poll_updates
+    poll_updates()
+
 def main():
+    # Render stops an instance with SIGTERM: unwind like Ctrl-C so the lease is freed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    elector.start()
+
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
     #logger.info("Flask server started")
@@ -781,24 +811,13 @@ def main():
         "WTICO_USD", "BCO_USD"
     ]
 
-    # Define instruments and their specific timeframes
-    instrument_timeframes = {
-        "EUR_USD": ["M30"],      # EURUSD 30mins
-        "XAU_USD": ["H1"],       # XAUUSD 1HR
-        "NZD_USD": ["M30"],     # NZDUSD 30mins
-        "ETH_USDT": ["H1"]      # ETHUSDT 1HR
-    }
-
-    threads = []
-    for instrument, timeframes in instrument_timeframes.items():
-        thread = threading.Thread(
-            target=monitor_instrument,
-            args=(instrument, timeframes),
-            daemon=True
-        )
-        thread.start()
-        threads.append(thread)
-        print(f"Started monitoring {instrument} on timeframes: {', '.join(timeframes)}")
+    # Instruments and their timeframes come from the watchlist file (hot-reloaded)
+    monitors = watchlist.Runner(monitor_instrument, patterns=PATTERN_THRESHOLDS,
+                                default_patterns=DEFAULT_PATTERNS)
+    monitors.reload()
+    for job in monitors.jobs.values():
+        print(f"Started monitoring {job.instrument} on timeframes: {', '.join(job.timeframes)}")
+    threading.Thread(target=monitors.watch, daemon=True).start()
 
     try:
         while True:
@@ -808,6 +827,8 @@ def main():
     except KeyboardInterrupt:
         #logger.info("Monitoring stopped by user")
         pass
+    finally:
+        elector.release()
 
 if __name__ == "__main__":
     main()
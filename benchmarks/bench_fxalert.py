@@ -0,0 +1,73 @@
+"""fxalert.py hot paths: candle conversion, pattern checks, news parsing and digest."""
+import json
+
+import pytest
+
+import fxalert
+from candle_cache import CandleCache
+from conftest import make_oanda_payload
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Silence Telegram and keep fxalert from touching the network."""
+    sent = []
+    monkeypatch.setattr(fxalert, "send_telegram_alert", lambda msg, trace=None, chat_id=None: sent.append(msg))
+    return sent
+
+
+def test_get_candles_conversion(benchmark, monkeypatch, oanda_payload):
+    # JSON decode + mid-price dict conversion of a 5000-candle response (cache bypassed)
+    monkeypatch.setattr(fxalert, "USE_CANDLE_CACHE", False)
+    monkeypatch.setattr(fxalert.requests, "get", lambda *a, **kw: _Response(oanda_payload))
+    out = benchmark(fxalert.get_candles, "EUR_USD", "M30", 1666)
+    assert len(out) == 1666
+
+
+@pytest.fixture
+def warm_cache(monkeypatch):
+    """fxalert.candle_cache served from an in-memory M30 series, with indicators warmed up."""
+    candles = [
+        {"open": float(c["mid"]["o"]), "high": float(c["mid"]["h"]), "low": float(c["mid"]["l"]),
+         "close": float(c["mid"]["c"]), "time": c["time"], "complete": c["complete"]}
+        for c in json.loads(make_oanda_payload(n=1500))["candles"]
+    ]
+    cache = CandleCache(lambda inst, gran, **params: candles, clock=lambda: 0.0)
+    cache._specs = fxalert.candle_cache._specs
+    monkeypatch.setattr(fxalert, "candle_cache", cache)
+    monkeypatch.setattr(fxalert, "USE_CANDLE_CACHE", True)
+    cache.indicators("EUR_USD", "D")
+    cache.indicators("EUR_USD", "M30")
+    return cache
+
+
+def _reset_alert_state():
+    fxalert.sent_alerts.clear()
+    fxalert.breakout_state.clear()
+
+
+@pytest.mark.parametrize("check", ["check_engulfing", "check_cpr_engulfing", "check_body_breakout"])
+def test_pattern_check(benchmark, offline, warm_cache, check):
+    fn = getattr(fxalert, check)
+    benchmark.pedantic(fn, args=("EUR_USD", "M30"), setup=_reset_alert_state, rounds=300, warmup_rounds=5)
+
+
+def test_parse_event_time_week(benchmark, ff_week):
+    out = benchmark(lambda: [fxalert.parse_event_time_ist(ev) for ev in ff_week])
+    assert sum(dt is not None for dt in out) >= len(ff_week) // 2
+
+
+def test_build_morning_digest_week(benchmark, ff_week):
+    digest = benchmark(fxalert.build_morning_digest, ff_week)
+    assert digest.count("• ") == len([e for e in ff_week if e["impact"] in fxalert.VALID_IMPACTS])
@@ -0,0 +1,46 @@
+"""harmonic.py zigzag pivots and harmonic/AB=CD pattern search."""
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import harmonic
+
+
+def make_ohlc(n, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.012, n)))
+    spread = np.abs(rng.normal(0, 0.006, n)) * close
+    return pd.DataFrame({
+        "datetime": pd.date_range("2020-01-01", periods=n, freq="D"),
+        "open": close, "high": close + spread, "low": close - spread, "close": close,
+    })
+
+
+@pytest.mark.parametrize("bars", [500, 5000])
+def test_scan_patterns(benchmark, bars):
+    df = make_ohlc(bars)
+    benchmark(harmonic.scan_patterns, df)
+
+
+def test_find_harmonic_patterns(benchmark):
+    df = make_ohlc(5000)
+    idx, prices, is_high = harmonic.zigzag_pivots(df["high"].values, df["low"].values, 0.01)
+    benchmark(harmonic.find_harmonic_patterns, idx, prices, is_high)
+
+
+def test_zigzag_leg_reversing_on_its_pivot_bar():
+    # Bar 2 is the swing high and its own low already retraces 3%: the down leg
+    # starting there must be scanned from bar 3 on (this used to loop forever).
+    high = np.array([100., 104., 106., 101., 96., 99., 103.])
+    low = np.array([99., 103., 100., 97., 95., 98., 102.])
+    result = []
+    t = threading.Thread(target=lambda: result.append(harmonic.zigzag_pivots(high, low, 0.03)), daemon=True)
+    t.start()
+    t.join(5)
+    assert result, "zigzag_pivots did not terminate"
+    idx, prices, is_high = result[0]
+    assert idx.tolist() == [0, 2, 3, 6]
+    assert prices.tolist() == [99., 106., 97., 103.]
+    assert is_high.tolist() == [False, True, False, True]
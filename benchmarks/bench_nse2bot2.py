@@ -0,0 +1,20 @@
+"""nse2bot2.apply_filter over an Excel-sized fundamentals frame."""
+import numpy as np
+import pandas as pd
+
+import nse2bot2
+
+
+def make_fundamentals(n=2000, seed=5):
+    rng = np.random.default_rng(seed)
+    pe = rng.uniform(5, 80, n)
+    return pd.DataFrame({
+        "Symbol": [f"SYM{i:04d}" for i in range(n)],
+        "Company PE": np.where(rng.random(n) < 0.05, "-", pe.round(2).astype(str)),
+        "Industry PE": rng.uniform(10, 60, n).round(2),
+    })
+
+
+def test_apply_filter_2000(benchmark):
+    df = make_fundamentals()
+    benchmark(lambda: nse2bot2.apply_filter(df.copy()))
@@ -0,0 +1,100 @@
+"""
+Vectorized download.apply_screener vs the original per-symbol groupby loop.
+
+    python benchmarks/bench_screener.py [n_symbols] [n_days]   # loop vs vectorized, checks equality
+    python -m pytest benchmarks -k screener                    # pytest-benchmark run
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from download import apply_screener  # noqa: E402
+
+
+def make_bhav_frame(n_symbols=2000, n_days=250, seed=7):
+    """Synthetic Bhavcopy OHLC rows: one random walk per symbol over n_days sessions."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-06-30", periods=n_days).date
+    base = rng.uniform(50, 3000, n_symbols)
+    rets = rng.normal(0, 0.015, (n_days, n_symbols))
+    close = base * np.exp(np.cumsum(rets, axis=0))
+    open_ = close * (1 + rng.normal(0, 0.005, close.shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, close.shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, close.shape))
+
+    symbols = np.array([f"SYM{i:04d}" for i in range(n_symbols)])
+    return pd.DataFrame({
+        "symbol": np.tile(symbols, n_days),
+        "open": open_.ravel(),
+        "high": high.ravel(),
+        "low": low.ravel(),
+        "close": close.ravel(),
+        "date": np.repeat(dates, n_symbols),
+    })
+
+
+def legacy_apply_screener(df):
+    """The pre-vectorization loop, kept verbatim as the reference implementation."""
+    df = df.sort_values(by=['symbol', 'date'])
+    results = []
+
+    for symbol, group in df.groupby('symbol'):
+        if len(group) < 5:
+            continue
+        group = group.tail(5).reset_index(drop=True)
+        today = group.iloc[-1]
+        yesterday = group.iloc[-2]
+        closes = group['close'].tolist()
+        opens = group['open'].tolist()
+
+        c1 = today['close'] >= yesterday['high']
+        c2 = today['close'] > today['high'] * 0.75
+        c3 = max(closes) < today['close'] * 1.03
+        c4 = min(opens) > today['close'] * 0.95
+        c5 = min(closes) > today['close'] * 0.95
+        c6 = max(opens) < today['close'] * 1.03
+
+        results.append({
+            'symbol': symbol,
+            'C1': c1, 'C2': c2, 'C3': c3,
+            'C4': c4, 'C5': c5, 'C6': c6,
+            'PASS': all([c1, c2, c3, c4, c5, c6])
+        })
+
+    return pd.DataFrame(results)
+
+
+def _best_of(fn, df, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def test_apply_screener_2000_symbols(benchmark):
+    df = make_bhav_frame(2000, 250)
+    out = benchmark(apply_screener, df)
+    assert len(out) == 2000
+
+
+if __name__ == "__main__":
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    df = make_bhav_frame(n_symbols, n_days)
+
+    t_loop, ref = _best_of(legacy_apply_screener, df)
+    t_vec, out = _best_of(apply_screener, df)
+
+    cols = ['symbol'] + [f'C{i}' for i in range(1, 7)] + ['PASS']
+    pd.testing.assert_frame_equal(
+        ref[cols].astype({c: bool for c in cols[1:]}).reset_index(drop=True),
+        out[cols].astype({c: bool for c in cols[1:]}).reset_index(drop=True),
+    )
+    print(f"{n_symbols} symbols x {n_days} days: loop {t_loop*1000:.0f} ms, "
+          f"vectorized {t_vec*1000:.0f} ms ({t_loop / t_vec:.1f}x)")
@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OANDA_TIME = "%Y-%m-%dT%H:%M:%S.000000000Z"
+
+
+def make_oanda_payload(n=5000, start="2025-09-01T00:00:00", step_minutes=30, seed=1):
+    """Raw OANDA candles response (JSON text) with `n` mid-price candles, the last one forming."""
+    rng = np.random.default_rng(seed)
+    close = 1.08 * np.exp(np.cumsum(rng.normal(0, 0.0008, n)))
+    open_ = np.concatenate([[1.08], close[:-1]])
+    t0 = datetime.fromisoformat(start)
+    candles = [{
+        "complete": i < n - 1,
+        "volume": int(rng.integers(50, 500)),
+        "time": (t0 + timedelta(minutes=step_minutes * i)).strftime(OANDA_TIME),
+        "mid": {"o": f"{o:.5f}", "h": f"{max(o, c) + 0.0004:.5f}",
+                "l": f"{min(o, c) - 0.0004:.5f}", "c": f"{c:.5f}"},
+    } for i, (o, c) in enumerate(zip(open_, close))]
+    return json.dumps({"instrument": "EUR_USD", "granularity": "M30", "candles": candles})
+
+
+def make_ff_week(monday="2025-11-03", per_day=24, seed=3):
+    """
+    A full Forex Factory week (~120 events) mixing the feed's date shapes:
+    ISO-8601 with offset, epoch 'timestamp', and separate NY 'date' + 'time' strings.
+    """
+    rng = np.random.default_rng(seed)
+    currencies = ["USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF", "CNY"]
+    impacts = ["High", "Medium", "Low", "Holiday"]
+    base = datetime.fromisoformat(monday)
+    events = []
+    for d in range(5):
+        day = base + timedelta(days=d)
+        for i in range(per_day):
+            at = day + timedelta(minutes=int(rng.integers(0, 24 * 60 // 15)) * 15)
+            ev = {
+                "title": f"Synthetic Indicator {d}-{i}",
+                "country": currencies[int(rng.integers(len(currencies)))],
+                "impact": impacts[int(rng.choice(4, p=[0.2, 0.3, 0.45, 0.05]))],
+                "forecast": f"{rng.normal(0.2, 0.1):.1f}%",
+                "previous": f"{rng.normal(0.2, 0.1):.1f}%",
+            }
+            shape = i % 4
+            if shape == 0:
+                ev["date"] = at.strftime("%Y-%m-%dT%H:%M:%S-05:00")
+            elif shape == 1:
+                ev["date"] = at.strftime("%Y-%m-%d")
+                ev["timestamp"] = int(at.timestamp())
+            elif shape == 2:
+                ev["date"] = at.strftime("%Y-%m-%d")
+                ev["time"] = at.strftime("%I:%M%p").lstrip("0").lower()
+            else:
+                ev["date"] = at.strftime("%Y-%m-%d")
+                ev["time"] = "All Day"
+            events.append(ev)
+    return events
+
+
+@pytest.fixture(scope="session")
+def oanda_payload():
+    return make_oanda_payload()
+
+
+@pytest.fixture(scope="session")
+def ff_week():
+    return make_ff_week()
@@ -0,0 +1,74 @@
+import os
+import glob
+import datetime
+import pandas as pd
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Columnar Bhavcopy store: one Parquet file per session, partitioned by year/month
+#   bhavstore/year=2025/month=06/2025-06-30.parquet
+# Each day is ingested once; reads touch only the requested columns and dates.
+# ──────────────────────────────────────────────────────────────────────────────
+STORE_DIR = os.getenv("BHAV_STORE_DIR", os.path.join(os.getcwd(), "bhavstore"))
+COLUMNS = ["symbol", "open", "high", "low", "close", "volume"]
+
+
+def day_path(date, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f"year={date:%Y}", f"month={date:%m}", f"{date:%Y-%m-%d}.parquet")
+
+
+def ingested_dates(store_dir=STORE_DIR):
+    """Sorted list of sessions already in the store."""
+    out = []
+    for path in glob.glob(os.path.join(store_dir, "year=*", "month=*", "*.parquet")):
+        try:
+            out.append(datetime.date.fromisoformat(os.path.basename(path)[:-len(".parquet")]))
+        except ValueError:
+            continue
+    return sorted(out)
+
+
+def ingest_day(date, df, store_dir=STORE_DIR):
+    """Append one session (incremental); rewriting an existing day replaces it."""
+    day = pd.DataFrame({c: df[c] for c in COLUMNS if c in df.columns})
+    for c in ("open", "high", "low", "close"):
+        day[c] = pd.to_numeric(day[c], errors="coerce").astype("float64")
+    if "volume" in day.columns:
+        day["volume"] = pd.to_numeric(day["volume"], errors="coerce").astype("float64")
+    day["symbol"] = day["symbol"].astype(str).str.strip()
+
+    path = day_path(date, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".part"
+    day.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_range(start=None, end=None, columns=None, symbols=None, store_dir=STORE_DIR):
+    """
+    Long frame (symbol, <columns>, date) for sessions in [start, end].
+    Only the day files in range are opened and only `columns` are read.
+    """
+    dates = [d for d in ingested_dates(store_dir)
+             if (start is None or d >= start) and (end is None or d <= end)]
+    return _load_days(dates, columns, symbols, store_dir)
+
+
+def load_last_n(n, columns=None, symbols=None, end=None, store_dir=STORE_DIR):
+    """Long frame for the latest `n` ingested sessions (on or before `end`)."""
+    dates = [d for d in ingested_dates(store_dir) if end is None or d <= end][-n:]
+    return _load_days(dates, columns, symbols, store_dir)
+
+
+def _load_days(dates, columns, symbols, store_dir):
+    cols = None if columns is None else ["symbol"] + [c for c in columns if c != "symbol"]
+    frames = []
+    for d in dates:
+        df = pd.read_parquet(day_path(d, store_dir), columns=cols)
+        if symbols is not None:
+            df = df[df["symbol"].isin(symbols)]
+        df["date"] = d
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=(cols or COLUMNS) + ["date"])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,141 @@
+import time
+import threading
+from datetime import timedelta
+
+import resample
+from indicators import IndicatorSet
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Per-instrument candle cache
+#
+# One lower-timeframe series (M30 by default) is fetched per instrument and
+# kept up to date incrementally; every coarser timeframe the monitors ask for
+# (H1/H4/D/W) is resampled from it locally instead of being requested again.
+# ──────────────────────────────────────────────────────────────────────────────
+HISTORY_BARS = 1500   # cold-start depth (M30: ~1 month, enough for D/W context)
+MAX_BARS = 5000       # OANDA's per-request cap; older bars are dropped
+
+
+class CandleCache:
+    """
+    fetch(instrument, granularity, **params) -> list of candle dicts
+    ({'open','high','low','close','time','complete'}, oldest first, the forming
+    candle last with complete=False). params are OANDA query params (count / from).
+    """
+
+    def __init__(self, fetch, base_tf="M30", market="fx", history=HISTORY_BARS,
+                 max_bars=MAX_BARS, clock=time.time):
+        self.fetch = fetch
+        self.base_tf = resample.canonical(base_tf)
+        self.base_secs = resample.TF_SECONDS[self.base_tf]
+        self.market = market
+        self.history = history
+        self.max_bars = max_bars
+        self._clock = clock
+        self._series = {}   # instrument -> {"bars": [...complete], "as_of": dt, "next_close": epoch}
+        self._specs = {}    # timeframe -> {name: indicator factory}
+        self._sets = {}     # (instrument, timeframe) -> IndicatorSet
+        self._derived = {}  # (instrument, timeframe) -> (base version, resampled bars)
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.hits = 0       # refreshes answered without a fetch
+        self.misses = 0
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lock(self, instrument):
+        with self._guard:
+            return self._locks.setdefault(instrument, threading.Lock())
+
+    def serves(self, timeframe, count):
+        """True if `timeframe` x `count` can be built from the base series."""
+        tf = resample.canonical(timeframe)
+        secs = resample.TF_SECONDS.get(tf)
+        if not secs or secs < self.base_secs or secs % self.base_secs:
+            return False
+        # W spans 5 trading days; +1 bucket for the one in progress
+        span = (5 * 86400 if tf == "W" else secs) * (count + 1)
+        return span // self.base_secs <= self.history
+
+    def refresh(self, instrument):
+        """Bring the base series up to date; fetches only if a new base bar can have closed."""
+        with self._lock(instrument):
+            st = self._series.get(instrument)
+            if st is not None and self._clock() < st["next_close"]:
+                self.hits += 1
+                return st
+            self.misses += 1
+            if st is None or not st["bars"]:
+                fetched = self.fetch(instrument, self.base_tf, count=self.history)
+                bars = []
+            else:
+                bars = st["bars"]
+                fetched = self.fetch(instrument, self.base_tf, **{"from": bars[-1]["time"]})
+
+            complete = [c for c in fetched if c.get("complete")]
+            if complete:
+                last = bars[-1]["time"] if bars else ""
+                bars = bars + [c for c in complete if c["time"] > last]
+                bars = bars[-self.max_bars:]
+
+            forming = [c for c in fetched if not c.get("complete")]
+            if forming:
+                as_of = resample.parse_time(forming[-1]["time"])
+            elif bars:
+                as_of = resample.parse_time(bars[-1]["time"]) + timedelta(seconds=self.base_secs)
+            else:
+                as_of = None
+
+            next_close = as_of.timestamp() + self.base_secs if as_of else 0
+            st = self._series[instrument] = {"bars": bars, "as_of": as_of, "next_close": next_close}
+            return st
+
+    def _bars(self, instrument, tf, st):
+        """Base bars, or `tf` bars resampled from them (rebuilt only when the base series changed)."""
+        if tf == self.base_tf:
+            return st["bars"]
+        version = (st["bars"][-1]["time"] if st["bars"] else "", st["as_of"])
+        cached = self._derived.get((instrument, tf))
+        if cached is None or cached[0] != version:
+            bars = resample.resample_candles(st["bars"], tf, self.base_tf, self.market, as_of=st["as_of"])
+            cached = self._derived[(instrument, tf)] = (version, bars)
+        return cached[1]
+
+    def get(self, instrument, timeframe, count):
+        """Last `count` completed `timeframe` candles (same dicts as fxalert.get_candles)."""
+        st = self.refresh(instrument)
+        bars = self._bars(instrument, resample.canonical(timeframe), st)
+        done = [c for c in bars if c.get("complete", True)]
+        return done[-count:]
+
+    # ── Incremental indicators ────────────────────────────────────────────────
+    def track(self, timeframe, **factories):
+        """Maintain indicators on every instrument's `timeframe` bars, e.g. track("D", atr=lambda: WilderATR(14))."""
+        self._specs.setdefault(resample.canonical(timeframe), {}).update(factories)
+
+    def indicators(self, instrument, timeframe):
+        """{name: value} for `timeframe`, updated with any bars completed since the last call."""
+        tf = resample.canonical(timeframe)
+        specs = self._specs.get(tf)
+        if not specs:
+            return {}
+        st = self.refresh(instrument)
+        with self._lock(instrument):
+            ind = self._sets.get((instrument, tf))
+            if ind is None:
+                ind = self._sets[(instrument, tf)] = IndicatorSet(**{n: f() for n, f in specs.items()})
+            if st["bars"] and st["bars"][-1]["time"] > ind.last_time:
+                ind.feed(c for c in self._bars(instrument, tf, st) if c.get("complete", True))
+            return ind.values()
+
+    def snapshot(self):
+        """Indicator state for every instrument/timeframe (JSON-serializable)."""
+        return {f"{inst}|{tf}": ind.snapshot() for (inst, tf), ind in list(self._sets.items())}
+
+    def restore(self, state):
+        for key, s in state.items():
+            inst, tf = key.split("|", 1)
+            specs = self._specs.get(tf, {})
+            self._sets[(inst, tf)] = IndicatorSet(**{n: f() for n, f in specs.items()}).restore(s)
@@ -0,0 +1,160 @@
+import time as _time
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Injectable clock
+#
+# Schedulers call clock.now() / clock.time() / clock.sleep() instead of
+# datetime.now / time.time / time.sleep. Production uses RealClock; tests,
+# benchmarks and the replay harness install a SimulatedClock (virtual time,
+# advanced by a driver) or a ScaledClock (real time sped up by a factor).
+# ──────────────────────────────────────────────────────────────────────────────
+
+
+class RealClock:
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def now(self, tz=None):
+        return datetime.now(tz)
+
+    def sleep(self, secs):
+        _time.sleep(max(0.0, secs))
+
+
+class ScaledClock(RealClock):
+    """Epoch time starting at `start` and running `speed` times faster than real time."""
+
+    def __init__(self, start, speed):
+        self.start = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.speed = float(speed)
+        self._real0 = _time.monotonic()
+
+    def time(self):
+        return self.start + (_time.monotonic() - self._real0) * self.speed
+
+    monotonic = time
+
+    def now(self, tz=None):
+        return datetime.fromtimestamp(self.time(), tz)
+
+    def sleep(self, secs):
+        _time.sleep(max(0.0, secs) / self.speed)
+
+
+class SimulatedClock:
+    """
+    Virtual time that only moves when a driver advances it.
+
+    Worker threads calling sleep() park until the driver reaches their wake time.
+    advance()/advance_to() wake sleepers one at a time in wake order and wait for
+    each woken thread to go back to sleep before moving on, so a multi-threaded
+    run is deterministic and takes only as long as the work itself.
+
+    With autoadvance=True, sleep() simply moves time forward (single-threaded use).
+    """
+
+    def __init__(self, start=None, autoadvance=False, settle_timeout=5.0):
+        if start is None:
+            start = _time.time()
+        self._now = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.autoadvance = autoadvance
+        self.settle_timeout = settle_timeout
+        self._cond = threading.Condition()
+        self._sleepers = []      # heap of [wake, seq, thread ident, woken]
+        self._seq = itertools.count()
+        self._woken = set()      # threads released by the driver that have not slept again
+        self.wakeups = 0
+
+    def time(self):
+        return self._now
+
+    monotonic = time
+
+    def now(self, tz=None):
+        return datetime.fromtimestamp(self._now, tz)
+
+    def sleep(self, secs):
+        secs = max(0.0, secs)
+        with self._cond:
+            if self.autoadvance:
+                self._now += secs
+                return
+            ident = threading.get_ident()
+            entry = [self._now + secs, next(self._seq), ident, False]
+            heapq.heappush(self._sleepers, entry)
+            self._woken.discard(ident)
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: entry[3])
+
+    def sleeping(self):
+        with self._cond:
+            return len(self._sleepers)
+
+    def wait_for_sleepers(self, n, timeout=10.0):
+        """Block (real time) until at least `n` threads are parked in sleep()."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._sleepers) >= n, timeout)
+
+    def _settle(self):
+        # Woken threads that never sleep again (exited, blocked elsewhere) are given up on
+        if not self._cond.wait_for(lambda: not self._woken, self.settle_timeout):
+            self._woken.clear()
+
+    def advance_to(self, until):
+        """Move virtual time to `until`, running every sleeper due on the way. Returns wakeups."""
+        until = until.timestamp() if isinstance(until, datetime) else float(until)
+        woke = 0
+        with self._cond:
+            while True:
+                self._settle()
+                if not self._sleepers or self._sleepers[0][0] > until:
+                    break
+                entry = heapq.heappop(self._sleepers)
+                self._now = max(self._now, entry[0])
+                self._woken.add(entry[2])
+                entry[3] = True
+                woke += 1
+                self._cond.notify_all()
+            self._now = max(self._now, until)
+        self.wakeups += woke
+        return woke
+
+    def advance(self, seconds):
+        return self.advance_to(self._now + seconds)
+
+
+_clock = RealClock()
+
+
+def use(clock):
+    """Install `clock` process-wide; returns the previous one."""
+    global _clock
+    prev, _clock = _clock, clock
+    return prev
+
+
+def get():
+    return _clock
+
+
+def time():
+    return _clock.time()
+
+
+def monotonic():
+    return _clock.monotonic()
+
+
+def now(tz=None):
+    return _clock.now(tz)
+
+
+def sleep(secs):
+    _clock.sleep(secs)
@@ -0,0 +1,22 @@
+from instruments import pip_size
+
+# ──────────────────────────────────────────────────────────────────────────────
+# CPR proximity band for the standalone bots (forexnews.py, a.py, recoverya.py)
+#
+# The band around TC/BC is range_mult x yesterday's high-low range, at least
+# min_pips. fxalert scales its band by the daily ATR instead and calls that
+# multiplier atr_mult; the names differ so one watchlist entry is never read
+# as both (an ATR multiple is ~10x a range fraction).
+# ──────────────────────────────────────────────────────────────────────────────
+RANGE_MULT = 0.01   # ~1% of yesterday's range
+MIN_BAND = 0.0010   # ~10 pips on a 4-decimal pair, when min_pips is not set
+
+# Watchlist thresholds each pattern check of these bots accepts
+PATTERN_THRESHOLDS = {"engulfing": (), "cpr_engulfing": ("range_mult", "min_pips"), "body_breakout": ()}
+
+
+def cpr_band(instrument, high, low, range_mult=None, min_pips=None):
+    """Proximity band around TC/BC from yesterday's high/low."""
+    band = (high - low) * (RANGE_MULT if range_mult is None else range_mult)
+    floor = MIN_BAND if min_pips is None else min_pips * pip_size(instrument)
+    return max(band, floor)
@@ -1,22 +1,55 @@
+import io
 import os
 import time
 import zipfile
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import requests
+import bhav_store
+import screener_rules
+import trading_calendar
 
 # === CONFIG ===
 DOWNLOAD_DIR = os.path.join(os.getcwd(), "bhavcopies")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-# === 1. Selenium Downloader ===
+ARCHIVE_BASE = os.getenv("NSE_ARCHIVE_BASE", "https://nsearchives.nseindia.com/content/historical/EQUITIES")
+NSE_HOME = "https://www.nseindia.com"
+FETCH_WORKERS = int(os.getenv("BHAV_FETCH_WORKERS", "5"))
+# A 404 may just mean "not published yet" (or a transient error), so a .missing
+# marker is only trusted for MISSING_RETRY_HOURS; once it was written
+# MISSING_FINAL_DAYS after the session, the file is never coming and it sticks.
+MISSING_RETRY_HOURS = float(os.getenv("BHAV_MISSING_RETRY_HOURS", "6"))
+MISSING_FINAL_DAYS = int(os.getenv("BHAV_MISSING_FINAL_DAYS", "7"))
+NSE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "*/*",
+}
+
+def bhav_filename(date):
+    return f"cm{date.strftime('%d')}{date.strftime('%b').upper()}{date.strftime('%Y')}bhav.csv.zip"
+
+def bhav_url(date, base=ARCHIVE_BASE):
+    return f"{base}/{date.strftime('%Y')}/{date.strftime('%b').upper()}/{bhav_filename(date)}"
+
+def is_valid_zip(path_or_bytes):
+    """True if the ZIP opens, has at least one member and passes its CRC check."""
+    try:
+        src = io.BytesIO(path_or_bytes) if isinstance(path_or_bytes, bytes) else path_or_bytes
+        with zipfile.ZipFile(src) as z:
+            return bool(z.namelist()) and z.testzip() is None
+    except Exception:
+        return False
+
+# === 1. Selenium Downloader (legacy, kept for manual use) ===
 def download_bhavcopy_selenium(download_dir, date):
-    day = date.strftime('%d')
-    month = date.strftime('%b').upper()
-    year = date.strftime('%Y')
-    filename = f"cm{day}{month}{year}bhav.csv.zip"
-    url = f"https://www1.nseindia.com/content/historical/EQUITIES/{year}/{month}/{filename}"
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    filename = bhav_filename(date)
+    url = bhav_url(date, "https://www1.nseindia.com/content/historical/EQUITIES")
 
     options = Options()
     prefs = {
@@ -35,24 +68,112 @@ def download_bhavcopy_selenium(download_dir, date):
     path = os.path.join(download_dir, filename)
     return path if os.path.exists(path) else None
 
-# === 2. Download Last 5 Trading Days ===
-def get_last_n_bhavcopies(n=5):
+# === 1b. HTTP Downloader (cookie-primed session, retries, local archive) ===
+def nse_session(total=3, backoff_factor=0.5):
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    sess = requests.Session()
+    sess.headers.update(NSE_HEADERS)
+    retry = Retry(
+        total=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['HEAD', 'GET'])
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=FETCH_WORKERS)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    try:
+        sess.get(NSE_HOME, timeout=10)  # prime cookies
+    except Exception as e:
+        print(f"⚠️ Cookie priming failed: {e}")
+    return sess
+
+def archived_bhavcopy(download_dir, date):
+    """Return ('ok', path), ('missing', None) for a known holiday, or (None, None) if not archived."""
+    path = os.path.join(download_dir, bhav_filename(date))
+    if os.path.exists(path) and is_valid_zip(path):
+        return "ok", path
+    marker = path + ".missing"
+    if os.path.exists(marker):
+        written = os.path.getmtime(marker)
+        final = datetime.date.fromtimestamp(written) - date >= datetime.timedelta(days=MISSING_FINAL_DAYS)
+        if final or time.time() - written < MISSING_RETRY_HOURS * 3600:
+            return "missing", None
+        os.remove(marker)  # expired: try the download again
+    return None, None
+
+def download_bhavcopy_http(session, download_dir, date):
+    path = os.path.join(download_dir, bhav_filename(date))
+    try:
+        res = session.get(bhav_url(date), timeout=20)
+        if res.status_code == 404:
+            # No file for a past session: remember it for a while so reruns skip the call
+            # (archived_bhavcopy expires the marker unless the session is long gone)
+            if date < datetime.date.today():
+                open(path + ".missing", "w").close()
+            return None
+        res.raise_for_status()
+        if not is_valid_zip(res.content):
+            print(f"❌ Corrupt ZIP for {date}")
+            return None
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(res.content)
+        os.replace(tmp, path)
+        return path
+    except Exception as e:
+        print(f"❌ HTTP download failed for {date}: {e}")
+        return None
+
+# === 2. Download Last N Trading Days ===
+STORED = "stored"  # placeholder path for sessions already in the columnar store
+
+def get_last_n_bhavcopies(n=5, max_lookback=None, download_dir=DOWNLOAD_DIR, known=None):
+    """
+    Newest-first [(date, zip_path)]; archived days are reused and the rest fetched in parallel.
+    Dates in `known` (e.g. already ingested into bhav_store) are returned with path STORED
+    and never downloaded.
+    """
     today = datetime.date.today()
-    bhav_files = []
-    attempts = 0
-
-    while len(bhav_files) < n and attempts < 10:
-        if today.weekday() < 5:
-            print(f"⬇️ Downloading: {today}")
-            file_path = download_bhavcopy_selenium(DOWNLOAD_DIR, today)
-            if file_path:
-                bhav_files.append((today, file_path))
-            else:
-                print(f"❌ Failed for {today}")
-        today -= datetime.timedelta(days=1)
-        attempts += 1
-
-    return bhav_files
+    max_lookback = max_lookback or int(n * 1.6) + 10  # calendar days covering n sessions + holidays
+    candidates = [today - datetime.timedelta(days=i) for i in range(max_lookback)]
+    candidates = [d for d in candidates if trading_calendar.is_trading_day("nse", d)]
+
+    state = {}  # date -> zip path, or None once known to be unavailable
+    for d in candidates:
+        if known and d in known:
+            state[d] = STORED
+            continue
+        status, path = archived_bhavcopy(download_dir, d)
+        if status is not None:
+            state[d] = path
+
+    session = None
+    while True:
+        # Newest days not yet known that could still be among the last n sessions
+        batch, slots = [], 0
+        for d in candidates:
+            if d not in state:
+                batch.append(d)
+            if d not in state or state[d]:
+                slots += 1
+            if slots >= n:
+                break
+        if not batch:
+            break
+
+        session = session or nse_session()
+        print(f"⬇️ Downloading: {', '.join(str(d) for d in batch)}")
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            paths = list(pool.map(lambda d: download_bhavcopy_http(session, download_dir, d), batch))
+        for d, path in zip(batch, paths):
+            state[d] = path
+            if not path:
+                print(f"❌ Failed for {d}")
+
+    return [(d, state[d]) for d in candidates if state.get(d)][:n]
 
 # === 3. Extract CSV from ZIPs ===
 def extract_ohlc_from_zip(zip_path, date):
@@ -60,7 +181,9 @@ def extract_ohlc_from_zip(zip_path, date):
         with zipfile.ZipFile(zip_path, 'r') as z:
             csv_file = z.namelist()[0]
             df = pd.read_csv(z.open(csv_file))
-            df = df[['SYMBOL', 'OPEN', 'HIGH', 'LOW', 'CLOSE']].rename(columns=str.lower)
+            cols = ['SYMBOL', 'OPEN', 'HIGH', 'LOW', 'CLOSE']
+            df = df[cols + (['TOTTRDQTY'] if 'TOTTRDQTY' in df.columns else [])]
+            df = df.rename(columns=str.lower).rename(columns={'tottrdqty': 'volume'})
             df['date'] = date
             return df
     except Exception as e:
@@ -68,56 +191,54 @@ def extract_ohlc_from_zip(zip_path, date):
         return None
 
 # === 4. Apply Screener Conditions ===
-def apply_screener(df):
-    df = df.sort_values(by=['symbol', 'date'])
-    results = []
+LOOKBACK = 5
 
-    for symbol, group in df.groupby('symbol'):
-        if len(group) < 5:
-            continue
-        group = group.tail(5).reset_index(drop=True)
-        today = group.iloc[-1]
-        yesterday = group.iloc[-2]
-        closes = group['close'].tolist()
-        opens = group['open'].tolist()
-
-        try:
-            c1 = today['close'] >= yesterday['high']
-            c2 = today['close'] > today['high'] * 0.75
-            c3 = max(closes) < today['close'] * 1.03
-            c4 = min(opens) > today['close'] * 0.95
-            c5 = min(closes) > today['close'] * 0.95
-            c6 = max(opens) < today['close'] * 1.03
-
-            results.append({
-                'symbol': symbol,
-                'C1': c1, 'C2': c2, 'C3': c3,
-                'C4': c4, 'C5': c5, 'C6': c6,
-                'PASS': all([c1, c2, c3, c4, c5, c6])
-            })
-        except Exception as e:
-            print(f"{symbol}: Error - {e}")
-
-    return pd.DataFrame(results)
+# Used when screens.json has no "bhav" section
+DEFAULT_SCREENS = {
+    'C1': 'close >= prev_high',
+    'C2': 'close > 0.75 * high',
+    'C3': 'max_close_5 < close * 1.03',
+    'C4': 'min_open_5 > close * 0.95',
+    'C5': 'min_close_5 > close * 0.95',
+    'C6': 'max_open_5 < close * 1.03',
+    'PASS': 'C1 and C2 and C3 and C4 and C5 and C6',
+}
 
-# === 5. Main Runner ===
-def run_screener():
-    print("📥 Downloading Bhavcopy ZIPs...")
-    zip_files = get_last_n_bhavcopies(5)
+def apply_screener(df, lookback=LOOKBACK, screens=None):
+    """Evaluate every configured screen for all symbols at once over their last `lookback` sessions."""
+    screens = screens or screener_rules.load_screens('bhav', DEFAULT_SCREENS)
+    env = screener_rules.BhavFeatures(df, depth=lookback)
+    result = screener_rules.evaluate(screens, env)
+    result = result[env['bars'] >= lookback]
+    return result.rename_axis('symbol').reset_index()
 
-    if not zip_files:
-        print("❌ Could not get any Bhavcopy ZIPs.")
-        return
-
-    print("🧾 Extracting OHLC data...")
-    combined = []
-    for date, path in zip_files:
+# === 5. Main Runner ===
+def update_store(n=LOOKBACK):
+    """Make sure the latest `n` sessions are in bhav_store; only new days are downloaded/ingested."""
+    known = set(bhav_store.ingested_dates())
+    sessions = get_last_n_bhavcopies(n, known=known)
+    added = 0
+    for date, path in sessions:
+        if path == STORED:
+            continue
         df = extract_ohlc_from_zip(path, date)
         if df is not None:
-            combined.append(df)
+            bhav_store.ingest_day(date, df)
+            added += 1
+    print(f"🗄️ Store up to date: {added} new session(s) ingested")
+    return [d for d, _ in sessions]
+
+def run_screener(lookback=LOOKBACK):
+    print("📥 Updating Bhavcopy store...")
+    sessions = update_store(lookback)
+
+    if not sessions:
+        print("❌ Could not get any Bhavcopy data.")
+        return
 
-    all_data = pd.concat(combined) if combined else None
-    if all_data is None:
+    print("🧾 Loading OHLC data from store...")
+    all_data = bhav_store.load_last_n(lookback, columns=['open', 'high', 'low', 'close'], end=sessions[0])
+    if all_data.empty:
         print("❌ No data extracted.")
         return
 
@@ -128,7 +249,7 @@ def run_screener():
 
     passed = result[result['PASS']]
     print(f"\n🏆 {len(passed)} stocks passed the screener:")
-    print(passed[['symbol'] + [f'C{i}' for i in range(1, 7)]])
+    print(passed.drop(columns=['PASS']))
 
 # === Entry Point ===
 if __name__ == "__main__":
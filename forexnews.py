@@ -4,19 +4,21 @@ import json
 import logging
 from datetime import datetime
 import threading
-from flask import Flask, jsonify
+import signal
+from flask import Flask, jsonify, request, abort
 import os, shutil
 from dotenv import load_dotenv
-from nse2bot2 import poll_updates
+import lease
+import clock
+import trading_calendar
+import watchlist
+from cpr import cpr_band, PATTERN_THRESHOLDS
+from trading_calendar import IST
+from datetime import date, timezone
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pandas as pd
-from datetime import date
+# Selenium/pandas (calendar scraper) and nse2bot2 (nsepython, tabulate) are
+# imported where they are used so a restart is serving within a second:
+#   python -X importtime -c "import forexnews"
 
 
 
@@ -33,10 +35,17 @@ OANDA_URL = os.getenv('OANDA_URL')
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+# Overlapping instances (rolling deploys) share LEASE_BACKEND; only the holder sends
+elector = lease.from_env()
+# "polling" (default) or "webhook" for the NSE Excel bot
+TELEGRAM_MODE = os.getenv('TELEGRAM_MODE', 'polling').lower()
+# Set NSE_BOT=0 to run only the forex side (skips loading nsepython/pandas entirely)
+NSE_BOT = os.getenv('NSE_BOT', '1').lower() not in ('0', 'false', 'no', 'off')
+
 # Track sent alerts to prevent duplicates
 sent_alerts = {}
 ALERT_EXPIRY = 1800  # 30 minutes in seconds
-last_clear_time = time.time()
+last_clear_time = clock.time()
 today_events = []
 last_fetched_date = None
 breakout_alerts = {}
@@ -57,13 +66,13 @@ HEADERS = {
 # clear_expired_alerts
 # run_flask
 # keep_server_alive
-# poll_updates (already imported)
+# nse2bot2.poll_updates (imported by start_nse_bot)
 
 def clear_expired_alerts():
     """Clear expired alerts every 30 mins and reset daily breakouts at midnight"""
     global last_clear_time
-    current_time = time.time()
-    now = datetime.now()
+    current_time = clock.time()
+    now = clock.now()
 
     # Clear if 30 mins passed or it's just after midnight
     if current_time - last_clear_time >= ALERT_EXPIRY or now.strftime('%H:%M') == "00:01":
@@ -79,7 +88,7 @@ def is_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type if level_type else ''}"
     if key in sent_alerts:
         # Check if alert is still valid (within 30 minutes)
-        if time.time() - sent_alerts[key] < ALERT_EXPIRY:
+        if clock.time() - sent_alerts[key] < ALERT_EXPIRY:
             return True
         # Remove expired alert
         del sent_alerts[key]
@@ -88,18 +97,24 @@ def is_alert_sent(instrument, timeframe, pattern_type, level_type=None):
 def mark_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     """Mark an alert as sent"""
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type if level_type else ''}"
-    sent_alerts[key] = time.time()
+    sent_alerts[key] = clock.time()
 
-def send_telegram_alert(message):
-    
+def send_telegram_alert(message, chat_id=None):
+    # Only the lease holder sends; a standby keeps the alert for a bar and sends
+    # it if it takes over before the old leader recorded it (see lease.py)
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    if not elector.deliver(lease.alert_key(chat_id, message), lambda: _post_telegram(message, chat_id)):
+        print("Standby replica; holding alert")
+
+def _post_telegram(message, chat_id):
     try:
         if not message or not message.strip():
             #logger.error("Cannot send empty message to Telegram")
-            return
+            return False
         print(message,'messagepassss!')        
         url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
         payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
+            "chat_id": chat_id,
             "text": message,
             "parse_mode": "HTML"
         }
@@ -108,24 +123,26 @@ def send_telegram_alert(message):
         response.raise_for_status()
         #logger.info(f"Telegram alert sent: {message}")
         print(response,'response')
+        return True
     except requests.exceptions.RequestException as e:
         #logger.error(f"Failed to send Telegram alert: {str(e)}")
         if hasattr(e.response, 'json'):
             error_data = e.response.json()
             #logger.error(f"Telegram API error: {error_data}")
+        return False
     except Exception as e:
         #logger.error(f"Unexpected error sending Telegram alert: {str(e)}")
-        pass
+        return False
 
 def fetch_calendar_once_per_day():
     global last_fetched_date, today_events 
 
     while True:
-        current_date = date.today()
+        current_date = clock.now().date()
 
         # Check if already fetched today
         if last_fetched_date != current_date:
-            print(f"[{datetime.now()}] Fetching calendar for {current_date}...")
+            print(f"[{clock.now()}] Fetching calendar for {current_date}...")
             try:
                 df = fetch_investing_calendar()
                 if not df.empty:
@@ -138,10 +155,10 @@ def fetch_calendar_once_per_day():
                 print(f"Error fetching calendar: {e}")
 
         # Wait 10 minutes before checking again (low load, avoids unnecessary fetch)
-        time.sleep(600)
+        clock.sleep(600)
 
 
-def check_body_breakout(instrument, timeframe="M30"):
+def check_body_breakout(instrument, timeframe="M30", chat_id=None):
     global breakout_alerts
 
     # Init on first run
@@ -157,11 +174,11 @@ def check_body_breakout(instrument, timeframe="M30"):
             "prev_high": prev["high"],
             "prev_low": prev["low"],
             "alert_sent": False,
-            "date": datetime.now().date()
+            "date": clock.now().date()
         }
 
     # Reset at new day
-    today = datetime.now().date()
+    today = clock.now().date()
     if breakout_alerts[instrument]["date"] != today:
         print(f"[{instrument}] New day detected. Resetting breakout alert.")
         breakout_alerts[instrument]["alert_sent"] = False
@@ -189,18 +206,18 @@ def check_body_breakout(instrument, timeframe="M30"):
 
     if body_low > prev_high:
         msg = f"🚀 <b>{instrument} Bullish Breakout</b>\n\n" \
-              f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n" \
+              f"🕒 Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}\n" \
               f"Open: {candle['open']:.5f}\nClose: {candle['close']:.5f}\n" \
               f"Prev Day High: {prev_high:.5f}"
-        send_telegram_alert(msg)
+        send_telegram_alert(msg, chat_id)
         breakout_alerts[instrument]["alert_sent"] = True
 
     elif body_high < prev_low:
         msg = f"🔻 <b>{instrument} Bearish Breakdown</b>\n\n" \
-              f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n" \
+              f"🕒 Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}\n" \
               f"Open: {candle['open']:.5f}\nClose: {candle['close']:.5f}\n" \
               f"Prev Day Low: {prev_low:.5f}"
-        send_telegram_alert(msg)
+        send_telegram_alert(msg, chat_id)
         breakout_alerts[instrument]["alert_sent"] = True
 
 
@@ -263,7 +280,7 @@ def check_cpr_engulfing1(instrument, timeframe):
                   f"Open: {curr['open']:.5f}\n" \
                   f"Close: {curr['close']:.5f}\n" \
                   f"CPR {level_type}: {level_val:.5f}\n" \
-                  f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                  f"Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
         send_telegram_alert(message)
         mark_alert_sent(instrument, timeframe, pattern_type, level_type)
@@ -275,7 +292,7 @@ def check_cpr_engulfing1(instrument, timeframe):
 
 
 
-def check_cpr_engulfing(instrument, timeframe):
+def check_cpr_engulfing(instrument, timeframe, chat_id=None, range_mult=None, min_pips=None):
     """
     Detect bullish or bearish engulfing near CPR levels (TC or BC).
     Alert every time a valid pattern is found near TC or BC.
@@ -300,7 +317,7 @@ def check_cpr_engulfing(instrument, timeframe):
             return False
 
         prev, curr = recent_candles[-2], recent_candles[-1]
-        threshold = max((high - low) * 0.01, 0.0010)
+        threshold = cpr_band(instrument, high, low, range_mult, min_pips)
 
         checks = [
             {"pattern": "BEARISH", "emoji": "🔻", "engulf_check": is_bearish_engulfing(prev, curr),
@@ -325,9 +342,9 @@ def check_cpr_engulfing(instrument, timeframe):
                     f"Open: {curr['open']:.5f}\n"
                     f"Close: {curr['close']:.5f}\n"
                     f"CPR {check['level_type']}: {check['level_val']:.5f}\n"
-                    f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                    f"Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}"
                 )
-                send_telegram_alert(msg)
+                send_telegram_alert(msg, chat_id)
                 mark_alert_sent(instrument, timeframe, check["pattern"], check["level_type"])
                 return True
 
@@ -361,7 +378,7 @@ def get_chat_id():
 
 def get_next_interval():
     """Calculate seconds until next 30-minute interval"""
-    now = datetime.now()
+    now = clock.now()
     # Calculate minutes until next 30-minute mark
     minutes_until_next = 30 - (now.minute % 30)
     # If we're at a 30-minute mark, wait for the next hour
@@ -387,7 +404,19 @@ def test_telegram_bot():
                   "If you receive this message, the bot is properly configured!"
     send_telegram_alert(test_message)
 
+def _selenium():
+    """Selenium pieces used by the calendar scrapers, imported on first scrape."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    return webdriver, Service, Options, By, WebDriverWait, EC
+
 def fetch_investing_calendar1():
+    webdriver, Service, Options, By, WebDriverWait, EC = _selenium()
+    import pandas as pd
     # Set up headless Chrome options
     options = Options()
     options.add_argument("--headless")
@@ -468,6 +497,8 @@ def fetch_investing_calendar1():
 
 
 def fetch_investing_calendar():
+    webdriver, Service, Options, By, WebDriverWait, EC = _selenium()
+    import pandas as pd
 
 
     # ---- Resolve Chrome/Driver paths (works locally & on Render) ----
@@ -594,10 +625,9 @@ def convert_to_indian_time(time_str):
     try:
         # Parse the time string (assuming it's in GMT/UTC)
         from datetime import datetime, timedelta
-        import pytz
         
         # Create a datetime object for today with the given time
-        today = datetime.now().date()
+        today = clock.now().date()
         
         # Parse the time string (format: HH:MM)
         if ':' in time_str:
@@ -608,11 +638,10 @@ def convert_to_indian_time(time_str):
             
         # Create datetime object in UTC
         utc_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-        utc_time = pytz.utc.localize(utc_time)
+        utc_time = utc_time.replace(tzinfo=timezone.utc)
         
         # Convert to Indian time (IST = UTC+5:30)
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        ist_time = utc_time.astimezone(ist_tz)
+        ist_time = utc_time.astimezone(IST)
         
         # Format in 12-hour format
         return ist_time.strftime('%I:%M %p')
@@ -625,11 +654,9 @@ def is_event_within_30_minutes(time_str):
     """Check if event is within 30 minutes from now"""
     try:
         from datetime import datetime, timedelta
-        import pytz
         
         # Get current time in IST
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist_tz)
+        now = clock.now(IST)
         
         # Parse the event time
         today = now.date()
@@ -640,7 +667,7 @@ def is_event_within_30_minutes(time_str):
             
         # Create event time in IST
         event_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-        event_time = ist_tz.localize(event_time)
+        event_time = event_time.replace(tzinfo=IST)
         
         # Calculate time difference
         time_diff = event_time - now
@@ -815,10 +842,8 @@ def is_event_n_minutes_ahead(time_str, minutes):
     """Return True if event is ~`minutes` ahead (±60 seconds margin)"""
     try:
         from datetime import datetime, timedelta
-        import pytz
 
-        ist_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist_tz)
+        now = clock.now(IST)
 
         if ':' not in time_str:
             return False
@@ -826,7 +851,7 @@ def is_event_n_minutes_ahead(time_str, minutes):
         hour, minute = map(int, time_str.split(':'))
         today = now.date()
         event_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-        event_time = ist_tz.localize(event_time)
+        event_time = event_time.replace(tzinfo=IST)
 
         delta_seconds = (event_time - now).total_seconds()
         return (minutes * 60 - 60) <= delta_seconds <= (minutes * 60 + 60)
@@ -855,9 +880,9 @@ def send_today_economic_events():
               f"📌 Event: {row['event']}\n" \
               f"⚠️ Impact: High"
         send_telegram_alert(msg)
-        time.sleep(1)
+        clock.sleep(1)
 
-def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
+def check_engulfing(instrument="EUR_GBP", timeframe="M1", chat_id=None):
     try:
         candles = get_candles(instrument, timeframe)
         if len(candles) < 2:
@@ -875,8 +900,8 @@ def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
                      f"Timeframe: {timeframe}\n" \
                      f"Open: {curr['open']:.5f}\n" \
                      f"Close: {curr['close']:.5f}\n" \
-                     f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+                     f"Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BULLISH")
             return message
         elif is_bearish_engulfing(prev, curr):
@@ -889,8 +914,8 @@ def check_engulfing(instrument="EUR_GBP", timeframe="M1"):
                      f"Timeframe: {timeframe}\n" \
                      f"Open: {curr['open']:.5f}\n" \
                      f"Close: {curr['close']:.5f}\n" \
-                     f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            send_telegram_alert(message)
+                     f"Time: {clock.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            send_telegram_alert(message, chat_id)
             mark_alert_sent(instrument, timeframe, "BEARISH")
             return message
         return None
@@ -954,7 +979,7 @@ def monitor_today_events():
 
     while True:
         if not today_events:
-            time.sleep(60)
+            clock.sleep(60)
             continue
 
         for event in today_events:
@@ -987,14 +1012,14 @@ def monitor_today_events():
                 send_telegram_alert(msg)
                 already_alerted_5min.add(key)
 
-        time.sleep(60)
+        clock.sleep(60)
 
     already_alerted_30min = set()
     already_alerted_5min = set()
 
     while True:
         if not today_events:
-            time.sleep(60)
+            clock.sleep(60)
             continue
 
         upcoming_30min = []
@@ -1028,7 +1053,7 @@ def monitor_today_events():
                 msg += f"{impact_emoji} {ist} | {ev['currency']} | {ev['event']}\n"
             send_telegram_alert(msg)
 
-        time.sleep(60)
+        clock.sleep(60)
 
 def monitor_today_events12():
     # global today_events
@@ -1036,7 +1061,7 @@ def monitor_today_events12():
 
     while True:
         if not today_events:
-            time.sleep(60)
+            clock.sleep(60)
             continue
 
         upcoming = []
@@ -1056,30 +1081,68 @@ def monitor_today_events12():
 
             send_telegram_alert(msg)
 
-        time.sleep(600)  # Run again every 10 minutes to avoid spamming
+        clock.sleep(600)  # Run again every 10 minutes to avoid spamming
 
 
-def pattern_monitor(instrument, timeframes):
+PATTERN_CHECKS = {
+    "engulfing": check_engulfing,
+    "cpr_engulfing": check_cpr_engulfing,
+    "body_breakout": check_body_breakout,
+}
+
+def pattern_monitor(instrument, timeframes, runner=None):
+    market = trading_calendar.market_of(instrument)
+    patterns, thresholds, chat = tuple(PATTERN_CHECKS), {}, None
     while True:
         try:
             wait_seconds = get_next_interval()
+            # Skip the closed session (FX weekend) instead of waking every 30 minutes
+            due = trading_calendar.next_check(market, clock.time() + wait_seconds, 30 * 60)
+            wait_seconds = max(wait_seconds, due - clock.time())
             print(f"Waiting {wait_seconds//60} mins for next check on {instrument}")
-            time.sleep(wait_seconds)
+            clock.sleep(wait_seconds)
+            if runner is not None:
+                job = runner.job(instrument)
+                if job is None:
+                    print(f"{instrument} removed from watchlist; monitor stopped")
+                    return
+                timeframes, patterns, thresholds, chat = job.timeframes, job.patterns, job.thresholds, job.chat
             clear_expired_alerts()
 
             for tf in timeframes:
-                check_engulfing(instrument, tf)
-                check_cpr_engulfing(instrument, tf)
-                check_body_breakout(instrument, tf)
-                time.sleep(1)  # rate limit
+                for name in patterns:
+                    PATTERN_CHECKS[name](instrument, tf, chat_id=chat, **thresholds.get(name, {}))
+                clock.sleep(1)  # rate limit
         except Exception as e:
             print(f"Error in pattern monitor for {instrument}: {str(e)}")
-            time.sleep(300)
+            clock.sleep(300)
 
 @app.route('/')
 def home():
     return jsonify({"status": "alive", "message": "Forex Bot is running"})
 
+@app.route('/telegram/webhook', methods=['POST'])
+def telegram_webhook():
+    """Receive NSE bot updates from Telegram and hand them to the dispatcher queue."""
+    if not NSE_BOT:
+        abort(404)
+    import nse2bot2
+    if not nse2bot2.is_valid_webhook_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        abort(403)
+    update = request.get_json(silent=True)
+    if not isinstance(update, dict):
+        abort(400)
+    nse2bot2.enqueue_update(update)
+    return jsonify({"ok": True})
+
+def start_nse_bot():
+    """Import and start the NSE Excel bot (polling blocks, so run it in a thread)."""
+    import nse2bot2
+    if TELEGRAM_MODE == 'webhook':
+        nse2bot2.start_webhook_mode()
+    else:
+        nse2bot2.poll_updates()
+
 def run_flask():
     app.run(host='0.0.0.0', port=10000)
 
@@ -1088,47 +1151,47 @@ def keep_server_alive():
         try:
             response = requests.get('https://forex-bot-1-c7bj.onrender.com/')
             if response.status_code == 200:
-                print(f"Server alive check OK - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", flush=True)
+                print(f"Server alive check OK - {clock.now().strftime('%Y-%m-%d %H:%M:%S')}", flush=True)
             else:
                 print(f"Server alive check failed: {response.status_code}", flush=True)
         except Exception as e:
             print(f"Error keeping server alive: {str(e)}", flush=True)
-        time.sleep(60)
+        clock.sleep(60)
 
 def main():
 
     #test_telegram_bot()
 
+    # Render stops an instance with SIGTERM: unwind like Ctrl-C so the lease is freed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    elector.start()
+
     threading.Thread(target=run_flask, daemon=True).start()
     threading.Thread(target=keep_server_alive, daemon=True).start()
-    threading.Thread(target=poll_updates, daemon=True).start()
+    if NSE_BOT and TELEGRAM_MODE == 'webhook':
+        start_nse_bot()  # returns once registered; a bad webhook config should stop startup
+    elif NSE_BOT:
+        threading.Thread(target=start_nse_bot, name="nse-bot", daemon=True).start()
 
     # threading.Thread(target=monitor_today_events, daemon=True).start()
     # threading.Thread(target=fetch_calendar_once_per_day, daemon=True).start()
 
 
-    # Step 3: Monitor instruments for patterns
-    instrument_timeframes = {
-        "EUR_USD": ["M30"],
-        "XAU_USD": ["H1"],
-        "NZD_USD": ["M30"],
-        "ETH_USDT": ["H1"]
-    }
-
-    for instrument, timeframes in instrument_timeframes.items():
-        threading.Thread(
-            target=pattern_monitor,
-            args=(instrument, timeframes),
-            daemon=True
-        ).start()
-        print(f"Started monitoring {instrument} on timeframes: {', '.join(timeframes)}")
+    # Step 3: Monitor the watchlist instruments for patterns (file is hot-reloaded)
+    monitors = watchlist.Runner(pattern_monitor, patterns=PATTERN_THRESHOLDS)
+    monitors.reload()
+    for job in monitors.jobs.values():
+        print(f"Started monitoring {job.instrument} on timeframes: {', '.join(job.timeframes)}")
+    threading.Thread(target=monitors.watch, daemon=True).start()
 
     try:
         while True:
-            print(f"Bot is alive - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            time.sleep(600)
+            print(f"Bot is alive - {clock.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            clock.sleep(600)
     except KeyboardInterrupt:
         print("Stopped by user.")
+    finally:
+        elector.release()
 
 if __name__ == "__main__":
     test_telegram_bot()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
-import time
+import sys
+import signal
 import threading
 import argparse
 from datetime import datetime, timezone, date
@@ -8,17 +9,31 @@ from typing import Iterable, Optional, List, Dict, Tuple
 import collections
 from urllib.parse import urljoin
 import random
+import json
 
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify
+from flask import Flask, jsonify, Response
+
+import clock
+from candle_cache import CandleCache
+from indicators import EMA, WilderATR, RollingMax, RollingMin
+import instruments
+import lease
+import metrics
+from metrics import timed
+from ratelimit import TokenBucket
+import resample
+from tracing import Tracer
+import trading_calendar
+import watchlist
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Env & globals
 # ──────────────────────────────────────────────────────────────────────────────
 load_dotenv()
 OANDA_API_KEY      = os.getenv('OANDA_API_KEY')
-OANDA_ACCOUNT_ID   = os.getenv('OANDA_ACCOUNT_ID')   # unused here, kept for future
+OANDA_ACCOUNT_ID   = os.getenv('OANDA_ACCOUNT_ID')   # instrument metadata (pip sizes)
 OANDA_URL          = os.getenv('OANDA_URL')          # e.g. https://api-fxpractice.oanda.com/v3
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID   = os.getenv('TELEGRAM_CHAT_ID')
@@ -30,6 +45,16 @@ ALERT_LEAD_MIN  = int(os.getenv("ALERT_LEAD_MIN", "30"))   # alert N minutes bef
 
 HEADERS = {'Authorization': f'Bearer {OANDA_API_KEY}'}
 
+# Candle cache: fetch one base granularity per instrument, derive the rest locally
+USE_CANDLE_CACHE = os.getenv("CANDLE_CACHE", "1") == "1"
+CANDLE_BASE_TF   = os.getenv("CANDLE_BASE_TF", "M30")
+INDICATOR_STATE_FILE = os.getenv("INDICATOR_STATE_FILE", "")  # JSON snapshot of indicator state
+
+# CPR proximity band: CPR_ATR_MULT x daily ATR(CPR_ATR_PERIOD), never tighter than CPR_MIN_PIPS
+CPR_ATR_PERIOD = int(os.getenv("CPR_ATR_PERIOD", "14"))
+CPR_ATR_MULT   = float(os.getenv("CPR_ATR_MULT", "0.1"))
+CPR_MIN_PIPS   = float(os.getenv("CPR_MIN_PIPS", "3"))
+
 try:
     from zoneinfo import ZoneInfo  # Py3.9+
 except Exception:
@@ -39,10 +64,18 @@ IST   = ZoneInfo("Asia/Kolkata") if ZoneInfo else None
 NY_TZ = ZoneInfo("America/New_York") if ZoneInfo else None
 
 # App timezone: prefer IST; fall back to server local tz (always aware)
-APP_TZ = IST or datetime.now().astimezone().tzinfo
+APP_TZ = IST or datetime.now().astimezone().tzinfo  # import-time, real clock
 FAR_FUTURE = datetime.max.replace(tzinfo=APP_TZ)
 
-FF_BASE = "https://nfs.faireconomy.media"
+FF_BASE = os.getenv("FF_BASE", "https://nfs.faireconomy.media")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# Telegram bot limits: ~30 messages/s overall, 20/min into any one group chat
+TELEGRAM_RATE_PER_SEC      = float(os.getenv("TELEGRAM_RATE_PER_SEC", "25"))
+TELEGRAM_CHAT_RATE_PER_MIN = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MIN", "20"))
+
+# Worker processes (0 = monitors run as threads in this process; see supervisor.py)
+WORKERS = int(os.getenv("FXALERT_WORKERS", "0"))
 PERIOD_TO_PATH = {
     "thisweek": "ff_calendar_thisweek.json",
     "nextweek": "ff_calendar_nextweek.json",
@@ -50,6 +83,50 @@ PERIOD_TO_PATH = {
 }
 VALID_IMPACTS = {"Holiday", "Low", "Medium", "High"}
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Metrics (served at /metrics)
+# ──────────────────────────────────────────────────────────────────────────────
+UPSTREAM_SECONDS = metrics.Histogram("fxalert_upstream_request_seconds", "Upstream HTTP call latency", ["upstream"])
+UPSTREAM_ERRORS  = metrics.Counter("fxalert_upstream_errors_total", "Failed upstream HTTP calls", ["upstream"])
+CHECK_SECONDS    = metrics.Histogram("fxalert_check_seconds", "Pattern check latency",
+                                     ["check", "instrument", "timeframe"])
+CHECK_ERRORS     = metrics.Counter("fxalert_check_errors_total", "Pattern checks that raised",
+                                   ["check", "instrument", "timeframe"])
+SCAN_SECONDS     = metrics.Histogram("fxalert_scan_seconds", "All checks for one instrument/timeframe",
+                                     ["instrument", "timeframe"])
+ALERTS_SENT      = metrics.Counter("fxalert_telegram_messages_total", "Telegram messages by outcome", ["outcome"])
+TELEGRAM_PENDING = metrics.Gauge("fxalert_telegram_pending", "Telegram sends in flight (alert queue depth)")
+
+CHECKS_DEFERRED  = metrics.Counter("fxalert_checks_deferred_total", "Bar-close checks skipped while the market was closed",
+                                   ["instrument"])
+ALERT_LATENCY    = metrics.Histogram("fxalert_alert_latency_seconds", "Bar close to Telegram acknowledgement",
+                                     ["instrument", "timeframe"],
+                                     buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+
+# Per-signal latency traces: bar close -> fetched -> detected -> enqueued -> acked
+tracer = Tracer(clock=clock.time)
+
+def _observe_trace(trace):
+    st = trace.stamps
+    if "acked" in st and "bar_close" in st:
+        ALERT_LATENCY.observe(st["acked"] - st["bar_close"], instrument=trace.instrument, timeframe=trace.timeframe)
+
+tracer.on_finish(_observe_trace)
+
+def start_trace(instrument, timeframe, pattern, candle, fetched_at):
+    """Trace for a signal detected on `candle` (bar close = candle open + timeframe)."""
+    close = resample.parse_time(candle["time"]).timestamp() + resample.TF_SECONDS.get(timeframe, 0)
+    return tracer.start(instrument, timeframe, pattern, bar_close=close).mark("fetched", fetched_at).mark("detected")
+
+def _check_labels(instrument, timeframe="M30", *a, **kw):
+    return {"instrument": instrument, "timeframe": timeframe}
+
+def timed_check(fn):
+    """Record latency/errors of a pattern check, labelled by check, instrument and timeframe."""
+    name = fn.__name__
+    return metrics.instrument(CHECK_SECONDS, CHECK_ERRORS,
+                              labels=lambda *a, **kw: {"check": name, **_check_labels(*a, **kw)})(fn)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Flask liveness (Render)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -61,7 +138,7 @@ def home():
     return jsonify({
         "status": "alive",
         "message": "Forex Bot is running",
-        "now": datetime.now(APP_TZ).strftime("%Y-%m-%d %H:%M:%S %Z")
+        "now": clock.now(APP_TZ).strftime("%Y-%m-%d %H:%M:%S %Z")
     })
 @app.route('/healthz')
 def healthz():
@@ -70,11 +147,28 @@ def healthz():
         "ok": True,
         "service": "forex-bot",
         "tz": str(APP_TZ),
-        "epoch": time.time(),
-        "now": datetime.now(APP_TZ).strftime("%Y-%m-%d %H:%M:%S %Z")
+        "epoch": clock.time(),
+        "now": clock.now(APP_TZ).strftime("%Y-%m-%d %H:%M:%S %Z"),
+        "leader": elector.is_leader(),
     })
 
 
+@app.route('/latency')
+def latency():
+    # Bar-close-to-alert percentiles over the recent signal window
+    return jsonify(tracer.summary())
+
+@app.route('/watchlist')
+def watchlist_endpoint():
+    # Jobs currently applied from the watchlist file, plus rejected entries
+    return jsonify(monitors.summary())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 def run_flask():
     port = int(os.getenv("PORT", "10000"))
     app.run(host="0.0.0.0", port=port)
@@ -104,83 +198,232 @@ def keep_server_alive():
         try:
             r = requests.get(API_URL, timeout=10)
             if r.status_code == 200:
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping OK", flush=True)
+                print(f"[{clock.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping OK", flush=True)
             else:
-                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping non-200: {r.status_code}", flush=True)
+                print(f"[{clock.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping non-200: {r.status_code}", flush=True)
         except Exception as e:
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping error: {e}", flush=True)
-        time.sleep(60)
+            print(f"[{clock.now().strftime('%Y-%m-%d %H:%M:%S')}] Self-ping error: {e}", flush=True)
+        clock.sleep(60)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Telegram
 # ──────────────────────────────────────────────────────────────────────────────
-def send_telegram_alert(message: str):
+telegram_limit = TokenBucket(TELEGRAM_RATE_PER_SEC, per=1.0, clock=clock.monotonic, sleep=clock.sleep)
+_chat_limits = {}
+_chat_limits_lock = threading.Lock()
+
+# Sharded workers set this to hand alerts to the supervisor's queue: fn(message, chat_id, trace)
+alert_sink = None
+
+# Only the lease holder delivers; standby replicas run everything else to stay warm (see lease.py)
+elector = lease.from_env()
+metrics.Gauge("fxalert_leader", "1 while this replica holds the alert lease",
+              fn=lambda: 1.0 if elector.is_leader() else 0.0)
+
+def chat_limit(chat_id):
+    """Per-chat token bucket (TELEGRAM_CHAT_RATE_PER_MIN), created on first use."""
+    with _chat_limits_lock:
+        bucket = _chat_limits.get(chat_id)
+        if bucket is None:
+            bucket = _chat_limits[chat_id] = TokenBucket(TELEGRAM_CHAT_RATE_PER_MIN, per=60.0,
+                                                         clock=clock.monotonic, sleep=clock.sleep)
+        return bucket
+
+def send_telegram_alert(message: str, trace=None, chat_id=None):
+    if trace is not None:
+        trace.mark("enqueued")
+    if alert_sink is not None:
+        alert_sink(message, chat_id, trace)
+        return
+    deliver_telegram(message, trace, chat_id)
+
+def deliver_telegram(message: str, trace=None, chat_id=None, chat_token=False):
+    """
+    POST one message within the per-chat and global rate limits; finishes `trace`.
+    `chat_token=True` means the caller already took this chat's token (see
+    supervisor.ChatOutbox), so only the global bucket is waited on here.
+    A standby keeps the alert until its bar is over and sends it if promoted
+    before then, unless the old leader's journal already has it.
+    """
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    hold_until = None
+    if trace is not None and "bar_close" in trace.stamps:
+        hold_until = trace.stamps["bar_close"] + resample.TF_SECONDS.get(trace.timeframe, 0)
+        key = lease.alert_key(chat_id, message, trace.instrument, trace.timeframe, trace.pattern,
+                              trace.stamps["bar_close"])
+    else:
+        key = lease.alert_key(chat_id, message)
     try:
-        if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
+        if not elector.deliver(key, lambda: _post_telegram(message, trace, chat_id, chat_token), hold_until,
+                               later=lambda: _post_telegram(message, None, chat_id)):
+            ALERTS_SENT.inc(outcome="standby")
+    finally:
+        if trace is not None:
+            tracer.finish(trace)
+
+def _post_telegram(message: str, trace=None, chat_id=None, chat_token=False) -> bool:
+    try:
+        if not (TELEGRAM_BOT_TOKEN and chat_id):
             print("Telegram env not set; printing message:\n", message)
-            return
+            return True
         if not message.strip():
-            return
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {"chat_id": TELEGRAM_CHAT_ID, "text": message, "parse_mode": "HTML"}
-        resp = requests.post(url, json=payload, timeout=15)
-        resp.raise_for_status()
+            return False
+        url = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+        payload = {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
+        TELEGRAM_PENDING.inc()
+        try:
+            # chat first: a global token is only taken once this chat may send
+            if not chat_token:
+                chat_limit(chat_id).acquire()
+            telegram_limit.acquire()
+            with timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, upstream="telegram"):
+                resp = requests.post(url, json=payload, timeout=15)
+                resp.raise_for_status()
+        finally:
+            TELEGRAM_PENDING.dec()
+        ALERTS_SENT.inc(outcome="ok")
+        if trace is not None:
+            trace.mark("acked")
+        return True
     except Exception as e:
+        ALERTS_SENT.inc(outcome="error")
         print(f"Telegram send error: {e}")
+        return False
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Alert de-dupe (pattern monitors)
 # ──────────────────────────────────────────────────────────────────────────────
 sent_alerts = {}         # key -> last_sent_epoch
 ALERT_EXPIRY = 30 * 60   # 30 minutes
-last_clear_time = time.time()
+last_clear_time = clock.time()
+
+metrics.Gauge("fxalert_threads", "Live Python threads", fn=threading.active_count)
+metrics.Gauge("fxalert_dedupe_entries", "Alert keys currently suppressed", fn=lambda: len(sent_alerts))
 
 def clear_expired_alerts():
     global last_clear_time
-    now = time.time()
+    now = clock.time()
     if now - last_clear_time >= ALERT_EXPIRY:
         sent_alerts.clear()
         last_clear_time = now
-        print(f"[{datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}] Cleared expired alerts")
+        print(f"[{clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}] Cleared expired alerts")
 
 def is_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     clear_expired_alerts()
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type or ''}"
     ts = sent_alerts.get(key)
-    return bool(ts and (time.time() - ts) < ALERT_EXPIRY)
+    return bool(ts and (clock.time() - ts) < ALERT_EXPIRY)
 
 def mark_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type or ''}"
-    sent_alerts[key] = time.time()
+    sent_alerts[key] = clock.time()
 
 # ──────────────────────────────────────────────────────────────────────────────
 # OANDA candles
 # ──────────────────────────────────────────────────────────────────────────────
+def fetch_candles(instrument, granularity, **params):
+    """Raw OANDA candles (forming candle included) as dicts, oldest first."""
+    url = f"{OANDA_URL}/instruments/{instrument}/candles"
+    params = {"granularity": granularity, "price": "M", **params}
+    with timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, upstream="oanda"):
+        r = requests.get(url, headers=HEADERS, params=params, timeout=20)
+        r.raise_for_status()
+    out = []
+    for c in r.json().get("candles", []):
+        out.append({
+            "open": float(c["mid"]["o"]),
+            "high": float(c["mid"]["h"]),
+            "low":  float(c["mid"]["l"]),
+            "close":float(c["mid"]["c"]),
+            "time": c["time"],
+            "complete": c["complete"]
+        })
+    return out
+
+# One base series per instrument; H1/H4/D/W are resampled from it locally
+candle_cache = CandleCache(fetch_candles, base_tf=CANDLE_BASE_TF, clock=clock.time)
+
+metrics.Gauge("fxalert_candle_cache_hit_ratio", "Share of candle lookups served without an OANDA call",
+              fn=lambda: candle_cache.hit_ratio())
+metrics.Gauge("fxalert_candle_cache_fetches", "OANDA candle fetches made by the cache", fn=lambda: candle_cache.misses)
+
+# Incremental indicators kept on the cached series (updated once per new bar)
+candle_cache.track("D", atr=lambda: WilderATR(CPR_ATR_PERIOD))
+for _tf in ("M30", "H1"):
+    candle_cache.track(_tf, ema50=lambda: EMA(50), high20=lambda: RollingMax(20), low20=lambda: RollingMin(20))
+
 def get_candles(instrument="EUR_USD", timeframe="H1", count=2):
     """Return last `count` completed candles as dicts."""
     try:
-        url = f"{OANDA_URL}/instruments/{instrument}/candles"
-        params = {"count": max(count * 3, 10), "granularity": timeframe, "price": "M"}
-        r = requests.get(url, headers=HEADERS, params=params, timeout=20)
-        r.raise_for_status()
-        data = r.json()
-        candles = [c for c in data.get("candles", []) if c.get("complete")]
-        final = candles[-count:]
-        out = []
-        for c in final:
-            out.append({
-                "open": float(c["mid"]["o"]),
-                "high": float(c["mid"]["h"]),
-                "low":  float(c["mid"]["l"]),
-                "close":float(c["mid"]["c"]),
-                "time": c["time"],
-                "complete": c["complete"]
-            })
-        return out
+        if USE_CANDLE_CACHE and candle_cache.serves(timeframe, count):
+            return candle_cache.get(instrument, timeframe, count)
+        candles = fetch_candles(instrument, timeframe, count=max(count * 3, 10))
+        candles = [c for c in candles if c["complete"]]
+        return candles[-count:]
     except Exception as e:
         print(f"get_candles error {instrument} {timeframe}: {e}")
         return []
 
+def get_indicators(instrument, timeframe):
+    """Latest indicator values for instrument/timeframe ({} if unavailable)."""
+    if not USE_CANDLE_CACHE:
+        return {}
+    try:
+        return candle_cache.indicators(instrument, timeframe)
+    except Exception as e:
+        print(f"get_indicators error {instrument} {timeframe}: {e}")
+        return {}
+
+def save_indicator_state(path=None):
+    path = path or INDICATOR_STATE_FILE
+    if not path:
+        return
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(candle_cache.snapshot(), f)
+    os.replace(tmp, path)
+
+def load_indicator_state(path=None):
+    path = path or INDICATOR_STATE_FILE
+    if not (path and os.path.exists(path)):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            candle_cache.restore(json.load(f))
+        print(f"Restored indicator state from {path}")
+    except Exception as e:
+        print(f"Indicator state restore failed ({path}): {e}")
+
+def daily_atr(instrument):
+    """Daily ATR from the cached history (falls back to one D request when the cache is off)."""
+    atr = get_indicators(instrument, "D").get("atr")
+    if atr is not None:
+        return atr
+    daily = get_candles(instrument, "D", count=CPR_ATR_PERIOD + 1)
+    if len(daily) < CPR_ATR_PERIOD:
+        return None
+    ind = WilderATR(CPR_ATR_PERIOD)
+    for c in daily:
+        ind.update(c)
+    return ind.value
+
+def cpr_threshold(instrument, prev_day, atr_mult=CPR_ATR_MULT, min_pips=CPR_MIN_PIPS):
+    """Proximity band around TC/BC, scaled to the instrument's volatility and pip size."""
+    pip = instruments.pip_size(instrument)
+    floor = min_pips * pip
+    atr = daily_atr(instrument)
+    if atr is None:
+        # not enough history yet: ~1% of yesterday's range
+        return max((prev_day["high"] - prev_day["low"]) * 0.01, floor)
+    return max(atr * atr_mult, floor)
+
+def trend_line(instrument, timeframe, close):
+    """'EMA50: x (above/below)' context line for alerts, empty if not warmed up."""
+    ema = get_indicators(instrument, timeframe).get("ema50")
+    if ema is None:
+        return ""
+    return f"EMA50: {ema:.5f} ({'above' if close > ema else 'below'})\n"
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Pattern logic (engulfing / CPR / body breakout)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -194,8 +437,10 @@ def is_bearish_engulfing(prev, curr):
             curr['open'] >  prev['open']  and
             curr['close'] < prev['open'])
 
-def check_engulfing(instrument="EUR_USD", timeframe="M30"):
+@timed_check
+def check_engulfing(instrument="EUR_USD", timeframe="M30", chat_id=None):
     candles = get_candles(instrument, timeframe, count=2)
+    fetched_at = tracer.clock()
     if len(candles) < 2:
         return
     prev, curr = candles[-2], candles[-1]
@@ -204,19 +449,24 @@ def check_engulfing(instrument="EUR_USD", timeframe="M30"):
         msg = (f"🚀 <b>BULLISH Engulfing</b>\n\n"
                f"Pair: {instrument}\nTF: {timeframe}\n"
                f"Open: {curr['open']:.5f}\nClose: {curr['close']:.5f}\n"
-               f"Time: {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
-        send_telegram_alert(msg)
+               f"{trend_line(instrument, timeframe, curr['close'])}"
+               f"Time: {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
+        trace = start_trace(instrument, timeframe, "BULLISH", curr, fetched_at)
+        send_telegram_alert(msg, trace=trace, chat_id=chat_id)
         mark_alert_sent(instrument, timeframe, "BULLISH")
 
     elif is_bearish_engulfing(prev, curr) and not is_alert_sent(instrument, timeframe, "BEARISH"):
         msg = (f"🔻 <b>BEARISH Engulfing</b>\n\n"
                f"Pair: {instrument}\nTF: {timeframe}\n"
                f"Open: {curr['open']:.5f}\nClose: {curr['close']:.5f}\n"
-               f"Time: {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
-        send_telegram_alert(msg)
+               f"{trend_line(instrument, timeframe, curr['close'])}"
+               f"Time: {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
+        trace = start_trace(instrument, timeframe, "BEARISH", curr, fetched_at)
+        send_telegram_alert(msg, trace=trace, chat_id=chat_id)
         mark_alert_sent(instrument, timeframe, "BEARISH")
 
-def check_cpr_engulfing(instrument, timeframe):
+@timed_check
+def check_cpr_engulfing(instrument, timeframe, chat_id=None, atr_mult=CPR_ATR_MULT, min_pips=CPR_MIN_PIPS):
     daily = get_candles(instrument, "D", count=2)
     if len(daily) < 2:
         print(f"[{instrument}] Not enough daily candles for CPR.")
@@ -229,12 +479,13 @@ def check_cpr_engulfing(instrument, timeframe):
     tc = 2 * pivot - bc
 
     rec = get_candles(instrument, timeframe, count=2)
+    fetched_at = tracer.clock()
     if len(rec) < 2:
         print(f"[{instrument} - {timeframe}] Not enough recent candles.")
         return
 
     prev, curr = rec[-2], rec[-1]
-    threshold = max((H - L) * 0.01, 0.0010)  # ~1% of range or 10 pips fallback
+    threshold = cpr_threshold(instrument, prev_day, atr_mult, min_pips)
 
     checks = [
         {"pattern": "BEARISH", "emoji": "🔻", "engulf": is_bearish_engulfing(prev, curr),
@@ -249,16 +500,18 @@ def check_cpr_engulfing(instrument, timeframe):
                    f"Pair: {instrument}\nTF: {timeframe}\n"
                    f"Open: {curr['open']:.5f}\nClose: {curr['close']:.5f}\n"
                    f"CPR {ck['level_type']}: {ck['level_val']:.5f}\n"
-                   f"Time: {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
-            send_telegram_alert(msg)
+                   f"Time: {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
+            trace = start_trace(instrument, timeframe, f"{ck['pattern']}_CPR_{ck['level_type']}", curr, fetched_at)
+            send_telegram_alert(msg, trace=trace, chat_id=chat_id)
             mark_alert_sent(instrument, timeframe, ck["pattern"], ck["level_type"])
             return
 
 # Track daily H/L + one-time alert per day
 breakout_state = {}  # instrument -> {prev_high, prev_low, date, alert_sent}
 
-def check_body_breakout(instrument, timeframe="M30"):
-    today = datetime.now(APP_TZ).date()
+@timed_check
+def check_body_breakout(instrument, timeframe="M30", chat_id=None):
+    today = clock.now(APP_TZ).date()
     if instrument not in breakout_state or breakout_state[instrument]["date"] != today:
         daily = get_candles(instrument, "D", count=2)
         if len(daily) < 2:
@@ -277,6 +530,7 @@ def check_body_breakout(instrument, timeframe="M30"):
         return
 
     last = get_candles(instrument, timeframe, count=1)
+    fetched_at = tracer.clock()
     if not last:
         return
     c = last[0]
@@ -286,17 +540,31 @@ def check_body_breakout(instrument, timeframe="M30"):
     if body_low > st["prev_high"]:
         msg = (f"🚀 <b>{instrument} Bullish Body Breakout</b>\n\n"
                f"TF: {timeframe}\nOpen: {c['open']:.5f}\nClose: {c['close']:.5f}\n"
-               f"Prev Day High: {st['prev_high']:.5f}\nTime: {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
-        send_telegram_alert(msg)
+               f"Prev Day High: {st['prev_high']:.5f}\nTime: {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
+        trace = start_trace(instrument, timeframe, "BODY_BREAKOUT", c, fetched_at)
+        send_telegram_alert(msg, trace=trace, chat_id=chat_id)
         st["alert_sent"] = True
 
     elif body_high < st['prev_low']:
         msg = (f"🔻 <b>{instrument} Bearish Body Breakdown</b>\n\n"
                f"TF: {timeframe}\nOpen: {c['open']:.5f}\nClose: {c['close']:.5f}\n"
-               f"Prev Day Low: {st['prev_low']:.5f}\nTime: {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
-        send_telegram_alert(msg)
+               f"Prev Day Low: {st['prev_low']:.5f}\nTime: {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S}")
+        trace = start_trace(instrument, timeframe, "BODY_BREAKDOWN", c, fetched_at)
+        send_telegram_alert(msg, trace=trace, chat_id=chat_id)
         st["alert_sent"] = True
 
+# Watchlist patterns -> check, and the thresholds each accepts
+CHECKS = {
+    "engulfing": check_engulfing,
+    "cpr_engulfing": check_cpr_engulfing,
+    "body_breakout": check_body_breakout,
+}
+CHECK_THRESHOLDS = {"engulfing": (), "cpr_engulfing": ("atr_mult", "min_pips"), "body_breakout": ()}
+
+def run_checks(job, timeframe):
+    for name in job.patterns:
+        CHECKS[name](job.instrument, timeframe, chat_id=job.chat, **job.thresholds.get(name, {}))
+
 # ──────────────────────────────────────────────────────────────────────────────
 # FF calendar (ISO-aware fetch + IST/APP_TZ digest + T-LEAD alerts)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -311,12 +579,13 @@ def _get(url: str, max_retries: int = 5, timeout: int = 20) -> requests.Response
         if resp.status_code < 400:
             return resp
         if resp.status_code in (429, 500, 502, 503, 504):
-            time.sleep(min(2 ** attempt, 30))
+            clock.sleep(min(2 ** attempt, 30))
             continue
         resp.raise_for_status()
     resp.raise_for_status()
     return resp
 
+@metrics.instrument(UPSTREAM_SECONDS, UPSTREAM_ERRORS, labels=lambda *a, **kw: {"upstream": "forexfactory"})
 def fetch_events(
     period: str = "thisweek",
     currencies: Optional[Iterable[str]] = None,
@@ -459,7 +728,7 @@ def build_morning_digest(events: List[Dict]) -> str:
     return "\n".join(lines).strip()
 
 def is_about_n_minutes_ahead_app(ev_dt: datetime, n: int) -> bool:
-    now = datetime.now(APP_TZ)
+    now = clock.now(APP_TZ)
     delta = (ev_dt - now).total_seconds()
     return (n*60 - 60) <= delta <= (n*60 + 60)
 
@@ -483,11 +752,11 @@ def news_loop(period="thisweek", currencies=None, impacts=None, refresh_minutes=
 
     while True:
         try:
-            now_app = datetime.now(APP_TZ)
+            now_app = clock.now(APP_TZ)
             t_app, t_ny, t_utc = calc_today_variants_app(now_app)
 
             # Fetch immediately then every refresh interval
-            if (time.time() - last_fetch_ts) >= (refresh_minutes * 60):
+            if (clock.time() - last_fetch_ts) >= (refresh_minutes * 60):
                 weekly = fetch_events(period, currencies, impacts)
                 print(f"[NEWS] fetched weekly: {len(weekly)} @ {now_app:%Y-%m-%d %H:%M:%S}")
                 print(f"[NEWS] Today APP={t_app}, NY={t_ny}, UTC={t_utc}")
@@ -500,7 +769,7 @@ def news_loop(period="thisweek", currencies=None, impacts=None, refresh_minutes=
                 print(f"[NEWS] Picked for today: {len(todays)} events")
 
                 today_events = todays
-                last_fetch_ts = time.time()
+                last_fetch_ts = clock.time()
 
                 if last_digest_date != t_app:
                     digest = build_morning_digest(today_events)
@@ -511,7 +780,7 @@ def news_loop(period="thisweek", currencies=None, impacts=None, refresh_minutes=
 
             # T-LEAD alerts for timed events
             if today_events:
-                now_app = datetime.now(APP_TZ)
+                now_app = clock.now(APP_TZ)
                 for ev in today_events:
                     ev_dt = parse_event_time_ist(ev)
                     if not ev_dt:
@@ -525,18 +794,18 @@ def news_loop(period="thisweek", currencies=None, impacts=None, refresh_minutes=
                         send_telegram_alert(f"⏳ <b>Event in {alert_lead} minutes</b>\n\n• " + fmt_line(ev))
                         alerted_keys.add(key)
 
-            time.sleep(60)
+            clock.sleep(60)
 
         except Exception as e:
             print(f"[NEWS] loop error: {e}")
-            time.sleep(30)
+            clock.sleep(30)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Scheduling loop for chart patterns
 # ──────────────────────────────────────────────────────────────────────────────
 def get_next_interval():
     """Seconds until next :00/:30 boundary (to check after candle closes)."""
-    now = datetime.now(APP_TZ)
+    now = clock.now(APP_TZ)
     mins = now.minute
     secs = now.second
     mod = mins % 30
@@ -546,21 +815,45 @@ def get_next_interval():
         wait_sec = 30 * 60
     return wait_sec
 
-def pattern_monitor(instrument, timeframes):
+def pattern_monitor(instrument, timeframes, runner=None):
+    """
+    Bar-close loop for one instrument. Under a watchlist runner the job spec is
+    re-read every cycle and the loop ends once the instrument is removed.
+    """
+    market = trading_calendar.market_of(instrument)
+    job = watchlist.Job(instrument, tuple(timeframes), tuple(CHECKS), {}, None)
     while True:
         try:
             wait_seconds = get_next_interval()
-            print(f"[{instrument}] waiting {wait_seconds//60}m for next check @ {datetime.now(APP_TZ):%H:%M:%S}")
-            time.sleep(wait_seconds)
+            # Closed market (FX weekend): sleep straight through to the first close, after the
+            # open, of the instrument's shortest timeframe
+            planned = clock.time() + wait_seconds
+            step = min((resample.TF_SECONDS.get(tf, 30 * 60) for tf in job.timeframes), default=30 * 60)
+            due = trading_calendar.next_check(market, planned, step)
+            if due > planned:
+                CHECKS_DEFERRED.inc((due - planned) // 1800, instrument=instrument)
+                wait_seconds = due - clock.time()
+                print(f"[{instrument}] {market} market closed; next check @ "
+                      f"{datetime.fromtimestamp(due, APP_TZ):%a %Y-%m-%d %H:%M}")
+            else:
+                print(f"[{instrument}] waiting {wait_seconds//60}m for next check @ {clock.now(APP_TZ):%H:%M:%S}")
+            clock.sleep(wait_seconds)
+            if runner is not None:
+                job = runner.job(instrument)
+                if job is None:
+                    print(f"[{instrument}] removed from watchlist; monitor stopped")
+                    return
             clear_expired_alerts()
-            for tf in timeframes:
-                check_engulfing(instrument, tf)
-                check_cpr_engulfing(instrument, tf)
-                check_body_breakout(instrument, tf)
-                time.sleep(1)  # light rate limit
+            for tf in job.timeframes:
+                with timed(SCAN_SECONDS, instrument=instrument, timeframe=tf):
+                    run_checks(job, tf)
+                clock.sleep(1)  # light rate limit
         except Exception as e:
             print(f"pattern_monitor error {instrument}: {e}")
-            time.sleep(60)
+            clock.sleep(60)
+
+# One pattern_monitor per watchlist instrument, kept in step with the file
+monitors = watchlist.Runner(pattern_monitor, patterns=CHECK_THRESHOLDS)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Main
@@ -572,40 +865,51 @@ def main():
     ap.add_argument("--impact", dest="impacts", default="", help="Comma list: High,Medium,Low,Holiday")
     ap.add_argument("--refresh", type=int, default=REFRESH_MINUTES, help="Minutes between news feed refreshes (ENV REFRESH_MINUTES)")
     ap.add_argument("--lead", type=int, default=ALERT_LEAD_MIN, help="Minutes before event to alert (ENV ALERT_LEAD_MIN)")
+    ap.add_argument("--workers", type=int, default=WORKERS,
+                    help="Shard pattern monitors across N worker processes (ENV FXALERT_WORKERS; 0 = threads here)")
     args = ap.parse_args()
 
     currencies = [c.strip() for c in args.currencies.split(",") if c.strip()]
     impacts    = [i.strip() for i in args.impacts.split(",") if i.strip()]
+    news_args  = (args.period, currencies or None, impacts or None, args.refresh, args.lead)
+
+    # Render stops an instance with SIGTERM: unwind like Ctrl-C so state is saved and the lease freed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    elector.start()
+
+    if args.workers > 0:
+        import supervisor
+        return supervisor.run(args.workers, news_args)
+
+    load_indicator_state()
+    instruments.load_instruments(OANDA_URL, OANDA_ACCOUNT_ID, HEADERS)
 
     # liveness
     threading.Thread(target=run_flask, daemon=True).start()
     threading.Thread(target=keep_server_alive, daemon=True).start()
 
     # FF news (digest + T-LEAD alerts)
-    threading.Thread(
-        target=news_loop,
-        args=(args.period, currencies or None, impacts or None, args.refresh, args.lead),
-        daemon=True,
-    ).start()
-
-    # Pattern monitors (engulfing, CPR, body breakout)
-    instrument_timeframes = {
-        "EUR_USD": ["M30"],
-        "XAU_USD": ["H1"],
-        "NZD_USD": ["M30"],
-        "ETH_USD": ["H1"],  # adjust if your OANDA symbol differs
-    }
-    for inst, tfs in instrument_timeframes.items():
-        threading.Thread(target=pattern_monitor, args=(inst, tfs), daemon=True).start()
-        print(f"Started monitoring {inst}: {', '.join(tfs)}")
+    threading.Thread(target=news_loop, args=news_args, daemon=True).start()
+
+    # Pattern monitors (engulfing, CPR, body breakout) from the watchlist, hot-reloaded
+    monitors.reload()
+    for job in monitors.jobs.values():
+        print(f"Started monitoring {job.instrument}: {', '.join(job.timeframes)}")
+    threading.Thread(target=monitors.watch, daemon=True).start()
 
     # keep main alive
     try:
         while True:
-            print(f"Bot alive @ {datetime.now(APP_TZ):%Y-%m-%d %H:%M:%S} ({APP_TZ})")
-            time.sleep(600)
+            print(f"Bot alive @ {clock.now(APP_TZ):%Y-%m-%d %H:%M:%S} ({APP_TZ})")
+            clock.sleep(600)
+            save_indicator_state()
     except KeyboardInterrupt:
+        save_indicator_state()
         print("Stopped by user.")
+    finally:
+        elector.release()
 
 if __name__ == "__main__":
+    # supervisor.py does `import fxalert`; make that this module, not a second copy
+    sys.modules.setdefault("fxalert", sys.modules[__name__])
     main()
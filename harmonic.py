@@ -1,13 +1,19 @@
+import os
 import requests
-import time
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import twelvedata
 
 # === Configurations ===
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-
-
-# Your list of NSE stocks (use .NSE suffix)
+# Your list of NSE stocks (use .NSE suffix); HARMONIC_UNIVERSE=all scans stock.ALL_STOCKS
 stocks = ['RELIANCE', 'TCS', 'INFY', 'TATAMOTORS', 'HDFCBANK']
+if os.getenv("HARMONIC_UNIVERSE", "").lower() == "all":
+    from stock import ALL_STOCKS
+    stocks = [s.replace(".NS", "") for s in ALL_STOCKS]
 
 # Timeframes to scan
 timeframes = {
@@ -16,9 +22,14 @@ timeframes = {
     "1w": "1week"
 }
 
+# Zigzag reversal needed to confirm a swing pivot (fraction of price)
+ZIGZAG_THRESHOLD = 0.03
+# Only alert on patterns whose D point is within the last N bars
+RECENT_BARS = 3
+
 # === Telegram alert function ===
-def send_telegram_alert(symbol, timeframe):
-    message = f"✅ ABCD Pattern found in {symbol} on {timeframe} timeframe"
+def send_telegram_alert(symbol, timeframe, pattern=None):
+    message = f"✅ {pattern or 'ABCD'} Pattern found in {symbol} on {timeframe} timeframe"
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     response = requests.post(url, data={"chat_id": CHAT_ID, "text": message})
     if response.status_code == 200:
@@ -26,25 +37,9 @@ def send_telegram_alert(symbol, timeframe):
     else:
         print(f"Failed to send alert: {response.text}")
 
-# === Fetch stock data from Twelve Data ===
+# === Fetch stock data from Twelve Data (cached, batched, rate-budgeted) ===
 def fetch_stock_data(symbol, interval, outputsize=100):
-    url = (
-        f"https://api.twelvedata.com/time_series?symbol={symbol}"
-        f"&interval={interval}&outputsize={outputsize}&apikey={API_KEY}"
-    )
-    resp = requests.get(url)
-    data = resp.json()
-    if "values" in data:
-        df = pd.DataFrame(data["values"])
-        # Convert columns to appropriate types and sort by datetime ascending
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        df = df.sort_values(by='datetime')
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col])
-        return df
-    else:
-        print(f"Failed to fetch {symbol} {interval}: {data.get('message', 'No data')}")
-        return None
+    return twelvedata.get_bars([symbol], interval, outputsize).get(symbol)
 
 # === ABCD pattern detection function ===
 def is_abcd_pattern(A, B, C, D, tolerance=0.05):
@@ -55,26 +50,168 @@ def is_abcd_pattern(A, B, C, D, tolerance=0.05):
     ratio = CD / AB
     return abs(ratio - 1.0) < tolerance
 
+# === Swing pivots (zigzag) ===
+def _first_true(mask):
+    idx = int(np.argmax(mask))
+    return idx if mask[idx] else -1
+
+def _find_reversal(high, low, start, up, threshold, chunk=256):
+    """
+    From pivot `start`, scan the following bars for the first one that retraces `threshold`
+    from the running extreme of the current leg. Returns (extreme_idx, reversal_idx), with
+    start < extreme_idx <= reversal_idx; reversal_idx is -1 if the leg is still open. Each
+    scan is a vectorized accumulate over a window that doubles until the reversal is found.
+    """
+    n = len(high)
+    s = start + 1
+    if s >= n:
+        return start, -1
+    end = s
+    while True:
+        end = min(n, end + chunk)
+        if up:
+            run = np.maximum.accumulate(high[s:end])
+            hit = _first_true(low[s:end] <= run * (1 - threshold))
+        else:
+            run = np.minimum.accumulate(low[s:end])
+            hit = _first_true(high[s:end] >= run * (1 + threshold))
+        if hit >= 0:
+            seg = high[s:s + hit + 1] if up else low[s:s + hit + 1]
+            ext = s + int(np.argmax(seg) if up else np.argmin(seg))
+            return ext, s + hit
+        if end >= n:
+            seg = high[s:] if up else low[s:]
+            return s + int(np.argmax(seg) if up else np.argmin(seg)), -1
+        chunk *= 2
+
+def zigzag_pivots(high, low=None, threshold=ZIGZAG_THRESHOLD):
+    """
+    Alternating swing pivots as (indices, prices, is_high). A pivot is confirmed once price
+    reverses by `threshold`; the last pivot is the extreme of the still-open leg.
+    """
+    high = np.asarray(high, dtype="float64")
+    low = high if low is None else np.asarray(low, dtype="float64")
+    n = len(high)
+    if n < 3:
+        return np.array([], dtype=int), np.array([]), np.array([], dtype=bool)
+
+    # Initial direction: whichever threshold move from the first bar happens first
+    up_hit = _first_true(high >= low[0] * (1 + threshold))
+    dn_hit = _first_true(low <= high[0] * (1 - threshold))
+    if up_hit < 0 and dn_hit < 0:
+        return np.array([], dtype=int), np.array([]), np.array([], dtype=bool)
+    up = dn_hit < 0 or (0 <= up_hit < dn_hit)
+    first_end = (up_hit if up else dn_hit) + 1
+    start = int(np.argmin(low[:first_end]) if up else np.argmax(high[:first_end]))
+
+    idx, is_high = [start], [not up]
+    while True:
+        ext, rev = _find_reversal(high, low, start, up, threshold)
+        if ext != idx[-1]:
+            idx.append(ext)
+            is_high.append(up)
+        if rev < 0:
+            break
+        start, up = ext, not up
+
+    idx = np.array(idx, dtype=int)
+    is_high = np.array(is_high, dtype=bool)
+    prices = np.where(is_high, high[idx], low[idx])
+    return idx, prices, is_high
+
+# === Harmonic ratio sets: (AB/XA, BC/AB, CD/BC, AD/XA) as (min, max) ranges ===
+HARMONIC_RATIOS = {
+    "Gartley":   ((0.618, 0.618), (0.382, 0.886), (1.272, 1.618), (0.786, 0.786)),
+    "Bat":       ((0.382, 0.500), (0.382, 0.886), (1.618, 2.618), (0.886, 0.886)),
+    "Butterfly": ((0.786, 0.786), (0.382, 0.886), (1.618, 2.618), (1.270, 1.618)),
+    "Crab":      ((0.382, 0.618), (0.382, 0.886), (2.240, 3.618), (1.618, 1.618)),
+}
+# AB=CD: BC retraces AB, CD extends BC, CD ~ AB in length
+ABCD_RATIOS = ((0.382, 0.886), (1.130, 2.618))
+
+def _in_range(values, bounds, tolerance):
+    lo, hi = bounds
+    return (values >= lo * (1 - tolerance)) & (values <= hi * (1 + tolerance))
+
+def _leg_ratio(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(b != 0, np.abs(a) / np.abs(b), np.nan)
+
+def find_harmonic_patterns(idx, prices, is_high, tolerance=0.05, times=None):
+    """
+    Test every consecutive pivot quadruple (AB=CD) and quintuple (Gartley, Bat, Butterfly,
+    Crab) at once with broadcasting. Returns a list of dicts with points and ratios.
+    """
+    found = []
+    prices = np.asarray(prices, dtype="float64")
+
+    def point(k):
+        p = {"index": int(idx[k]), "price": float(prices[k])}
+        if times is not None:
+            p["time"] = times[idx[k]]
+        return p
+
+    if len(prices) >= 4:
+        w = sliding_window_view(prices, 4)  # rows: A, B, C, D
+        ab, bc, cd = w[:, 1] - w[:, 0], w[:, 2] - w[:, 1], w[:, 3] - w[:, 2]
+        bc_ab, cd_bc, cd_ab = _leg_ratio(bc, ab), _leg_ratio(cd, bc), _leg_ratio(cd, ab)
+        hit = (_in_range(bc_ab, ABCD_RATIOS[0], tolerance) &
+               _in_range(cd_bc, ABCD_RATIOS[1], tolerance) &
+               (np.abs(cd_ab - 1.0) < tolerance))
+        for s in np.flatnonzero(hit):
+            found.append({
+                "pattern": "AB=CD",
+                "direction": "bullish" if not is_high[s + 3] else "bearish",
+                "points": dict(zip("ABCD", (point(s + k) for k in range(4)))),
+                "ratios": {"BC/AB": float(bc_ab[s]), "CD/BC": float(cd_bc[s]), "CD/AB": float(cd_ab[s])},
+            })
+
+    if len(prices) >= 5:
+        w = sliding_window_view(prices, 5)  # rows: X, A, B, C, D
+        xa, ab, bc, cd = (w[:, k + 1] - w[:, k] for k in range(4))
+        ad = w[:, 4] - w[:, 1]
+        ratios = np.stack([_leg_ratio(ab, xa), _leg_ratio(bc, ab), _leg_ratio(cd, bc), _leg_ratio(ad, xa)])
+        names = list(HARMONIC_RATIOS)
+        lo = np.array([[r[0] for r in HARMONIC_RATIOS[n]] for n in names])[:, :, None]
+        hi = np.array([[r[1] for r in HARMONIC_RATIOS[n]] for n in names])[:, :, None]
+        # (patterns, 4 ratios, windows) -> (patterns, windows)
+        hit = ((ratios[None] >= lo * (1 - tolerance)) & (ratios[None] <= hi * (1 + tolerance))).all(axis=1)
+        for p, s in zip(*np.nonzero(hit)):
+            found.append({
+                "pattern": names[p],
+                "direction": "bullish" if not is_high[s + 4] else "bearish",
+                "points": dict(zip("XABCD", (point(s + k) for k in range(5)))),
+                "ratios": {"AB/XA": float(ratios[0, s]), "BC/AB": float(ratios[1, s]),
+                           "CD/BC": float(ratios[2, s]), "AD/XA": float(ratios[3, s])},
+            })
+
+    found.sort(key=lambda f: f["points"]["D"]["index"])
+    return found
+
+def scan_patterns(df, threshold=ZIGZAG_THRESHOLD, tolerance=0.05):
+    """All harmonic / AB=CD patterns in an OHLC frame (swing pivots on high/low)."""
+    idx, prices, is_high = zigzag_pivots(df["high"].values, df["low"].values, threshold)
+    times = df["datetime"].values if "datetime" in df.columns else None
+    return find_harmonic_patterns(idx, prices, is_high, tolerance, times)
+
 # === Main scanning loop ===
 def scan_stocks():
-    for symbol in stocks:
-        for tf, interval in timeframes.items():
-            print(f"Fetching {symbol} {tf} data...")
-            df = fetch_stock_data(symbol, interval)
+    for tf, interval in timeframes.items():
+        print(f"Fetching {len(stocks)} symbols on {tf}...")
+        bars = twelvedata.get_bars(stocks, interval)
+        for symbol in stocks:
+            df = bars.get(symbol)
             if df is None or len(df) < 20:
                 print(f"Not enough data for {symbol} {tf}")
                 continue
-            
-            closes = df['close'].values
-            # Naive pattern detection with sliding window
-            for i in range(10, len(closes) - 1):
-                A, B, C, D = closes[i - 10], closes[i - 7], closes[i - 3], closes[i]
-                if is_abcd_pattern(A, B, C, D):
-                    print(f"Pattern found: {symbol} on {tf} at index {i}")
-                    send_telegram_alert(symbol, tf)
-                    # You can break here to avoid multiple alerts or continue to find more
-                    break
-            time.sleep(7)  # Twelve Data limit: 8 calls/min, so wait ~7 sec
+
+            patterns = scan_patterns(df)
+            recent = [p for p in patterns if p["points"]["D"]["index"] >= len(df) - RECENT_BARS]
+            for p in recent:
+                print(f"Pattern found: {symbol} {p['direction']} {p['pattern']} on {tf} "
+                      f"at index {p['points']['D']['index']} {p['ratios']}")
+            if recent:
+                send_telegram_alert(symbol, tf, ", ".join(sorted({f"{p['direction']} {p['pattern']}" for p in recent})))
 
 if __name__ == "__main__":
     scan_stocks()
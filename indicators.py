@@ -0,0 +1,177 @@
+from collections import deque
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Incremental indicators
+#
+# Each indicator consumes one completed bar at a time and updates in O(1)
+# (amortized for the rolling extremes), so live monitors never recompute from
+# a full history. State is plain JSON-friendly data: snapshot() / restore()
+# let a restarted process continue exactly where it stopped.
+# ──────────────────────────────────────────────────────────────────────────────
+
+
+class Indicator:
+    kind = None
+    value = None
+
+    def update(self, bar):
+        raise NotImplementedError
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def snapshot(self):
+        return {"kind": self.kind, **self.__dict__}
+
+    def restore(self, state):
+        for k, v in state.items():
+            if k != "kind":
+                setattr(self, k, v)
+        return self
+
+
+class EMA(Indicator):
+    """Exponential moving average of `field`, seeded with the SMA of the first `period` bars."""
+    kind = "ema"
+
+    def __init__(self, period, field="close"):
+        self.period = period
+        self.field = field
+        self.n = 0
+        self.seed = 0.0
+        self.value = None
+
+    def update(self, bar):
+        x = bar[self.field]
+        self.n += 1
+        if self.n < self.period:
+            self.seed += x
+        elif self.n == self.period:
+            self.value = (self.seed + x) / self.period
+        else:
+            alpha = 2.0 / (self.period + 1)
+            self.value += alpha * (x - self.value)
+        return self.value
+
+
+class WilderATR(Indicator):
+    """Average true range with Wilder's smoothing (ATR_t = (ATR_{t-1}*(n-1) + TR_t) / n)."""
+    kind = "atr"
+
+    def __init__(self, period=14):
+        self.period = period
+        self.n = 0
+        self.seed = 0.0
+        self.prev_close = None
+        self.value = None
+
+    def update(self, bar):
+        h, l = bar["high"], bar["low"]
+        if self.prev_close is None:
+            tr = h - l
+        else:
+            tr = max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+        self.prev_close = bar["close"]
+        self.n += 1
+        if self.n < self.period:
+            self.seed += tr
+        elif self.n == self.period:
+            self.value = (self.seed + tr) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+
+class RollingMax(Indicator):
+    """Max of `field` over the last `period` bars via a monotonic deque."""
+    kind = "max"
+
+    def __init__(self, period, field="high"):
+        self.period = period
+        self.field = field
+        self.n = 0
+        self.window = deque()   # (seq, value), values decreasing front to back
+        self.value = None
+
+    def _drop(self, x):
+        return self.window[-1][1] <= x
+
+    def update(self, bar):
+        x = bar[self.field]
+        while self.window and self._drop(x):
+            self.window.pop()
+        self.window.append((self.n, x))
+        if self.window[0][0] <= self.n - self.period:
+            self.window.popleft()
+        self.n += 1
+        self.value = self.window[0][1]
+        return self.value
+
+    @property
+    def ready(self):
+        return self.n >= self.period
+
+    def snapshot(self):
+        state = super().snapshot()
+        state["window"] = [list(e) for e in self.window]
+        return state
+
+    def restore(self, state):
+        super().restore(state)
+        self.window = deque(tuple(e) for e in state.get("window", []))
+        return self
+
+
+class RollingMin(RollingMax):
+    """Min of `field` over the last `period` bars via a monotonic deque."""
+    kind = "min"
+
+    def __init__(self, period, field="low"):
+        super().__init__(period, field)
+
+    def _drop(self, x):
+        return self.window[-1][1] >= x
+
+
+KINDS = {cls.kind: cls for cls in (EMA, WilderATR, RollingMax, RollingMin)}
+
+
+def from_snapshot(state):
+    cls = KINDS[state["kind"]]
+    obj = cls.__new__(cls)
+    return obj.restore(state)
+
+
+class IndicatorSet:
+    """
+    Named indicators fed from one instrument/timeframe bar stream. Bars at or before
+    the last one consumed are ignored, so the same history can be offered repeatedly.
+    """
+
+    def __init__(self, **indicators):
+        self.indicators = indicators
+        self.last_time = ""
+
+    def feed(self, bars):
+        for bar in bars:
+            if bar["time"] <= self.last_time:
+                continue
+            for ind in self.indicators.values():
+                ind.update(bar)
+            self.last_time = bar["time"]
+        return self
+
+    def values(self):
+        """{name: value} for indicators that have seen enough bars."""
+        return {name: ind.value for name, ind in self.indicators.items() if ind.ready}
+
+    def snapshot(self):
+        return {"last_time": self.last_time,
+                "indicators": {name: ind.snapshot() for name, ind in self.indicators.items()}}
+
+    def restore(self, state):
+        self.last_time = state.get("last_time", "")
+        for name, s in state.get("indicators", {}).items():
+            self.indicators[name] = from_snapshot(s)
+        return self
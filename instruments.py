@@ -0,0 +1,75 @@
+import os
+import json
+import time
+
+import requests
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Instrument metadata (pip size / display precision)
+#
+# OANDA reports pipLocation per instrument (pip = 10 ** pipLocation). The
+# account's instrument list is fetched once and cached on disk; the static
+# table below covers the usual symbols when the API is not reachable.
+# ──────────────────────────────────────────────────────────────────────────────
+INSTRUMENTS_CACHE = os.getenv("OANDA_INSTRUMENTS_CACHE", "oanda_instruments.json")
+INSTRUMENTS_TTL = int(os.getenv("OANDA_INSTRUMENTS_TTL_HOURS", "24")) * 3600
+
+DEFAULT_PIP_LOCATION = {
+    "XAU_USD": -2, "XAG_USD": -3, "XPT_USD": -2, "XPD_USD": -2,
+    "BTC_USD": 0, "ETH_USD": 0, "LTC_USD": -2, "BCH_USD": -1,
+}
+
+_meta = None
+
+
+def _load_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def fetch_instruments(oanda_url, account_id, headers):
+    """{name: {pipLocation, displayPrecision, type, ...}} from the account's tradeable instruments."""
+    r = requests.get(f"{oanda_url}/accounts/{account_id}/instruments", headers=headers, timeout=20)
+    r.raise_for_status()
+    return {i["name"]: i for i in r.json().get("instruments", [])}
+
+
+def load_instruments(oanda_url=None, account_id=None, headers=None, path=None, refresh=False):
+    """Cached instrument metadata; refetched when older than the TTL (if credentials are given)."""
+    global _meta
+    path = path or INSTRUMENTS_CACHE
+    cached = _load_file(path)
+    stale = cached is None or time.time() - cached.get("fetched_at", 0) > INSTRUMENTS_TTL
+    if (stale or refresh) and oanda_url and account_id:
+        try:
+            cached = {"fetched_at": time.time(),
+                      "instruments": fetch_instruments(oanda_url, account_id, headers or {})}
+            tmp = path + ".part"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cached, f)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Instrument metadata fetch failed: {e}")
+    _meta = (cached or {}).get("instruments", {})
+    return _meta
+
+
+def metadata():
+    """Instrument metadata already loaded or cached on disk ({} if never fetched)."""
+    global _meta
+    if _meta is None:
+        _meta = (_load_file(INSTRUMENTS_CACHE) or {}).get("instruments", {})
+    return _meta
+
+
+def pip_size(instrument):
+    """Pip size: OANDA pipLocation when known, else static table, else FX convention (JPY 0.01)."""
+    info = metadata().get(instrument)
+    if info and "pipLocation" in info:
+        return 10.0 ** int(info["pipLocation"])
+    if instrument in DEFAULT_PIP_LOCATION:
+        return 10.0 ** DEFAULT_PIP_LOCATION[instrument]
+    return 0.01 if instrument.endswith("_JPY") else 0.0001
@@ -0,0 +1,349 @@
+import os
+import hashlib
+import socket
+import sqlite3
+import threading
+import uuid
+
+import clock
+
+try:
+    import fcntl  # POSIX only; FileLease is unavailable without it
+except ImportError:
+    fcntl = None
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Leader lease: one replica sends, the others stay warm as standbys
+#
+# Every replica runs the monitors (so caches and indicator state stay hot) but
+# only the current lease holder delivers alerts. The holder renews the lease
+# every LEASE_HEARTBEAT seconds; if it stops (crash, old instance draining
+# during a deploy) a standby takes over once LEASE_TTL has passed.
+#
+#   LEASE_BACKEND = ""                          single instance, always leader
+#                   "sqlite:/data/lease.sqlite3" row lease in a shared SQLite file
+#                   "file:/data/fxalert.lock"    flock() on a shared volume
+#                   "local"                      in-process stand-in (tests/replay)
+#
+# Failover within one bar: a standby keeps the alerts it produced (but did not
+# send) until their bar is over. When it is promoted it sends the ones the old
+# leader did not record as sent in the lease store's journal. Keys are stable
+# across replicas (chat, instrument, timeframe, pattern, bar), so an alert is
+# delivered once even though every replica detects it.
+# ──────────────────────────────────────────────────────────────────────────────
+LEASE_BACKEND = os.getenv("LEASE_BACKEND", "")
+LEASE_NAME = os.getenv("LEASE_NAME", "fxalert")
+LEASE_TTL = float(os.getenv("LEASE_TTL_SECONDS", "30"))
+LEASE_HEARTBEAT = float(os.getenv("LEASE_HEARTBEAT_SECONDS", "10"))
+# How long a standby keeps an alert that has no bar of its own (one M30 bar)
+LEASE_HOLD_SECONDS = float(os.getenv("LEASE_HOLD_SECONDS", "1800"))
+SENT_JOURNAL_TTL = 24 * 3600
+
+
+def default_holder():
+    return os.getenv("RENDER_INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class SQLiteLease:
+    """Row lease (holder, expires_at, epoch) renewed inside an IMMEDIATE transaction."""
+
+    def __init__(self, path, name=LEASE_NAME, holder=None, ttl=LEASE_TTL):
+        self.path = path
+        self.name = name
+        self.holder = holder or default_holder()
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name       TEXT PRIMARY KEY,
+                    holder     TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    epoch      INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sent (
+                    name    TEXT NOT NULL,
+                    key     TEXT NOT NULL,
+                    sent_at REAL NOT NULL,
+                    PRIMARY KEY (name, key)
+                )
+            """)
+        return self._conn
+
+    def acquire(self):
+        """Take the lease if it is free or expired, renew it if already ours. True while held."""
+        now = clock.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT holder, expires_at, epoch FROM leases WHERE name = ?",
+                                   (self.name,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO leases VALUES (?, ?, ?, 1)", (self.name, self.holder, now + self.ttl))
+                elif row[0] == self.holder or row[1] <= now:
+                    epoch = row[2] + (row[0] != self.holder)
+                    conn.execute("UPDATE leases SET holder = ?, expires_at = ?, epoch = ? WHERE name = ?",
+                                 (self.holder, now + self.ttl, epoch, self.name))
+                else:
+                    conn.execute("COMMIT")
+                    return False
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release(self):
+        with self._lock:
+            # expire rather than delete so the epoch keeps counting handovers
+            self._connect().execute("UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?",
+                                    (self.name, self.holder))
+
+    def mark_sent(self, key):
+        now = clock.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO sent VALUES (?, ?, ?)", (self.name, key, now))
+            conn.execute("DELETE FROM sent WHERE name = ? AND sent_at < ?", (self.name, now - SENT_JOURNAL_TTL))
+
+    def was_sent(self, key):
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM sent WHERE name = ? AND key = ?",
+                                           (self.name, key)).fetchone() is not None
+
+    def current(self):
+        """(holder, expires_at, epoch) of the lease row, or None."""
+        with self._lock:
+            return self._connect().execute("SELECT holder, expires_at, epoch FROM leases WHERE name = ?",
+                                           (self.name,)).fetchone()
+
+
+class FileLease:
+    """Exclusive flock() on a shared file; the OS drops it when the holder's process dies."""
+
+    def __init__(self, path, holder=None):
+        if fcntl is None:
+            raise RuntimeError("FileLease needs fcntl (POSIX)")
+        self.path = path
+        self.holder = holder or default_holder()
+        self._fd = None
+
+    def acquire(self):
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, self.holder.encode("utf-8"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    # sent-alert journal: "<epoch> <key>" lines beside the lock file, written by the holder only
+    def mark_sent(self, key):
+        with open(self.path + ".sent", "a", encoding="utf-8") as f:
+            f.write(f"{clock.time():.0f} {key}\n")
+
+    def was_sent(self, key):
+        cutoff = clock.time() - SENT_JOURNAL_TTL
+        try:
+            with open(self.path + ".sent", "r", encoding="utf-8") as f:
+                lines = [line.rstrip("\n").split(" ", 1) for line in f if " " in line]
+        except FileNotFoundError:
+            return False
+        fresh = [(at, k) for at, k in lines if float(at) >= cutoff]
+        if len(fresh) < len(lines) and self._fd is not None:
+            with open(self.path + ".sent", "w", encoding="utf-8") as f:
+                f.writelines(f"{at} {k}\n" for at, k in fresh)
+        return any(k == key for _, k in fresh)
+
+
+class LocalLease:
+    """In-process stand-in with the same TTL semantics as SQLiteLease (tests, replay harness)."""
+
+    _table = {}
+    _sent = {}  # (name, key) -> sent_at
+    _table_lock = threading.Lock()
+
+    def __init__(self, name=LEASE_NAME, holder=None, ttl=LEASE_TTL):
+        self.name = name
+        self.holder = holder or default_holder()
+        self.ttl = ttl
+
+    def acquire(self):
+        now = clock.time()
+        with self._table_lock:
+            holder, expires = self._table.get(self.name, (None, 0.0))
+            if holder in (None, self.holder) or expires <= now:
+                self._table[self.name] = (self.holder, now + self.ttl)
+                return True
+            return False
+
+    def release(self):
+        with self._table_lock:
+            if self._table.get(self.name, (None,))[0] == self.holder:
+                del self._table[self.name]
+
+    def mark_sent(self, key):
+        with self._table_lock:
+            self._sent[(self.name, key)] = clock.time()
+
+    def was_sent(self, key):
+        with self._table_lock:
+            return clock.time() - self._sent.get((self.name, key), float("-inf")) < SENT_JOURNAL_TTL
+
+
+class Elector:
+    """
+    Heartbeats a lease in the background; is_leader() gates side effects.
+
+    Leadership is trusted only until the last successful renewal plus the TTL,
+    so a holder that cannot reach the lease store steps down by itself before
+    anyone else can take over. With no lease every call is leader.
+    """
+
+    def __init__(self, lease=None, heartbeat=LEASE_HEARTBEAT, ttl=LEASE_TTL):
+        self.lease = lease
+        self.heartbeat = heartbeat
+        self.ttl = ttl
+        self._valid_until = float("inf") if lease is None else 0.0
+        self._role = self.is_leader()  # last role reported to listeners
+        self._listeners = []
+        self.transitions = 0
+        self._held = {}  # alert key -> (hold_until, send) kept while standby
+        self._held_lock = threading.Lock()
+        self.on_change(self._on_promoted)
+
+    def is_leader(self):
+        return clock.time() < self._valid_until
+
+    def on_change(self, fn):
+        """fn(is_leader) is called whenever leadership is gained or lost."""
+        self._listeners.append(fn)
+
+    def beat(self):
+        started = clock.time()
+        try:
+            held = self.lease.acquire()
+        except Exception as e:
+            print(f"Lease renew failed: {e}")  # keep what we had; it lapses on its own
+        else:
+            self._valid_until = started + self.ttl if held else 0.0
+        now = self.is_leader()
+        if now != self._role:
+            self._role = now
+            self.transitions += 1
+            print(f"Lease {getattr(self.lease, 'holder', '')}: {'leader' if now else 'standby'}")
+            for fn in self._listeners:
+                try:
+                    fn(now)
+                except Exception as e:
+                    print(f"lease listener error: {e}")
+        return now
+
+    def deliver(self, key, send, hold_until=None, later=None):
+        """
+        Leader: call send() now and journal `key` if it returns True. Standby:
+        keep `later` (default send) under `key`, a repeat replacing it, until
+        `hold_until` in case this replica takes over first. True if sent now.
+        """
+        if self.is_leader():
+            if send():
+                self._journal("mark_sent", key)
+            return True
+        with self._held_lock:
+            self._held[key] = (hold_until or clock.time() + LEASE_HOLD_SECONDS, later or send)
+        return False
+
+    def _on_promoted(self, leader):
+        if leader:  # off the heartbeat thread: sends may wait on rate limits
+            threading.Thread(target=self.flush_held, name="lease-flush", daemon=True).start()
+
+    def held(self):
+        with self._held_lock:
+            return len(self._held)
+
+    def flush_held(self):
+        """On promotion: send held alerts that are still current and the old leader did not send."""
+        now = clock.time()
+        with self._held_lock:
+            held, self._held = self._held, {}
+        for key, (until, send) in held.items():
+            if until <= now or self._journal("was_sent", key):
+                continue
+            print(f"Lease: sending alert held while standby ({key})")
+            if send():
+                self._journal("mark_sent", key)
+
+    def _journal(self, op, key):
+        fn = getattr(self.lease, op, None)
+        if fn is None:
+            return False
+        try:
+            return fn(key)
+        except Exception as e:
+            print(f"Lease journal {op} failed: {e}")
+            return False
+
+    def run(self):
+        while True:
+            self.beat()
+            clock.sleep(self.heartbeat)
+
+    def start(self):
+        """First beat inline (so startup knows its role), then heartbeat in a daemon thread."""
+        if self.lease is None:
+            return
+        self.beat()
+        threading.Thread(target=self.run, name="lease-heartbeat", daemon=True).start()
+
+    def release(self):
+        if self.lease is not None:
+            try:
+                self.lease.release()
+            except Exception as e:
+                print(f"Lease release failed: {e}")
+            self._valid_until = 0.0
+
+
+def alert_key(chat_id, message, instrument=None, timeframe=None, pattern=None, bar=None):
+    """
+    Journal key of an alert that is the same on every replica: the signal and its
+    bar when known, else the message text without its 'Time:' line (the send time).
+    """
+    if instrument and bar is not None:
+        return f"{chat_id}|{instrument}|{timeframe}|{pattern}|{int(bar)}"
+    text = "\n".join(line for line in (message or "").splitlines() if "Time:" not in line)
+    return f"{chat_id}|{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+
+def from_env(spec=None):
+    """Elector for a LEASE_BACKEND spec ('', 'sqlite:PATH', 'file:PATH', 'local')."""
+    spec = LEASE_BACKEND if spec is None else spec
+    kind, _, path = spec.partition(":")
+    if not kind:
+        return Elector(None)
+    if kind == "sqlite":
+        return Elector(SQLiteLease(path or "fxalert_lease.sqlite3"))
+    if kind == "file":
+        return Elector(FileLease(path or "fxalert.lock"))
+    if kind == "local":
+        return Elector(LocalLease())
+    raise ValueError(f"unknown LEASE_BACKEND {spec!r}")
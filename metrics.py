@@ -0,0 +1,182 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+# ──────────────────────────────────────────────────────────────────────────────
+# In-process metrics rendered in the Prometheus text exposition format
+#
+# Counters, gauges and histograms keyed by label values. Updates are a dict
+# lookup plus one lock; nothing is exported until /metrics is scraped.
+# ──────────────────────────────────────────────────────────────────────────────
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for m in list(self._metrics):
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[n] for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                for k, v in list(self._values.items())]
+
+
+class Gauge(_Metric):
+    """set()/inc()/dec() per label set, or `fn` (no labels) evaluated at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                return [f"{self.name} {_fmt_value(self.fn())}"]
+            except Exception:
+                return []
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                for k, v in list(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    def time(self, **labels):
+        return timed(self, **labels)
+
+    def stats(self):
+        """{label values: {"count", "sum"}} for every observed label set."""
+        return {key: {"count": n, "sum": total} for key, (_, total, n) in list(self._values.items())}
+
+    def samples(self):
+        out = []
+        for key, (counts, total, n) in list(self._values.items()):
+            acc = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le = f'le="{_fmt_value(bound)}"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return out
+
+
+@contextmanager
+def timed(histogram, errors=None, **labels):
+    """Observe the block's wall time in `histogram`; count exceptions in `errors` (re-raised)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def instrument(histogram, errors=None, labels=None):
+    """Decorator form of timed(); labels(*args, **kwargs) -> dict picks label values from the call."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(histogram, errors, **(labels(*args, **kwargs) if labels else {})):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -1,11 +1,16 @@
 import os
 import time
+import threading
+import collections
+import queue
 import requests
-import pandas as pd
 from dotenv import load_dotenv
-from tabulate import tabulate
-import nsepython
-from nsepython import nse_eq, nse_fno
+import symbol_cache
+from ratelimit import TokenBucket
+
+# pandas, openpyxl, tabulate, nsepython (-> scipy), nse_bulk and screener_rules
+# are imported inside the functions that process an upload, so importing this
+# module (e.g. from forexnews for the Telegram poller) stays cheap.
 
 # Load environment variables
 load_dotenv()
@@ -13,13 +18,34 @@ BOT_TOKEN = os.getenv("TELEGRAM_NSE_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID_2")
 API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
-# Set headers to avoid blocks on Render
-nsepython.requests = requests.Session()
-nsepython.requests.headers.update({
+# "bulk": join a daily snapshot first, per-symbol quotes only for the gaps
+# "quote": per-symbol nse_fno/nse_eq lookups for every row
+PE_PROVIDER = os.getenv("NSE_PE_PROVIDER", "bulk").lower()
+# The daily PE report has no sector PE; a symbol's cached Industry PE is reused
+# for this long before nse_eq is asked again (sector PEs move slowly)
+SECTOR_PE_MAX_AGE_HOURS = float(os.getenv("NSE_SECTOR_PE_MAX_AGE_HOURS", "168"))
+
+NSE_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
     "Accept-Language": "en-US,en;q=0.9",
     "Accept-Encoding": "gzip, deflate, br"
-})
+}
+_nsepython = None
+_nsepython_lock = threading.Lock()
+
+# NSE quote calls per minute, shared by all Excel workers (NSE blocks bursts)
+NSE_RATE_PER_MIN = float(os.getenv("NSE_RATE_PER_MIN", "60"))
+nse_limit = TokenBucket(NSE_RATE_PER_MIN, per=60.0, capacity=1)
+
+# Rows enriched per chunk before results are sent back to the chat
+CHUNK_ROWS = int(os.getenv("EXCEL_CHUNK_ROWS", "50"))
+
+# Webhook mode: Telegram pushes updates to our Flask app instead of long polling
+WEBHOOK_URL = os.getenv("TELEGRAM_NSE_WEBHOOK_URL")        # public https URL of the route
+WEBHOOK_SECRET = os.getenv("TELEGRAM_NSE_WEBHOOK_SECRET")  # echoed back in X-Telegram-Bot-Api-Secret-Token
+
+# Worker threads processing uploads concurrently
+EXCEL_WORKERS = int(os.getenv("EXCEL_WORKERS", "2"))
 
 # Setup download directory
 DOWNLOAD_DIR = "downloads"
@@ -28,54 +54,138 @@ os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 # Track chats awaiting uploads
 waiting_for_excel = set()
 
+def nse():
+    """nsepython, imported on first use with browser-like headers (to avoid blocks on Render)."""
+    global _nsepython
+    with _nsepython_lock:
+        if _nsepython is None:
+            import nsepython
+            nsepython.requests = requests.Session()
+            nsepython.requests.headers.update(NSE_HEADERS)
+            _nsepython = nsepython
+    return _nsepython
+
+def nse_quote(kind, symbol):
+    """nse_fno / nse_eq for `symbol`, paced by the shared nse_limit bucket."""
+    nse_limit.acquire()
+    return getattr(nse(), kind)(symbol)
+
 def fetch_pe_ratios(df):
+    import pandas as pd
+    import nse_bulk
+
     df["Company PE"] = None
     df["Industry PE"] = None
 
+    if PE_PROVIDER == "bulk":
+        df = nse_bulk.merge_snapshot(df)
+        company_pe = pd.to_numeric(df["Company PE"], errors="coerce")
+        # a row is covered once it has its own PE; only a missing Industry PE is looked up
+        covered = company_pe.notna()
+        need_sector = covered & pd.to_numeric(df["Industry PE"], errors="coerce").isna()
+        print(f"📦 Bulk snapshot covered {int(covered.sum())}/{len(df)} symbols "
+              f"({int(need_sector.sum())} need Industry PE)")
+    else:
+        covered = need_sector = pd.Series(False, index=df.index)
+
+    # Serve symbols looked up earlier today from the local cache
+    cached = symbol_cache.get_many(df.loc[~covered, "Symbol"].astype(str).tolist(), source="nse")
+    sectors = symbol_cache.get_many(df.loc[need_sector, "Symbol"].astype(str).tolist(), source="nse",
+                                    max_age_hours=SECTOR_PE_MAX_AGE_HOURS)
+
     for idx, row in df.iterrows():
         symbol = str(row["Symbol"]).strip().upper()
-        if not symbol:
+        if not symbol or (covered[idx] and not need_sector[idx]):
+            continue
+
+        if need_sector[idx]:
+            hit = sectors.get(symbol)
+            if hit and hit["sector_pe"] is not None:
+                df.at[idx, "Industry PE"] = hit["sector_pe"]
+                continue
+            try:
+                ind_pe = nse_quote("nse_eq", symbol).get("metadata", {}).get("pdSectorPe")
+                ind_pe = float(ind_pe) if ind_pe else None
+                df.at[idx, "Industry PE"] = ind_pe
+                symbol_cache.store_fundamentals(symbol, float(company_pe[idx]), ind_pe, source="nse")
+                print(f"✅ {symbol}: Industry PE = {ind_pe}")
+            except Exception as e:
+                print(f"❌ {symbol} Industry PE fetch failed: {e}")
+            continue
+
+        hit = cached.get(symbol)
+        if hit:
+            df.at[idx, "Company PE"] = hit["pe"]
+            df.at[idx, "Industry PE"] = hit["sector_pe"]
             continue
 
         try:
-            data = nse_fno(symbol)
+            data = nse_quote("nse_fno", symbol)
             pe = data.get("metadata", {}).get("pdSymbolPe")
             ind_pe = data.get("metadata", {}).get("pdSectorPe")
 
             # Fallback if not found in FNO
             if not pe or not ind_pe:
-                data = nse_eq(symbol)
+                data = nse_quote("nse_eq", symbol)
                 pe = data.get("metadata", {}).get("pdSymbolPe")
                 ind_pe = data.get("metadata", {}).get("pdSectorPe")
 
-            df.at[idx, "Company PE"] = float(pe) if pe else None
-            df.at[idx, "Industry PE"] = float(ind_pe) if ind_pe else None
+            pe = float(pe) if pe else None
+            ind_pe = float(ind_pe) if ind_pe else None
+            df.at[idx, "Company PE"] = pe
+            df.at[idx, "Industry PE"] = ind_pe
+            symbol_cache.store_fundamentals(symbol, pe, ind_pe, source="nse")
+            cached[symbol] = {"pe": pe, "sector_pe": ind_pe}
             print(f"✅ {symbol}: PE = {pe}, Industry PE = {ind_pe}")
         except Exception as e:
             print(f"❌ {symbol} fetch failed: {e}")
-        time.sleep(1)
     
     return df
 
+# Used when screens.json has no "fundamentals" section
+DEFAULT_SCREENS = {
+    "PASS": "company_pe < industry_pe and 10 <= roe <= 15 and 10 <= eps <= 15 and 1 <= pb_ratio <= 5",
+}
+
 def apply_filter(df):
+    import pandas as pd
+    import screener_rules
+
     df["Company PE"] = pd.to_numeric(df["Company PE"], errors="coerce")
     df["Industry PE"] = pd.to_numeric(df["Industry PE"], errors="coerce")
     df["ROE"] = 12  # Default values; replace if Excel provides
     df["EPS"] = 12
     df["PB Ratio"] = 3
-    return df[
-        (df["Company PE"] < df["Industry PE"]) &
-        (df["ROE"].between(10, 15)) &
-        (df["EPS"].between(10, 15)) &
-        (df["PB Ratio"].between(1, 5))
-    ]
+    screens = screener_rules.load_screens("fundamentals", DEFAULT_SCREENS)
+    result = screener_rules.evaluate(screens, screener_rules.FrameEnv(df))
+    return df[result["PASS"]]
 
 def send_message(text, chat_id):
-    requests.post(f"{API_URL}/sendMessage", json={
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML"
-    })
+    """Send a message and return its message_id (None on failure)."""
+    try:
+        res = requests.post(f"{API_URL}/sendMessage", json={
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "HTML"
+        })
+        return res.json().get("result", {}).get("message_id")
+    except Exception as e:
+        print(f"❌ sendMessage failed: {e}")
+        return None
+
+def edit_message(text, chat_id, message_id):
+    if message_id is None:
+        return send_message(text, chat_id)
+    try:
+        requests.post(f"{API_URL}/editMessageText", json={
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": "HTML"
+        })
+    except Exception as e:
+        print(f"❌ editMessageText failed: {e}")
+    return message_id
 
 def download_excel(file_id):
     try:
@@ -90,31 +200,203 @@ def download_excel(file_id):
         print(f"❌ Download failed: {e}")
         return None
 
+def iter_excel_chunks(file_path, chunk_rows=CHUNK_ROWS, skiprows=1):
+    """
+    Yield DataFrames of at most `chunk_rows` rows without loading the whole sheet.
+    Row `skiprows + 1` is the header, matching pd.read_excel(skiprows=1).
+    .xlsx is streamed with openpyxl read-only mode; legacy .xls falls back to pandas.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    if file_path.lower().endswith(".xls"):
+        df = pd.read_excel(file_path, skiprows=skiprows)
+        df.columns = df.columns.astype(str).str.strip()
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows].copy()
+        return
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        for _ in range(skiprows):
+            next(rows, None)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c).strip() if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+
+        buf = []
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            buf.append(row)
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=columns)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns)
+    finally:
+        wb.close()
+
+def send_table(display_df, chat_id):
+    from tabulate import tabulate
+
+    table = tabulate(display_df, headers="keys", tablefmt="grid", showindex=False)
+
+    # Telegram has a message limit (~4096 chars), split if needed
+    chunks = [table[i:i+4000] for i in range(0, len(table), 4000)]
+    for chunk in chunks:
+        send_message(f"<pre>{chunk}</pre>", chat_id)
+
 def process_excel(file_path, chat_id):
+    """Enrich and filter the upload chunk by chunk, replying as each chunk completes."""
     try:
-        df = pd.read_excel(file_path, skiprows=1)
-        df.columns = df.columns.str.strip()
+        rows_done = 0
+        matched = 0
+        progress_id = None
+
+        for chunk in iter_excel_chunks(file_path):
+            if "Symbol" not in chunk.columns:
+                send_message("❌ 'Symbol' column not found in the uploaded file.", chat_id)
+                return
+
+            chunk = fetch_pe_ratios(chunk)
+            filtered = apply_filter(chunk)
+            rows_done += len(chunk)
+
+            if not filtered.empty:
+                if matched == 0:
+                    send_message("📊 <b>Filtered Stocks</b>", chat_id)
+                matched += len(filtered)
+                display_df = filtered[["Symbol", "Company PE", "Industry PE", "ROE", "EPS", "PB Ratio"]].round(2)
+                send_table(display_df, chat_id)
 
-        df = fetch_pe_ratios(df)
-        filtered = apply_filter(df)
+            progress_id = edit_message(
+                f"⏳ Processed {rows_done} rows, {matched} matches so far...", chat_id, progress_id
+            )
 
-        if filtered.empty:
+        if matched == 0:
             send_message("⚠️ No stocks matched the criteria.", chat_id)
+        edit_message(f"✅ Done: {rows_done} rows processed, {matched} matched.", chat_id, progress_id)
+    except Exception as e:
+        send_message(f"❌ Failed to process Excel:\n<pre>{e}</pre>", chat_id)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Job queue: the poller only enqueues, workers process files concurrently
+# ──────────────────────────────────────────────────────────────────────────────
+class ExcelJobQueue:
+    """
+    Per-chat FIFO queues served round-robin by a pool of worker threads, so a
+    chat that uploads many files cannot starve the others. At most one job
+    per chat runs at a time.
+    """
+
+    def __init__(self, workers=EXCEL_WORKERS):
+        self.workers = max(1, workers)
+        self._pending = collections.OrderedDict()  # chat_id -> deque of jobs
+        self._running = set()                      # chat_ids with a job in progress
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"excel-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"🧵 Excel job queue started with {self.workers} workers")
+
+    def submit(self, chat_id, file_id):
+        """
+        Queue a job and return how many jobs are waiting, this one included.
+        The actual order depends on when running chats finish, so no position
+        is promised.
+        """
+        with self._cond:
+            self._pending.setdefault(chat_id, collections.deque()).append(file_id)
+            waiting = sum(len(q) for q in self._pending.values())
+            self._cond.notify()
+        return waiting
+
+    def depth(self):
+        with self._cond:
+            return sum(len(q) for q in self._pending.values())
+
+    def _take(self):
+        """Pop the next job from the first idle chat, rotating it to the back."""
+        for chat_id, q in self._pending.items():
+            if chat_id in self._running or not q:
+                continue
+            file_id = q.popleft()
+            self._pending.move_to_end(chat_id)
+            if not q:
+                del self._pending[chat_id]
+            self._running.add(chat_id)
+            return chat_id, file_id
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._take()
+                while job is None:
+                    self._cond.wait()
+                    job = self._take()
+            chat_id, file_id = job
+            try:
+                send_message("⚙️ Your file is now being processed...", chat_id)
+                local_path = download_excel(file_id)
+                if local_path:
+                    process_excel(local_path, chat_id)
+                else:
+                    send_message("❌ File download failed.", chat_id)
+            except Exception as e:
+                print(f"❌ Job failed for chat {chat_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(chat_id)
+                    self._cond.notify_all()
+
+job_queue = ExcelJobQueue()
+
+def handle_update(update):
+    message = update.get("message", {})
+    chat_id = message.get("chat", {}).get("id")
+
+    if "text" in message and message["text"].lower() in ["/start", "hi", "hello"]:
+        send_message("👋 Welcome! Upload an Excel file (.xlsx/.xls) with a 'Symbol' column to begin.", chat_id)
+        waiting_for_excel.add(chat_id)
+
+    elif chat_id in waiting_for_excel and "document" in message:
+        doc = message["document"]
+        mime_type = doc.get("mime_type", "")
+        if mime_type in [
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "application/vnd.ms-excel"
+        ]:
+            waiting = job_queue.submit(chat_id, doc["file_id"])
+            send_message(f"📥 File received and queued ({waiting} waiting; chats take turns).", chat_id)
+            waiting_for_excel.discard(chat_id)
         else:
-            send_message("📊 <b>Filtered Stocks</b>", chat_id)
+            send_message("⚠️ Only Excel files (.xlsx or .xls) are supported.", chat_id)
 
-            display_df = filtered[["Symbol", "Company PE", "Industry PE", "ROE", "EPS", "PB Ratio"]].round(2)
-            table = tabulate(display_df, headers="keys", tablefmt="grid", showindex=False)
+    elif "document" in message:
+        send_message("ℹ️ Please send /start before uploading a file.", chat_id)
 
-            # Telegram has a message limit (~4096 chars), split if needed
-            chunks = [table[i:i+4000] for i in range(0, len(table), 4000)]
-            for chunk in chunks:
-                send_message(f"<pre>{chunk}</pre>", chat_id)
+def delete_webhook():
+    """getUpdates answers 409 while a webhook is registered (e.g. after running in webhook mode)."""
+    try:
+        res = requests.post(f"{API_URL}/deleteWebhook", timeout=15).json()
+        print(f"🔗 deleteWebhook: {res.get('description', res)}")
+        return res.get("ok", False)
     except Exception as e:
-        send_message(f"❌ Failed to process Excel:\n<pre>{e}</pre>", chat_id)
+        print(f"❌ deleteWebhook failed: {e}")
+        return False
 
 def poll_updates():
+    delete_webhook()
     print("🤖 Bot is live. Waiting for /start and Excel uploads...")
+    job_queue.start()
     last_update_id = None
 
     while True:
@@ -126,37 +408,57 @@ def poll_updates():
             res = requests.get(f"{API_URL}/getUpdates", params=params).json()
             for update in res.get("result", []):
                 last_update_id = update["update_id"]
-                message = update.get("message", {})
-                chat_id = message.get("chat", {}).get("id")
-
-                if "text" in message and message["text"].lower() in ["/start", "hi", "hello"]:
-                    send_message("👋 Welcome! Upload an Excel file (.xlsx/.xls) with a 'Symbol' column to begin.", chat_id)
-                    waiting_for_excel.add(chat_id)
-
-                elif chat_id in waiting_for_excel and "document" in message:
-                    doc = message["document"]
-                    mime_type = doc.get("mime_type", "")
-                    if mime_type in [
-                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        "application/vnd.ms-excel"
-                    ]:
-                        file_id = doc["file_id"]
-                        send_message("📥 File received. Processing...", chat_id)
-                        local_path = download_excel(file_id)
-                        if local_path:
-                            process_excel(local_path, chat_id)
-                        else:
-                            send_message("❌ File download failed.", chat_id)
-                        waiting_for_excel.discard(chat_id)
-                    else:
-                        send_message("⚠️ Only Excel files (.xlsx or .xls) are supported.", chat_id)
-
-                elif "document" in message:
-                    send_message("ℹ️ Please send /start before uploading a file.", chat_id)
+                handle_update(update)
 
         except Exception as e:
             print(f"❌ Polling error: {e}")
             time.sleep(3)
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Webhook mode: route handler enqueues, a dispatcher thread runs handle_update
+# ──────────────────────────────────────────────────────────────────────────────
+update_queue = queue.Queue()
+_seen_update_ids = collections.deque(maxlen=1000)  # Telegram retries deliveries
+_seen_lock = threading.Lock()  # Flask serves the webhook route on several threads
+
+def is_valid_webhook_secret(header_value):
+    return bool(WEBHOOK_SECRET) and header_value == WEBHOOK_SECRET
+
+def enqueue_update(update):
+    update_id = update.get("update_id")
+    if update_id is not None:
+        with _seen_lock:
+            if update_id in _seen_update_ids:
+                return False
+            _seen_update_ids.append(update_id)
+    update_queue.put(update)
+    return True
+
+def dispatch_updates():
+    while True:
+        update = update_queue.get()
+        try:
+            handle_update(update)
+        except Exception as e:
+            print(f"❌ Update handling error: {e}")
+
+def set_webhook(url=WEBHOOK_URL, secret=WEBHOOK_SECRET):
+    payload = {"url": url, "allowed_updates": ["message"]}
+    if secret:
+        payload["secret_token"] = secret
+    res = requests.post(f"{API_URL}/setWebhook", json=payload, timeout=15).json()
+    print(f"🔗 setWebhook {url}: {res.get('description', res)}")
+    return res.get("ok", False)
+
+def start_webhook_mode():
+    """Start workers + dispatcher and register the webhook; the Flask route feeds enqueue_update."""
+    if not (WEBHOOK_URL and WEBHOOK_SECRET):
+        raise RuntimeError("TELEGRAM_NSE_WEBHOOK_URL and TELEGRAM_NSE_WEBHOOK_SECRET must be set for webhook mode")
+    job_queue.start()
+    threading.Thread(target=dispatch_updates, name="tg-dispatch", daemon=True).start()
+    if not set_webhook():
+        raise RuntimeError(f"Telegram rejected the webhook {WEBHOOK_URL}; see the setWebhook response above")
+    print("🤖 Bot is live in webhook mode. Waiting for /start and Excel uploads...")
+
 if __name__ == "__main__":
     poll_updates()
@@ -0,0 +1,191 @@
+import io
+import os
+import threading
+from datetime import timedelta
+
+import requests
+import pandas as pd
+
+import clock
+import trading_calendar
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Bulk NSE fundamentals snapshot (one download per day, joined with a merge)
+# ──────────────────────────────────────────────────────────────────────────────
+SNAPSHOT_DIR = os.getenv("NSE_BULK_DIR", os.path.join("downloads", "bulk"))
+
+# Daily CSV/JSON snapshot; `{date}` is formatted with strftime codes, e.g. {date:%d%m%y}.
+# Any file with a symbol column and a PE column works (NSE PE report, index
+# constituent exports, a broker dump). Leave empty to rely on local files only.
+SNAPSHOT_URL = os.getenv(
+    "NSE_BULK_URL",
+    "https://nsearchives.nseindia.com/content/equities/peDetail/PE_{date:%d%m%y}.csv",
+)
+
+# The report for a session is published after the close and there is none for
+# weekends or holidays, so the newest of the last few trading days is used.
+SNAPSHOT_LOOKBACK_DAYS = int(os.getenv("NSE_BULK_LOOKBACK_DAYS", "5"))
+# A failed download (or a fallback to an older day) is retried after this long
+SNAPSHOT_RETRY_SECONDS = int(os.getenv("NSE_BULK_RETRY_SECONDS", "1800"))
+
+NSE_HOME = "https://www.nseindia.com"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Accepted spellings in upstream files -> our column names
+SYMBOL_COLS   = ("symbol", "tckrsymb", "ticker")
+PE_COLS       = ("company pe", "pe", "symbol pe", "symbol_pe", "pdsymbolpe", "adjusted p/e", "p/e")
+SECTOR_PE_COLS = ("industry pe", "sector pe", "sector_pe", "pdsectorpe", "industry p/e")
+INDUSTRY_COLS = ("industry", "sector", "basic industry")
+
+
+def snapshot_path(day=None):
+    day = day or clock.now(trading_calendar.IST).date()
+    return os.path.join(SNAPSHOT_DIR, f"nse_bulk_{day:%Y%m%d}.csv")
+
+
+def _pick(columns, candidates):
+    lookup = {str(c).strip().lower(): c for c in columns}
+    return next((lookup[c] for c in candidates if c in lookup), None)
+
+
+def normalize_snapshot(raw):
+    """Map an upstream table to Symbol / Company PE / Industry PE columns."""
+    sym_col = _pick(raw.columns, SYMBOL_COLS)
+    pe_col = _pick(raw.columns, PE_COLS)
+    if sym_col is None or pe_col is None:
+        raise ValueError(f"snapshot needs symbol and PE columns, got {list(raw.columns)}")
+
+    out = pd.DataFrame({
+        "Symbol": raw[sym_col].astype(str).str.strip().str.upper(),
+        "Company PE": pd.to_numeric(raw[pe_col], errors="coerce"),
+    })
+
+    sector_col = _pick(raw.columns, SECTOR_PE_COLS)
+    industry_col = _pick(raw.columns, INDUSTRY_COLS)
+    if sector_col is not None:
+        out["Industry PE"] = pd.to_numeric(raw[sector_col], errors="coerce")
+    elif industry_col is not None:
+        # No sector PE published: use the median PE of the symbol's industry
+        out["Industry PE"] = out.groupby(raw[industry_col].values)["Company PE"].transform("median")
+    else:
+        out["Industry PE"] = float("nan")
+
+    return out.drop_duplicates("Symbol", keep="last").reset_index(drop=True)
+
+
+def published_days(now=None, n=SNAPSHOT_LOOKBACK_DAYS):
+    """Up to `n` recent NSE trading days whose report may be out, newest first."""
+    opened = trading_calendar.last_open("nse", now)
+    day = opened.astimezone(trading_calendar.IST).date()
+    if trading_calendar.is_open("nse", now):
+        day -= timedelta(days=1)  # today's report only appears after the close
+    days = []
+    while len(days) < n:
+        if trading_calendar.is_trading_day("nse", day):
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+
+def download_snapshot(day=None):
+    """Download the snapshot for `day` once and keep it on disk. Returns the path or None."""
+    day = day or clock.now(trading_calendar.IST).date()
+    path = snapshot_path(day)
+    if os.path.exists(path):
+        return path
+    if not SNAPSHOT_URL:
+        return None
+
+    url = SNAPSHOT_URL.format(date=day)
+    try:
+        sess = requests.Session()
+        sess.headers.update(HEADERS)
+        sess.get(NSE_HOME, timeout=10)  # prime cookies
+        res = sess.get(url, timeout=30)
+        res.raise_for_status()
+
+        if url.endswith(".json") or "json" in res.headers.get("Content-Type", ""):
+            payload = res.json()
+            raw = pd.DataFrame(payload.get("data", payload) if isinstance(payload, dict) else payload)
+        else:
+            raw = pd.read_csv(io.StringIO(res.text))
+
+        snap = normalize_snapshot(raw)
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        snap.to_csv(path, index=False)
+        print(f"📦 Bulk snapshot saved: {path} ({len(snap)} symbols)")
+        return path
+    except Exception as e:
+        print(f"⚠️ Bulk snapshot download failed ({url}): {e}")
+        return None
+
+
+def latest_snapshot(now=None):
+    """(path, day) of the newest snapshot available for the recent trading days, or (None, None)."""
+    for day in published_days(now):
+        path = download_snapshot(day)
+        if path:
+            return path, day
+    return None, None
+
+
+_loaded = {}  # newest wanted day -> (snapshot or None, retry_at), so chunked callers parse it once
+_load_lock = threading.Lock()  # Excel workers share one download
+
+
+def load_snapshot(day=None):
+    """
+    Return the normalized snapshot DataFrame for `day`, or for the newest
+    published trading day when `day` is None. A miss, or a fallback to an
+    older day, is only remembered for SNAPSHOT_RETRY_SECONDS.
+    """
+    with _load_lock:
+        return _load_snapshot(day)
+
+
+def _load_snapshot(day):
+    now = clock.time()
+    want = day or published_days(now, 1)[0]
+    if want in _loaded and now < _loaded[want][1]:
+        return _loaded[want][0]
+
+    snap = None
+    if day:
+        path, got = download_snapshot(day), day
+    else:
+        path, got = latest_snapshot(now)
+    if path:
+        try:
+            snap = normalize_snapshot(pd.read_csv(path))
+        except Exception as e:
+            print(f"⚠️ Could not read bulk snapshot {path}: {e}")
+    if snap is not None and got != want:
+        print(f"📦 Bulk snapshot for {want} not published yet, using {got}")
+    retry_at = float("inf") if snap is not None and got == want else now + SNAPSHOT_RETRY_SECONDS
+    _loaded.clear()
+    _loaded[want] = (snap, retry_at)
+    return snap
+
+
+def merge_snapshot(df, snap=None):
+    """
+    Left-join the uploaded frame against the bulk snapshot on `Symbol`.
+    Fills Company PE / Industry PE; symbols missing from the snapshot stay NaN
+    so callers can fall back to per-symbol lookups for just those rows.
+    """
+    snap = load_snapshot() if snap is None else snap
+    if snap is None or snap.empty:
+        return df
+
+    keys = df["Symbol"].astype(str).str.strip().str.upper()
+    merged = (
+        pd.DataFrame({"Symbol": keys})
+        .merge(snap, on="Symbol", how="left")
+    )
+    df = df.copy()
+    df["Company PE"] = merged["Company PE"].values
+    df["Industry PE"] = merged["Industry PE"].values
+    return df
@@ -0,0 +1,48 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are added every `per` seconds, up to
+    `capacity`. acquire(n) blocks exactly as long as needed for n tokens instead
+    of sleeping a fixed amount after every call.
+    """
+
+    def __init__(self, rate, per=60.0, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate / self.per)
+        self._last = now
+
+    def try_acquire(self, n=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= n:
+                self._tokens -= n
+                return True
+            return False
+
+    def acquire(self, n=1):
+        """Block until `n` tokens are available, then take them. Returns seconds waited."""
+        if n > self.capacity:
+            raise ValueError(f"cannot acquire {n} tokens from a bucket of capacity {self.capacity}")
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return waited
+                wait = (n - self._tokens) * self.per / self.rate
+            self._sleep(wait)
+            waited += wait
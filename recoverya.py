@@ -8,6 +8,8 @@ from flask import Flask, jsonify
 import os
 from dotenv import load_dotenv
 from nse2bot2 import poll_updates
+import watchlist
+from cpr import cpr_band, PATTERN_THRESHOLDS
 
 from datetime import date
 
@@ -58,13 +60,13 @@ def mark_alert_sent(instrument, timeframe, pattern_type, level_type=None):
     key = f"{instrument}_{timeframe}_{pattern_type}_{level_type if level_type else ''}"
     sent_alerts[key] = time.time()
 
-def send_telegram_alert(message):
+def send_telegram_alert(message, chat_id=None):
     try:
         if not message or not message.strip():
             return
         url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
         payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
+            "chat_id": chat_id or TELEGRAM_CHAT_ID,
             "text": message,
             "parse_mode": "HTML"
         }
@@ -74,7 +76,7 @@ def send_telegram_alert(message):
     except Exception as e:
         print(f"Telegram send error: {e}")
 
-def check_body_breakout(instrument, timeframe="M30"):
+def check_body_breakout(instrument, timeframe="M30", chat_id=None):
     global breakout_alerts
     if instrument not in breakout_alerts:
         daily_candles = get_candles(instrument, "D", count=2)
@@ -115,17 +117,17 @@ def check_body_breakout(instrument, timeframe="M30"):
         msg = f"🚀 <b>{instrument} Bullish Breakout</b>\n\n"
         msg += f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         msg += f"Open: {candle['open']:.5f}\nClose: {candle['close']:.5f}\nPrev Day High: {prev_high:.5f}"
-        send_telegram_alert(msg)
+        send_telegram_alert(msg, chat_id)
         breakout_alerts[instrument]["alert_sent"] = True
 
     elif body_high < prev_low:
         msg = f"🔻 <b>{instrument} Bearish Breakdown</b>\n\n"
         msg += f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         msg += f"Open: {candle['open']:.5f}\nClose: {candle['close']:.5f}\nPrev Day Low: {prev_low:.5f}"
-        send_telegram_alert(msg)
+        send_telegram_alert(msg, chat_id)
         breakout_alerts[instrument]["alert_sent"] = True
 
-def check_cpr_engulfing(instrument, timeframe):
+def check_cpr_engulfing(instrument, timeframe, chat_id=None, range_mult=None, min_pips=None):
     try:
         daily_candles = get_candles(instrument, "D", count=2)
         if len(daily_candles) < 2:
@@ -143,7 +145,7 @@ def check_cpr_engulfing(instrument, timeframe):
             return False
 
         prev, curr = recent_candles[-2], recent_candles[-1]
-        threshold = max((high - low) * 0.01, 0.0010)
+        threshold = cpr_band(instrument, high, low, range_mult, min_pips)
 
         checks = [
             {"pattern": "BEARISH", "emoji": "🔻", "engulf_check": is_bearish_engulfing(prev, curr),
@@ -170,7 +172,7 @@ def check_cpr_engulfing(instrument, timeframe):
                     f"CPR {check['level_type']}: {check['level_val']:.5f}\n"
                     f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
                 )
-                send_telegram_alert(msg)
+                send_telegram_alert(msg, chat_id)
                 mark_alert_sent(instrument, timeframe, check["pattern"], check["level_type"])
                 return True
         return False
@@ -180,25 +182,37 @@ def check_cpr_engulfing(instrument, timeframe):
         return False
 
 
-def monitor_instrument(instrument, timeframes):
-    """Continuously monitor an instrument for patterns"""
+# This bot has no plain engulfing check; "engulfing" is accepted (the watchlist
+# is shared) but skipped here
+PATTERN_CHECKS = {
+    "cpr_engulfing": check_cpr_engulfing,
+    "body_breakout": check_body_breakout,
+}
+
+def monitor_instrument(instrument, timeframes, runner=None):
+    """Continuously monitor an instrument for patterns (until it leaves the watchlist)"""
+    patterns, thresholds, chat = tuple(PATTERN_CHECKS), {}, None
     while True:
         try:
             # Wait until next 30-minute interval
             wait_seconds = get_next_interval()
             print(f"Waiting {wait_seconds//60} minutes until next check for {instrument} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             time.sleep(wait_seconds)
+            if runner is not None:
+                job = runner.job(instrument)
+                if job is None:
+                    return
+                timeframes, patterns, thresholds, chat = job.timeframes, job.patterns, job.thresholds, job.chat
             
             # Clear expired alerts at the start of each monitoring cycle
             clear_expired_alerts()
             
             for tf in timeframes:
-                signal = check_engulfing(instrument, tf)
-                # cpr_signal = check_cpr_engulfing(instrument, tf)
-                # breakout_signal = check_prev_day_breakout(instrument, tf)
-                if signal or cpr_signal:
-                    #logger.info(signal)
-                    pass
+                for name in patterns:
+                    if name not in PATTERN_CHECKS:
+                        print(f"{instrument}: {name} is not implemented in this bot, skipped")
+                        continue
+                    PATTERN_CHECKS[name](instrument, tf, chat_id=chat, **thresholds.get(name, {}))
                 time.sleep(1)  # Small delay to avoid hitting rate limits
             
         except Exception as e:
@@ -237,21 +251,13 @@ def main():
 
 
 
-    # Step 3: Monitor instruments for patterns
-    instrument_timeframes = {
-        "EUR_USD": ["M30"],
-        "XAU_USD": ["H1"],
-        "NZD_USD": ["M30"],
-        "ETH_USDT": ["H1"]
-    }
-
-    for instrument, timeframes in instrument_timeframes.items():
-        threading.Thread(
-            target=monitor_instrument,
-            args=(instrument, timeframes),
-            daemon=True
-        ).start()
-        print(f"Started monitoring {instrument} on timeframes: {', '.join(timeframes)}")
+    # Step 3: Monitor the watchlist instruments for patterns (file is hot-reloaded)
+    monitors = watchlist.Runner(monitor_instrument, patterns=PATTERN_THRESHOLDS,
+                                default_patterns=tuple(PATTERN_CHECKS))
+    monitors.reload()
+    for job in monitors.jobs.values():
+        print(f"Started monitoring {job.instrument} on timeframes: {', '.join(job.timeframes)}")
+    threading.Thread(target=monitors.watch, daemon=True).start()
 
     try:
         while True:
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Offline replay of fxalert.py against local stand-ins for OANDA, Forex Factory and Telegram.
+
+    python replay_harness.py --hours 24                     # virtual clock, as fast as possible
+    python replay_harness.py --hours 24 --speed 1440        # real time x1440 (one day in ~1 minute)
+    python replay_harness.py --oanda-data recorded/ --ff-data ff_week.json
+
+The real pattern_monitor / news_loop threads run unchanged; only their base URLs
+and the process clock (clock.use) are redirected. With the default virtual clock
+every sleep is resolved by the driver in wake order, so runs are deterministic and
+signal traces measure scheduling delay only. With --speed N time runs N times
+faster than real time. Upstream/check latencies in the report are always real
+(perf_counter).
+
+Recorded data: <dir>/<INSTRUMENT>_M30.json in OANDA's candles response format.
+Without it a seeded random walk is generated per instrument.
+"""
+import os
+import json
+import time
+import zlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import clock
+import lease
+import resample
+import trading_calendar
+
+DEFAULT_START = "2025-11-03T00:00:00+00:00"   # a Monday
+HISTORY_DAYS = 45
+OANDA_TIME = "%Y-%m-%dT%H:%M:%S.000000000Z"
+
+SYNTH = {  # instrument -> (start price, per-M30 volatility)
+    "EUR_USD": (1.08, 0.0008), "XAU_USD": (2400.0, 0.0015),
+    "NZD_USD": (0.60, 0.0009), "ETH_USD": (3000.0, 0.004),
+}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Data
+# ──────────────────────────────────────────────────────────────────────────────
+def synthetic_m30(instrument, start, end, seed=0):
+    """Seeded random-walk M30 bars in [start, end); FX instruments skip the weekend close."""
+    times = pd.date_range(start, end, freq="30min", inclusive="left", tz="UTC")
+    if trading_calendar.market_of(instrument) != "crypto":
+        ny = times.tz_convert(resample.NY_TZ)
+        closed = ((ny.weekday == 5) | ((ny.weekday == 4) & (ny.hour >= 17))
+                  | ((ny.weekday == 6) & (ny.hour < 17)))
+        times = times[~closed]
+    price, vol = SYNTH.get(instrument, (1.0, 0.001))
+    rng = np.random.default_rng(zlib.crc32(instrument.encode()) + seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, vol, len(times))))
+    open_ = np.concatenate([[price], close[:-1]])
+    wick = np.abs(rng.normal(0, vol / 2, (2, len(times)))) * close
+    return pd.DataFrame({
+        "time": times, "open": open_, "close": close,
+        "high": np.maximum(open_, close) + wick[0], "low": np.minimum(open_, close) - wick[1],
+        "volume": rng.integers(50, 500, len(times)),
+    })
+
+
+def load_recorded_m30(path):
+    with open(path, "r", encoding="utf-8") as f:
+        candles = json.load(f)["candles"]
+    return pd.DataFrame({
+        "time": pd.to_datetime([c["time"] for c in candles], utc=True),
+        "open": [float(c["mid"]["o"]) for c in candles],
+        "high": [float(c["mid"]["h"]) for c in candles],
+        "low": [float(c["mid"]["l"]) for c in candles],
+        "close": [float(c["mid"]["c"]) for c in candles],
+        "volume": [int(c.get("volume", 0)) for c in candles],
+    })
+
+
+def synthetic_ff_week(start, currencies=("USD", "EUR", "GBP", "JPY", "NZD")):
+    """A week of Forex Factory-style events (NY-local ISO dates) around `start`."""
+    monday = datetime.fromtimestamp(start, resample.NY_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    monday -= timedelta(days=monday.weekday())
+    impacts = ["High", "Medium", "Low"]
+    events = []
+    for d in range(5):
+        for i, (h, m) in enumerate(((2, 0), (4, 30), (8, 30), (10, 0), (14, 0), (19, 45))):
+            cur = currencies[(d + i) % len(currencies)]
+            at = (monday + timedelta(days=d)).replace(hour=h, minute=m)
+            events.append({
+                "title": f"{cur} Synthetic Release {i + 1}", "country": cur,
+                "date": at.isoformat(), "impact": impacts[(d + i) % 3],
+                "forecast": "0.2%", "previous": "0.1%",
+            })
+    return events
+
+
+class Market:
+    """M30 history per instrument plus lazily built coarser granularities."""
+
+    def __init__(self, m30_frames):
+        self.frames = {(inst, "M30"): df.assign(end=df["time"] + pd.Timedelta(minutes=30))
+                       for inst, df in m30_frames.items()}
+        self._lock = threading.Lock()
+
+    def frame(self, instrument, granularity):
+        with self._lock:
+            key = (instrument, granularity)
+            if key not in self.frames:
+                base = self.frames.get((instrument, "M30"))
+                if base is None or granularity not in resample.TF_SECONDS \
+                        or resample.TF_SECONDS[granularity] < 1800:
+                    return None
+                df = resample.resample_frame(base.drop(columns="end"), granularity, "fx")
+                df["end"] = [pd.Timestamp(resample.bucket_end(t.to_pydatetime(), granularity, "fx"))
+                             for t in df["time"]]
+                self.frames[key] = df
+            return self.frames[key]
+
+    def candles(self, instrument, granularity, now, count=None, since=None):
+        df = self.frame(instrument, granularity)
+        if df is None:
+            return None
+        now = pd.Timestamp(now, unit="s", tz="UTC")
+        df = df[df["time"] <= now]
+        if since is not None:
+            df = df[df["time"] >= pd.Timestamp(resample.parse_time(since))].head(500)
+        else:
+            df = df.tail(min(count or 500, 5000))
+        return [{
+            "complete": bool(r.end <= now), "volume": int(r.volume), "time": r.time.strftime(OANDA_TIME),
+            "mid": {"o": f"{r.open:.5f}", "h": f"{r.high:.5f}", "l": f"{r.low:.5f}", "c": f"{r.close:.5f}"},
+        } for r in df.itertuples()]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Stand-in servers
+# ──────────────────────────────────────────────────────────────────────────────
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {"oanda": 0, "forexfactory": 0, "telegram": 0}
+        self.messages = []
+
+    def hit(self, upstream):
+        with self.lock:
+            self.requests[upstream] += 1
+
+
+def make_handler(market, ff_events, clk, stats, telegram_latency=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path.startswith("/ff_calendar_"):
+                stats.hit("forexfactory")
+                return self._json(200, ff_events)
+            if len(parts) == 4 and parts[:2] == ["v3", "instruments"] and parts[3] == "candles":
+                stats.hit("oanda")
+                inst, gran = parts[2], q.get("granularity", "S5")
+                candles = market.candles(inst, gran, clk.time(),
+                                         count=int(q["count"]) if "count" in q else None, since=q.get("from"))
+                if candles is None:
+                    return self._json(400, {"errorMessage": f"no replay data for {inst} {gran}"})
+                return self._json(200, {"instrument": inst, "granularity": gran, "candles": candles})
+            self._json(404, {"errorMessage": "not found"})
+
+        def do_POST(self):
+            if not self.path.endswith("/sendMessage"):
+                return self._json(404, {"ok": False})
+            stats.hit("telegram")
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if telegram_latency:
+                time.sleep(telegram_latency)
+            with stats.lock:
+                stats.messages.append({"sim_time": clk.time(), "chat_id": body.get("chat_id"),
+                                       "text": body.get("text", "")})
+                message_id = len(stats.messages)
+            self._json(200, {"ok": True, "result": {"message_id": message_id}})
+
+    return Handler
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Run
+# ──────────────────────────────────────────────────────────────────────────────
+def run(instrument_timeframes=None, hours=24.0, speed=0.0, start=DEFAULT_START,
+        oanda_data=None, ff_data=None, telegram_latency=0.0, seed=0, out_dir="replay_out"):
+    """Drive fxalert's monitors and news loop for `hours` of simulated time; returns a report dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    start_epoch = datetime.fromisoformat(start).timestamp()
+    instrument_timeframes = instrument_timeframes or {
+        "EUR_USD": ["M30"], "XAU_USD": ["H1"], "NZD_USD": ["M30"], "ETH_USD": ["H1"],
+    }
+
+    hist_start = pd.Timestamp(start_epoch - HISTORY_DAYS * 86400, unit="s", tz="UTC")
+    hist_end = pd.Timestamp(start_epoch + (hours + 24) * 3600, unit="s", tz="UTC")
+    frames = {}
+    for inst in instrument_timeframes:
+        path = os.path.join(oanda_data, f"{inst}_M30.json") if oanda_data else None
+        frames[inst] = load_recorded_m30(path) if path and os.path.exists(path) \
+            else synthetic_m30(inst, hist_start, hist_end, seed)
+    if ff_data:
+        with open(ff_data, "r", encoding="utf-8") as f:
+            ff_events = json.load(f)
+    else:
+        ff_events = synthetic_ff_week(start_epoch)
+
+    clk = clock.ScaledClock(start_epoch, speed) if speed > 0 else clock.SimulatedClock(start_epoch)
+    prev_clock = clock.use(clk)
+    stats = Stats()
+    server, base = start_server(make_handler(Market(frames), ff_events, clk, stats, telegram_latency))
+
+    import fxalert
+    from tracing import Tracer
+
+    fxalert.OANDA_URL = f"{base}/v3"
+    fxalert.FF_BASE = base
+    fxalert.TELEGRAM_API_BASE = base
+    fxalert.TELEGRAM_BOT_TOKEN = fxalert.TELEGRAM_BOT_TOKEN or "replay-token"
+    fxalert.TELEGRAM_CHAT_ID = fxalert.TELEGRAM_CHAT_ID or "replay-chat"
+    fxalert.last_clear_time = clk.time()
+    fxalert.elector = lease.Elector(None)  # single replica: always the leader
+    fxalert.tracer = Tracer(log_path=os.path.join(out_dir, "signal_traces.log"), clock=clock.time)
+    fxalert.tracer.on_finish(fxalert._observe_trace)
+
+    threading.Thread(target=fxalert.news_loop, args=("thisweek", None, None, fxalert.REFRESH_MINUTES,
+                                                     fxalert.ALERT_LEAD_MIN), daemon=True).start()
+    for inst, tfs in instrument_timeframes.items():
+        threading.Thread(target=fxalert.pattern_monitor, args=(inst, tfs), daemon=True).start()
+
+    real_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if isinstance(clk, clock.SimulatedClock):
+        clk.wait_for_sleepers(len(instrument_timeframes) + 1, timeout=60)
+        clk.advance_to(start_epoch + hours * 3600)
+    else:
+        time.sleep(hours * 3600 / speed)
+    real = time.perf_counter() - real_start
+    cpu = time.process_time() - cpu_start
+    server.shutdown()
+    clock.use(prev_clock)
+
+    checks = {}
+    for (check, inst, tf), st in fxalert.CHECK_SECONDS.stats().items():
+        c = checks.setdefault(check, {"count": 0, "sum": 0.0})
+        c["count"] += st["count"]
+        c["sum"] += st["sum"]
+    upstream = {k[0]: {"count": v["count"], "mean_ms": round(1000 * v["sum"] / v["count"], 3)}
+                for k, v in fxalert.UPSTREAM_SECONDS.stats().items() if v["count"]}
+
+    report = {
+        "simulated_hours": hours,
+        "clock": "virtual" if isinstance(clk, clock.SimulatedClock) else f"scaled x{speed:g}",
+        "real_seconds": round(real, 2),
+        "cpu_seconds": round(cpu, 2),
+        "requests": stats.requests,
+        "telegram_messages": len(stats.messages),
+        "checks": {k: {"count": v["count"], "mean_ms": round(1000 * v["sum"] / v["count"], 3)}
+                   for k, v in checks.items() if v["count"]},
+        "checks_per_real_second": round(sum(v["count"] for v in checks.values()) / real, 1),
+        "upstream": upstream,
+        "candle_cache_hit_ratio": round(fxalert.candle_cache.hit_ratio(), 3),
+        "signal_latency_sim_seconds": fxalert.tracer.summary(),
+        "clock_wakeups": getattr(clk, "wakeups", None),
+    }
+    with open(os.path.join(out_dir, "messages.json"), "w", encoding="utf-8") as f:
+        json.dump(stats.messages, f, indent=1, ensure_ascii=False)
+    with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay fxalert against local OANDA/Forex Factory/Telegram stand-ins")
+    ap.add_argument("--hours", type=float, default=24.0, help="Simulated hours to run")
+    ap.add_argument("--speed", type=float, default=0.0,
+                    help="0 = virtual clock (deterministic, as fast as possible); N = real time x N")
+    ap.add_argument("--start", default=DEFAULT_START, help="Simulated start (ISO-8601 with offset)")
+    ap.add_argument("--instruments", default="", help="e.g. EUR_USD:M30,XAU_USD:H1 (default: fxalert's list)")
+    ap.add_argument("--oanda-data", help="Directory of recorded <INSTRUMENT>_M30.json candle responses")
+    ap.add_argument("--ff-data", help="Recorded Forex Factory weekly JSON")
+    ap.add_argument("--telegram-latency", type=float, default=0.0, help="Real seconds added to each sendMessage")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="replay_out", help="Directory for report.json, messages.json, traces")
+    args = ap.parse_args()
+
+    inst_tfs = {}
+    for item in filter(None, (s.strip() for s in args.instruments.split(","))):
+        inst, _, tf = item.partition(":")
+        inst_tfs.setdefault(inst, []).append(tf or "M30")
+
+    report = run(inst_tfs or None, args.hours, args.speed, args.start, args.oanda_data, args.ff_data,
+                 args.telegram_latency, args.seed, args.out)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
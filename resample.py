@@ -0,0 +1,200 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from trading_calendar import NY_TZ, IST, FX_ROLLOVER_HOUR, NSE_OPEN
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Build higher timeframes locally from one cached lower-timeframe series.
+#
+#   FX  : trading day rolls at 17:00 New York (OANDA's default dailyAlignment);
+#         H4 buckets are aligned to that rollover; weeks start Sunday 17:00 NY.
+#   NSE : session 09:15-15:30 IST; H1 buckets start at 09:15 (last one is the
+#         15:15-15:30 stub), daily = IST session date, weeks start Monday.
+# ──────────────────────────────────────────────────────────────────────────────
+# OANDA granularity / Twelve Data interval names -> seconds
+TF_SECONDS = {
+    "M1": 60, "M5": 300, "M15": 900, "M30": 1800, "H1": 3600, "H4": 14400,
+    "D": 86400, "W": 604800,
+    "1min": 60, "5min": 300, "15min": 900, "30min": 1800, "1h": 3600, "4h": 14400,
+    "1day": 86400, "1week": 604800,
+}
+_CANON = {"1min": "M1", "5min": "M5", "15min": "M15", "30min": "M30", "1h": "H1",
+          "4h": "H4", "1day": "D", "1week": "W"}
+
+_RFC3339 = re.compile(r"^(.*T\d\d:\d\d:\d\d)\.(\d+)(.*)$")
+
+AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def canonical(tf):
+    return _CANON.get(tf, tf)
+
+
+def _wall(ts, tz):
+    """Naive wall-clock time of aware `ts` in `tz`."""
+    return ts.astimezone(tz).replace(tzinfo=None)
+
+
+def _aware(wall, tz):
+    # zoneinfo resolves DST for the wall-clock time; fold=0 picks the first occurrence
+    return wall.replace(tzinfo=tz).astimezone(timezone.utc)
+
+
+def _floor(wall, anchor, secs):
+    """Floor naive `wall` to a `secs` grid anchored at `anchor`."""
+    return anchor + timedelta(seconds=((wall - anchor).total_seconds() // secs) * secs)
+
+
+def bucket_start(ts, tf, market="fx"):
+    """Start of the `tf` bucket containing aware timestamp `ts` (returned in UTC)."""
+    tf = canonical(tf)
+    if market == "fx":
+        tz = NY_TZ
+        wall = _wall(ts, tz)
+        # Trading day = the day that started at the last 17:00 NY
+        day = (wall - timedelta(hours=FX_ROLLOVER_HOUR)).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_open = day + timedelta(hours=FX_ROLLOVER_HOUR)
+        if tf == "W":
+            # Trading week opens Sunday 17:00 NY
+            start = day_open - timedelta(days=(day.weekday() + 1) % 7)
+        elif tf == "D":
+            start = day_open
+        else:
+            start = _floor(wall, day_open, TF_SECONDS[tf])
+    else:
+        tz = IST
+        wall = _wall(ts, tz)
+        session_open = wall.replace(hour=NSE_OPEN[0], minute=NSE_OPEN[1], second=0, microsecond=0)
+        if tf == "W":
+            start = session_open - timedelta(days=session_open.weekday())
+        elif tf == "D":
+            start = session_open
+        else:
+            start = _floor(wall, session_open, TF_SECONDS[tf])
+    return _aware(start, tz)
+
+
+def bucket_end(start, tf, market="fx"):
+    """End (exclusive) of the bucket starting at `start`; FX weeks end Friday 17:00 NY, NSE sessions 15:30 IST."""
+    tf = canonical(tf)
+    tz = NY_TZ if market == "fx" else IST
+    wall = _wall(start, tz)
+    if market == "fx":
+        if tf == "W":
+            end = wall + timedelta(days=5)
+        elif tf == "D":
+            end = wall + timedelta(days=1)
+        else:
+            end = wall + timedelta(seconds=TF_SECONDS[tf])
+    else:
+        session_close = wall.replace(hour=15, minute=30, second=0, microsecond=0)
+        if tf == "W":
+            end = session_close + timedelta(days=4)
+        elif tf == "D":
+            end = session_close
+        else:
+            end = min(wall + timedelta(seconds=TF_SECONDS[tf]), session_close)
+    return _aware(end, tz)
+
+
+def bucket_starts(times, tf, market="fx"):
+    """Vectorized bucket_start for a Series of aware timestamps (returned in UTC)."""
+    import pandas as pd  # only the frame helpers need pandas; the candle path is pure Python
+
+    tf = canonical(tf)
+    tz = NY_TZ if market == "fx" else IST
+    wall = pd.to_datetime(times, utc=True).dt.tz_convert(tz).dt.tz_localize(None)
+
+    if market == "fx":
+        day = (wall - pd.Timedelta(hours=FX_ROLLOVER_HOUR)).dt.floor("D")
+        day_open = day + pd.Timedelta(hours=FX_ROLLOVER_HOUR)
+        if tf == "W":
+            start = day_open - pd.to_timedelta((day.dt.weekday + 1) % 7, unit="D")
+        elif tf == "D":
+            start = day_open
+        else:
+            start = day_open + (wall - day_open).dt.floor(f"{TF_SECONDS[tf]}s")
+    else:
+        session_open = wall.dt.floor("D") + pd.Timedelta(hours=NSE_OPEN[0], minutes=NSE_OPEN[1])
+        if tf == "W":
+            start = session_open - pd.to_timedelta(session_open.dt.weekday, unit="D")
+        elif tf == "D":
+            start = session_open
+        else:
+            start = session_open + (wall - session_open).dt.floor(f"{TF_SECONDS[tf]}s")
+
+    return start.dt.tz_localize(tz, ambiguous="NaT", nonexistent="shift_forward").dt.tz_convert("UTC")
+
+
+def resample_frame(df, tf, market="fx", base_tf=None, as_of=None):
+    """
+    Aggregate an OHLC(V) frame with an aware 'time' column (bar open times) into `tf`.
+    Adds 'complete': a bucket is complete once its end is covered by the last base bar
+    (base bar open + base_tf), or by `as_of` if given.
+    """
+    import pandas as pd
+
+    if df.empty:
+        return df.assign(complete=pd.Series(dtype=bool))
+    times = pd.to_datetime(df["time"], utc=True)
+    keys = bucket_starts(times, tf, market).set_axis(df.index)
+
+    cols = {c: a for c, a in AGG.items() if c in df.columns}
+    out = df.assign(_bucket=keys).groupby("_bucket", sort=True).agg(cols)
+    out.index.name = "time"
+    out = out.reset_index()
+
+    if as_of is None and base_tf:
+        as_of = times.iloc[-1].to_pydatetime() + timedelta(seconds=TF_SECONDS[canonical(base_tf)])
+    if as_of is not None:
+        out["complete"] = [bucket_end(t.to_pydatetime(), tf, market) <= as_of for t in out["time"]]
+    return out
+
+
+def resample_candles(candles, tf, base_tf, market="fx", as_of=None):
+    """
+    Same as resample_frame for fxalert-style candle dicts
+    ({'open','high','low','close','time' (RFC3339 str),'complete'}).
+    Only complete base candles are used.
+    """
+    base = [c for c in candles if c.get("complete", True)]
+    if not base:
+        return []
+    buckets = {}
+    order = []
+    for c in base:
+        t = parse_time(c["time"])
+        key = bucket_start(t, tf, market)
+        b = buckets.get(key)
+        if b is None:
+            buckets[key] = b = {"open": c["open"], "high": c["high"], "low": c["low"], "close": c["close"]}
+            if "volume" in c:
+                b["volume"] = 0
+            order.append(key)
+        else:
+            b["high"] = max(b["high"], c["high"])
+            b["low"] = min(b["low"], c["low"])
+            b["close"] = c["close"]
+        if "volume" in c:
+            b["volume"] += c["volume"]
+
+    if as_of is None:
+        as_of = parse_time(base[-1]["time"]) + timedelta(seconds=TF_SECONDS[canonical(base_tf)])
+    out = []
+    for key in order:
+        b = buckets[key]
+        b["time"] = key.strftime("%Y-%m-%dT%H:%M:%S.000000000Z")
+        b["complete"] = bucket_end(key, tf, market) <= as_of
+        out.append(b)
+    return out
+
+
+def parse_time(s):
+    """Aware datetime from an OANDA RFC3339 string (nanosecond precision) or a datetime."""
+    if isinstance(s, datetime):
+        return s if s.tzinfo else s.replace(tzinfo=timezone.utc)
+    s = s.replace("Z", "+00:00")
+    m = _RFC3339.match(s)
+    if m:
+        s = f"{m.group(1)}.{m.group(2)[:6]}{m.group(3)}"
+    return datetime.fromisoformat(s)
@@ -1,4 +1,6 @@
 import os
+import re
+import json
 import time
 import requests
 import pandas as pd
@@ -6,14 +8,34 @@ from tabulate import tabulate
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from dotenv import load_dotenv
+import symbol_cache
+import screener_rules
 
 # Load environment variables
 load_dotenv()
 
 DOWNLOAD_DIR = "downloads"
 
-# Step 1: Get Tickertape URL using slug search API
+TICKERTAPE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__" type="application/json"[^>]*>(.*?)</script>', re.S)
+
+# Where the page's own security sits in __NEXT_DATA__ (props.pageProps.<key>);
+# peer and sector blocks elsewhere in the tree carry the same ratio keys
+SECURITY_KEYS = ("securityInfo", "securitySummary", "security")
+# Key spellings seen in the security's `ratios` node (compared lower-case)
+PE_KEYS = ("pe", "ttmpe", "peratio")
+SECTOR_PE_KEYS = ("indpe", "sectorpe", "industrype")
+
+# Step 1: Get Tickertape URL using slug search API (persisted symbol -> slug map)
 def get_tickertape_slug(symbol):
+    known = symbol_cache.get_slug(symbol, source="tickertape")
+    if known:
+        slug, ticker = known
+        return f"https://www.tickertape.in/stocks/{slug}-{ticker}"
+
     url = f"https://api.tickertape.in/search?text={symbol.upper()}"
     headers = {"User-Agent": "Mozilla/5.0"}
 
@@ -23,36 +45,83 @@ def get_tickertape_slug(symbol):
         data = res.json()
         slug = data["data"]["stocks"][0]["slug"]
         ticker = data["data"]["stocks"][0]["ticker"]
+        symbol_cache.store_slug(symbol, slug, ticker, source="tickertape")
         return f"https://www.tickertape.in/stocks/{slug}-{ticker}"
     except Exception as e:
         print(f"❌ Failed to get Tickertape slug for {symbol}: {e}")
         return None
 
-# Step 2: Launch Selenium and extract PE data from Tickertape page
-def fetch_pe_from_tickertape(symbol, driver):
+def _own_ratios(payload, sid=None):
+    """The `ratios` node of the page's own security, or None if it cannot be told apart."""
+    page = ((payload or {}).get("props") or {}).get("pageProps") or {}
+    for key in SECURITY_KEYS:
+        sec = page.get(key)
+        if not isinstance(sec, dict) or not isinstance(sec.get("ratios"), dict):
+            continue
+        info = sec.get("info") if isinstance(sec.get("info"), dict) else sec
+        ids = {str(info.get(k, "")).upper() for k in ("sid", "ticker")} - {""}
+        if sid and ids and sid.upper() not in ids:
+            continue
+        return sec["ratios"]
+    return None
+
+def _number(ratios, keys):
+    for k, v in ratios.items():
+        if str(k).lower() in keys and isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+    return None
+
+# Step 2a: Plain HTTP path - parse the page's embedded __NEXT_DATA__ JSON
+def fetch_pe_http(url):
+    res = requests.get(url, headers=TICKERTAPE_HEADERS, timeout=10)
+    res.raise_for_status()
+    m = NEXT_DATA_RE.search(res.text)
+    if not m:
+        return None, None
+    ratios = _own_ratios(json.loads(m.group(1)), sid=url.rstrip("/").rsplit("-", 1)[-1])
+    if ratios is None:
+        return None, None
+    return _number(ratios, PE_KEYS), _number(ratios, SECTOR_PE_KEYS)
+
+# Step 2b: Selenium fallback - extract PE data from the rendered Tickertape page
+def fetch_pe_selenium(url, driver):
+    driver.get(url)
+    time.sleep(5)
+
+    elements = driver.find_elements("css selector", "div[class*='key-metrics'] span")
+    text_values = [e.text.strip() for e in elements if e.text.strip()]
+
+    pe = next((float(v) for v in text_values if v.replace('.', '', 1).replace('-', '', 1).isdigit()), None)
+    sector_pe = None
+    for i, v in enumerate(text_values):
+        if "Sector PE" in v:
+            sector_pe = float(text_values[i + 1]) if i + 1 < len(text_values) else None
+
+    return pe, sector_pe
+
+def fetch_pe_from_tickertape(symbol, driver=None):
+    """HTTP first; the browser only loads when the embedded JSON lacks PE data."""
     url = get_tickertape_slug(symbol)
     if not url:
         return None, None
 
+    pe, sector_pe = None, None
     try:
-        driver.get(url)
-        time.sleep(5)
-
-        elements = driver.find_elements("css selector", "div[class*='key-metrics'] span")
-        text_values = [e.text.strip() for e in elements if e.text.strip()]
-
-        pe = next((float(v) for v in text_values if v.replace('.', '', 1).replace('-', '', 1).isdigit()), None)
-        sector_pe = None
-        for i, v in enumerate(text_values):
-            if "Sector PE" in v:
-                sector_pe = float(text_values[i + 1]) if i + 1 < len(text_values) else None
+        pe, sector_pe = fetch_pe_http(url)
+        if pe is not None and sector_pe is not None:
+            return pe, sector_pe
+    except Exception as e:
+        print(f"⚠️ {symbol} HTTP metrics fetch failed, trying browser: {e}")
 
-        return pe, sector_pe
+    try:
+        return fetch_pe_selenium(url, driver or get_driver())
     except Exception as e:
         print(f"❌ {symbol} Tickertape fetch failed: {e}")
-        return None, None
+        return pe, sector_pe
+
+# Step 3: Setup Selenium driver once, and only when the HTTP path needs it
+_driver = None
 
-# Step 3: Setup Selenium driver once
 def setup_driver():
     chrome_options = Options()
     chrome_options.add_argument("--headless=new")
@@ -60,19 +129,38 @@ def setup_driver():
     chrome_options.add_argument("--no-sandbox")
     return webdriver.Chrome(options=chrome_options)
 
+def get_driver():
+    global _driver
+    if _driver is None:
+        print("🌐 Launching Selenium fallback for Tickertape...")
+        _driver = setup_driver()
+    return _driver
+
 # Step 4: Fetch PE ratios for all symbols
-def fetch_pe_ratios(df, driver):
+def fetch_pe_ratios(df, driver=None):
     df["Company PE"] = None
     df["Industry PE"] = None
 
+    # Serve symbols looked up earlier today from the local cache
+    cached = symbol_cache.get_many(df["Symbol"].astype(str).tolist(), source="tickertape")
+
     for idx, row in df.iterrows():
         symbol = str(row["Symbol"]).strip().upper()
         if not symbol:
             continue
 
+        hit = cached.get(symbol)
+        if hit:
+            df.at[idx, "Company PE"] = hit["pe"]
+            df.at[idx, "Industry PE"] = hit["sector_pe"]
+            continue
+
         pe, ind_pe = fetch_pe_from_tickertape(symbol, driver)
         df.at[idx, "Company PE"] = pe
         df.at[idx, "Industry PE"] = ind_pe
+        if pe is not None or ind_pe is not None:
+            symbol_cache.store_fundamentals(symbol, pe, ind_pe, source="tickertape")
+            cached[symbol] = {"pe": pe, "sector_pe": ind_pe}
 
         if pe is not None and ind_pe is not None:
             print(f"✅ {symbol}: PE = {pe}, Industry PE = {ind_pe}")
@@ -81,7 +169,11 @@ def fetch_pe_ratios(df, driver):
 
     return df
 
-# Step 5: Filter the stocks
+# Step 5: Filter the stocks (rules live in screens.json, "fundamentals" section)
+DEFAULT_SCREENS = {
+    "PASS": "company_pe < industry_pe and 10 <= roe <= 15 and 10 <= eps <= 15 and 1 <= pb_ratio <= 5",
+}
+
 def apply_filter(df):
     df["Company PE"] = pd.to_numeric(df["Company PE"], errors="coerce")
     df["Industry PE"] = pd.to_numeric(df["Industry PE"], errors="coerce")
@@ -93,15 +185,12 @@ def apply_filter(df):
     if "PB Ratio" not in df.columns:
         df["PB Ratio"] = 3
 
-    return df[
-        (df["Company PE"] < df["Industry PE"]) &
-        (df["ROE"].between(10, 15)) &
-        (df["EPS"].between(10, 15)) &
-        (df["PB Ratio"].between(1, 5))
-    ]
+    screens = screener_rules.load_screens("fundamentals", DEFAULT_SCREENS)
+    result = screener_rules.evaluate(screens, screener_rules.FrameEnv(df))
+    return df[result["PASS"]]
 
 # Step 6: Process each Excel file
-def process_excel(file_path, driver):
+def process_excel(file_path, driver=None):
     print(f"\n📁 Processing: {file_path}")
     try:
         df = pd.read_excel(file_path, skiprows=1)
@@ -134,15 +223,13 @@ if __name__ == "__main__":
         print(f"❌ Folder not found: {DOWNLOAD_DIR}")
         exit()
 
-    print("🌐 Launching Selenium to extract data from Tickertape...")
-    driver = setup_driver()
-
     excel_files = [f for f in os.listdir(DOWNLOAD_DIR) if f.endswith((".xlsx", ".xls"))]
     if not excel_files:
         print("📂 No Excel files found in the downloads folder.")
     else:
         for excel_file in excel_files:
             full_path = os.path.join(DOWNLOAD_DIR, excel_file)
-            process_excel(full_path, driver)
+            process_excel(full_path)
 
-    driver.quit()
+    if _driver is not None:
+        _driver.quit()
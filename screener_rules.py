@@ -0,0 +1,187 @@
+import os
+import re
+import ast
+import json
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Expression-based screen engine
+#
+# Screens are declared as plain expressions, e.g.
+#     "close >= prev_high and close > 0.75*high"
+# and compiled once into vectorized pandas/NumPy code that evaluates the whole
+# universe in one go. Names resolve lazily against an environment and each
+# derived column (rolling highs, previous values, ...) is computed once and
+# shared by every screen in the pass. A screen may reference earlier screens.
+# ──────────────────────────────────────────────────────────────────────────────
+SCREENS_FILE = os.getenv("SCREENS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "screens.json"))
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Compare, ast.Eq, ast.NotEq,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Name, ast.Load, ast.Constant, ast.Call,
+)
+_FUNCS = {"abs": np.abs, "min": np.minimum, "max": np.maximum}
+
+
+class _Vectorize(ast.NodeTransformer):
+    """Rewrite and/or/not and chained comparisons into element-wise &, |, ~."""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        out = node.values[0]
+        for v in node.values[1:]:
+            out = ast.BinOp(left=out, op=op, right=v)
+        return out
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        parts, left = [], node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        out = parts[0]
+        for p in parts[1:]:
+            out = ast.BinOp(left=out, op=ast.BitAnd(), right=p)
+        return out
+
+
+@lru_cache(maxsize=256)
+def compile_rule(expr):
+    """Compile an expression to a code object evaluated against a name -> column mapping."""
+    tree = ast.parse(expr, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"unsupported syntax in rule {expr!r}: {type(node).__name__}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _FUNCS):
+            raise ValueError(f"unsupported function in rule {expr!r}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"only numeric constants are allowed in rule {expr!r}")
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    return compile(tree, f"<rule {expr}>", "eval")
+
+
+def evaluate(screens, env):
+    """
+    Evaluate {name: expression} in order against `env` (a mapping of lazily computed
+    columns). Returns a DataFrame with one boolean column per screen.
+    """
+    results = {}
+    for name, expr in screens.items():
+        value = eval(compile_rule(expr), {"__builtins__": {}, **_FUNCS}, env)
+        results[name] = value
+        env[name] = value
+    return pd.DataFrame(results, index=env.index)
+
+
+def load_screens(section, default=None, path=None):
+    """Screens for `section` from the JSON config file, or `default` if absent."""
+    path = path or SCREENS_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(section) or default
+    except FileNotFoundError:
+        return default
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Environments
+# ──────────────────────────────────────────────────────────────────────────────
+def snake(name):
+    return re.sub(r"[^0-9a-z]+", "_", str(name).strip().lower()).strip("_")
+
+
+class FrameEnv(dict):
+    """Row-wise frame (one row per stock): names are snake_cased column names."""
+
+    def __init__(self, df):
+        super().__init__()
+        self.index = df.index
+        self._cols = {snake(c): c for c in df.columns}
+        self._df = df
+
+    def __missing__(self, name):
+        if name in _FUNCS:
+            raise KeyError(name)  # let eval fall through to the function table
+        if name not in self._cols:
+            raise NameError(f"unknown column {name!r}; available: {sorted(self._cols)}")
+        value = pd.to_numeric(self._df[self._cols[name]], errors="coerce")
+        self[name] = value
+        return value
+
+
+_WINDOW = re.compile(r"^(max|min|mean|sum|sma)_([a-z]+)_(\d+)$")
+_PREV = re.compile(r"^prev(\d*)_([a-z]+)$")
+
+
+class BhavFeatures(dict):
+    """
+    Per-symbol features over a long OHLC frame (symbol, date, open, high, low, close[, volume]).
+
+    Each column is pivoted once into a right-aligned matrix: row 0 is every symbol's
+    latest session, row 1 the one before, and so on (the same rows groupby().tail()
+    would pick). Supported names:
+        close, open, high, low, volume      latest session
+        prev_high, prev2_close, ...         n sessions back
+        max_close_5, min_open_20,
+        mean_close_50 (sma_close_50),
+        sum_volume_10                       aggregates over the last n sessions
+        bars                                sessions available per symbol
+    """
+
+    def __init__(self, df, depth=None):
+        super().__init__()
+        df = df.sort_values(["symbol", "date"])
+        if depth:
+            df = df.groupby("symbol", sort=False).tail(depth)
+        self._long = df.assign(_k=df.groupby("symbol", sort=False).cumcount(ascending=False))
+        self.index = pd.Index(np.sort(df["symbol"].unique()), name="symbol")
+        self._mats = {}
+
+    def matrix(self, col):
+        if col not in self._mats:
+            if col not in self._long.columns:
+                raise NameError(f"unknown column {col!r}")
+            self._mats[col] = (
+                self._long.pivot(index="_k", columns="symbol", values=col)
+                .reindex(columns=self.index)
+                .to_numpy(dtype="float64")
+            )
+        return self._mats[col]
+
+    def __missing__(self, name):
+        if name in _FUNCS:
+            raise KeyError(name)  # let eval fall through to the function table
+        if name == "bars":
+            value = self._long.groupby("symbol").size().reindex(self.index)
+        elif name in ("open", "high", "low", "close", "volume"):
+            value = pd.Series(self.matrix(name)[0], index=self.index)
+        elif _PREV.match(name):
+            back, col = _PREV.match(name).groups()
+            back = int(back or 1)
+            mat = self.matrix(col)
+            row = mat[back] if back < len(mat) else np.full(len(self.index), np.nan)
+            value = pd.Series(row, index=self.index)
+        elif _WINDOW.match(name):
+            agg, col, n = _WINDOW.match(name).groups()
+            window = self.matrix(col)[:int(n)]
+            fn = {"max": np.nanmax, "min": np.nanmin, "mean": np.nanmean,
+                  "sma": np.nanmean, "sum": np.nansum}[agg]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                value = pd.Series(fn(window, axis=0), index=self.index)
+        else:
+            raise NameError(f"unknown feature {name!r}")
+        self[name] = value
+        return value
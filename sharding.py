@@ -0,0 +1,64 @@
+import bisect
+import hashlib
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Consistent hashing of instruments onto worker processes
+#
+# Each worker owns VNODES points on a 64-bit ring and an instrument belongs to
+# the first point clockwise of its own hash. Adding or removing a worker only
+# moves the instruments on the arcs that worker gains or loses (about 1/N of
+# them), so candle caches and indicator state mostly stay where they are.
+# ──────────────────────────────────────────────────────────────────────────────
+VNODES = 128
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self._points = []   # sorted hashes
+        self._owners = []   # node for each point
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        node = str(node)
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            h = _hash(f"{node}#{i}")
+            at = bisect.bisect(self._points, h)
+            self._points.insert(at, h)
+            self._owners.insert(at, node)
+
+    def remove(self, node):
+        node = str(node)
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(h, o) for h, o in zip(self._points, self._owners) if o != node]
+        self._points = [h for h, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, _hash(key)) % len(self._points)]
+
+    def assignments(self, keys):
+        """{node: [keys]} for every node (nodes without keys map to [])."""
+        out = {node: [] for node in self.nodes}
+        for key in keys:
+            out[self.owner(key)].append(key)
+        return out
+
+
+def moved(keys, old_nodes, new_nodes):
+    """Keys whose owner differs between two memberships (what a rebalance hands over)."""
+    old, new = HashRing(old_nodes), HashRing(new_nodes)
+    return [k for k in keys if old.owner(k) != new.owner(k)]
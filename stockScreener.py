@@ -1,14 +1,21 @@
 import time
+import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import screener_rules
 
 # === Setup ===
 CHROME_DRIVER_PATH = r"C:\webdrivers\chromedriver-win64\chromedriver.exe"
 
+# Used when screens.json has no "screener_in" section
+DEFAULT_SCREENS = {
+    "PASS": "pe < industry_pe and 1 <= pb <= 5 and roe > 10 and eps > 10",
+}
+
 def analyze_stock(stock_name):
     options = Options()
     # Uncomment headless if needed
@@ -63,13 +70,13 @@ def analyze_stock(stock_name):
             except:
                 return 0
 
-        # Evaluation logic
-        passes = (
-            safe_float(pe) < safe_float(industry_pe)
-            and 1 <= safe_float(pb) <= 5
-            and safe_float(roe) > 10
-            and safe_float(eps) > 10
-        )
+        # Evaluation logic (rules live in screens.json, "screener_in" section)
+        metrics = pd.DataFrame([{
+            "pe": safe_float(pe), "industry_pe": safe_float(industry_pe),
+            "pb": safe_float(pb), "roe": safe_float(roe), "eps": safe_float(eps),
+        }])
+        screens = screener_rules.load_screens("screener_in", DEFAULT_SCREENS)
+        passes = bool(screener_rules.evaluate(screens, screener_rules.FrameEnv(metrics))["PASS"].iloc[0])
 
         # Output
         print(f"\n📈 {stock_name.upper()} Analysis:")
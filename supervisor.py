@@ -0,0 +1,227 @@
+import os
+import signal
+import threading
+import collections
+import multiprocessing as mp
+
+from flask import jsonify
+
+import clock
+import fxalert
+import instruments
+import metrics
+import watchlist
+from sharding import HashRing, moved
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Supervisor mode: shard the watchlist across worker processes
+#
+#   supervisor : health/metrics server, FF news loop, Telegram sender(s)
+#   worker k   : pattern monitors for the instruments the hash ring gives k
+#
+# Workers never talk to Telegram themselves; fxalert.alert_sink puts every
+# alert on one shared queue and the supervisor delivers it through
+# fxalert.deliver_telegram, so the rate limits apply to the whole bot. Alerts
+# are sorted into one outbox queue per chat, and a sender only picks a chat
+# that has a token left, so a chat over its limit never holds up the others.
+#
+# Membership is just the worker count (workers are 0..N-1). Workers poll it
+# and re-filter the watchlist when it changes; consistent hashing means only
+# ~1/N of the instruments change hands. SIGTTIN adds a worker and SIGTTOU
+# removes one (same convention as gunicorn).
+# ──────────────────────────────────────────────────────────────────────────────
+SHARD_POLL_SECONDS = int(os.getenv("SHARD_POLL_SECONDS", "10"))
+TELEGRAM_SENDERS = int(os.getenv("TELEGRAM_SENDERS", "4"))
+STATE_SAVE_SECONDS = 600
+
+
+def _ring(size):
+    return HashRing(range(size))
+
+
+def worker_main(index, members, alerts, join_delay=0):
+    """Entry point of worker process `index`."""
+    fxalert.alert_sink = lambda message, chat_id, trace: alerts.put(
+        (message, chat_id, trace.as_dict() if trace is not None else None))
+    state_file = f"{fxalert.INDICATOR_STATE_FILE}.{index}" if fxalert.INDICATOR_STATE_FILE else ""
+    fxalert.load_indicator_state(state_file)
+    instruments.metadata()  # disk cache refreshed by the supervisor
+
+    runner = fxalert.monitors
+    size, saved = None, clock.time()
+    try:
+        if join_delay:
+            clock.sleep(join_delay)  # let the current owners release their instruments first
+        while True:
+            n = members.value
+            if n != size:
+                ring = _ring(n)
+                runner.select = lambda inst, ring=ring: ring.owner(inst) == str(index)
+                runner.reload(force=True)
+                size = n
+                print(f"[worker {index}/{n}] {len(runner.jobs)} instruments: {', '.join(sorted(runner.jobs))}")
+            else:
+                runner.reload()
+            if state_file and clock.time() - saved >= STATE_SAVE_SECONDS:
+                fxalert.save_indicator_state(state_file)
+                saved = clock.time()
+            clock.sleep(SHARD_POLL_SECONDS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if state_file:
+            fxalert.save_indicator_state(state_file)
+
+
+class ChatOutbox:
+    """Per-chat FIFOs of alerts, handed out round-robin to chats within their rate limit."""
+
+    POLL_SECONDS = 0.5  # re-check throttled chats this often (tokens refill every few seconds)
+
+    def __init__(self):
+        self._queues = collections.OrderedDict()  # chat_id -> deque of (message, stamps)
+        self._cond = threading.Condition()
+
+    def put(self, chat_id, item):
+        with self._cond:
+            self._queues.setdefault(chat_id, collections.deque()).append(item)
+            self._cond.notify()
+
+    def depth(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def take(self):
+        """Block until some chat may send; returns (chat_id, item) with that chat's token taken."""
+        with self._cond:
+            while True:
+                for chat_id, q in self._queues.items():
+                    if fxalert.chat_limit(chat_id).try_acquire():
+                        item = q.popleft()
+                        self._queues.move_to_end(chat_id)
+                        if not q:
+                            del self._queues[chat_id]
+                        return chat_id, item
+                self._cond.wait(self.POLL_SECONDS if self._queues else None)
+
+
+class Supervisor:
+    def __init__(self, workers):
+        self.ctx = mp.get_context("spawn")
+        self.alerts = self.ctx.Queue()
+        self.outbox = ChatOutbox()
+        self.members = self.ctx.Value("i", 0)
+        self.procs = {}
+        self._lock = threading.RLock()  # scale() also runs from signal handlers
+        self.initial = max(1, workers)
+        metrics.Gauge("fxalert_workers", "Live worker processes",
+                      fn=lambda: sum(p.is_alive() for p in list(self.procs.values())))
+        metrics.Gauge("fxalert_alert_queue_depth", "Alerts waiting for the Telegram sender",
+                      fn=lambda: self.alerts.qsize() + self.outbox.depth())
+
+    def _spawn(self, index, join_delay=0):
+        p = self.ctx.Process(target=worker_main, args=(index, self.members, self.alerts, join_delay),
+                             name=f"fxalert-worker-{index}", daemon=True)
+        p.start()
+        self.procs[index] = p
+
+    def scale(self, n):
+        """Resize to `n` workers; survivors pick up or release instruments on their next poll."""
+        n = max(1, n)
+        with self._lock:
+            old = self.members.value
+            if n == old:
+                return
+            keys = self.instruments()
+            self.members.value = n
+            for i in range(old, n):
+                self._spawn(i, join_delay=SHARD_POLL_SECONDS if old else 0)
+            for i in range(n, old):
+                self._retire(self.procs.pop(i))
+        if old:
+            print(f"Supervisor: {old} -> {n} workers, "
+                  f"{len(moved(keys, range(old), range(n)))}/{len(keys)} instruments move")
+
+    def _retire(self, p):
+        # SIGINT lets the worker save its indicator state before exiting
+        if hasattr(signal, "SIGINT") and os.name == "posix":
+            os.kill(p.pid, signal.SIGINT)
+        else:
+            p.terminate()
+
+    def instruments(self):
+        try:
+            return sorted(watchlist.load(patterns=fxalert.CHECK_THRESHOLDS, known=instruments.metadata()))
+        except Exception as e:
+            print(f"Supervisor: watchlist unreadable: {e}")
+            return []
+
+    def assignments(self):
+        with self._lock:
+            size = self.members.value
+        return {"workers": size, "shards": _ring(size).assignments(self.instruments())}
+
+    def router(self):
+        """Move alerts from the workers' queue into the per-chat outbox."""
+        while True:
+            try:
+                message, chat_id, stamps = self.alerts.get()
+            except (EOFError, OSError):
+                return  # queue closed at shutdown
+            self.outbox.put(chat_id or fxalert.TELEGRAM_CHAT_ID, (message, stamps))
+
+    def sender(self):
+        """Deliver outbox alerts within the per-chat and global rate limits."""
+        while True:
+            chat_id, (message, stamps) = self.outbox.take()
+            trace = None
+            if stamps is not None:
+                trace = fxalert.tracer.start(stamps.pop("instrument"), stamps.pop("timeframe"),
+                                             stamps.pop("pattern"))
+                trace.stamps.update(stamps)
+            fxalert.deliver_telegram(message, trace, chat_id, chat_token=True)
+
+    def check_workers(self):
+        """Restart workers that died (they rejoin with the same shard)."""
+        with self._lock:
+            for index, p in list(self.procs.items()):
+                if not p.is_alive():
+                    print(f"Supervisor: worker {index} exited ({p.exitcode}); restarting")
+                    self._spawn(index)
+
+    def stop(self):
+        with self._lock:
+            for p in self.procs.values():
+                p.terminate()
+            for p in self.procs.values():
+                p.join(5)
+
+
+def run(workers, news_args):
+    """Supervisor main loop (fxalert --workers N)."""
+    instruments.load_instruments(fxalert.OANDA_URL, fxalert.OANDA_ACCOUNT_ID, fxalert.HEADERS)
+
+    sup = Supervisor(workers)
+    fxalert.app.add_url_rule("/shards", "shards", lambda: jsonify(sup.assignments()))
+    threading.Thread(target=fxalert.run_flask, daemon=True).start()
+    threading.Thread(target=fxalert.keep_server_alive, daemon=True).start()
+    threading.Thread(target=fxalert.news_loop, args=news_args, daemon=True).start()
+    threading.Thread(target=sup.router, name="tg-router", daemon=True).start()
+    for i in range(max(1, TELEGRAM_SENDERS)):
+        threading.Thread(target=sup.sender, name=f"tg-sender-{i}", daemon=True).start()
+
+    if hasattr(signal, "SIGTTIN"):
+        signal.signal(signal.SIGTTIN, lambda *_: sup.scale(sup.members.value + 1))
+        signal.signal(signal.SIGTTOU, lambda *_: sup.scale(sup.members.value - 1))
+
+    sup.scale(sup.initial)
+    print(f"Supervisor: {sup.initial} workers, shards: {sup.assignments()['shards']}")
+    try:
+        while True:
+            clock.sleep(5)
+            sup.check_workers()
+    except KeyboardInterrupt:
+        print("Stopped by user.")
+    finally:
+        sup.stop()
+        fxalert.elector.release()
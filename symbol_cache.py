@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+
+import clock
+import trading_calendar
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Persistent symbol -> fundamentals cache (NSE / Tickertape lookups)
+# ──────────────────────────────────────────────────────────────────────────────
+CACHE_DB = os.getenv("SYMBOL_CACHE_DB", os.path.join("downloads", "symbol_cache.sqlite3"))
+
+# TTL in hours; 0 (default) means "refresh once per trading day", i.e. an entry
+# is fresh if it was fetched after the most recent NSE session open (weekends and
+# exchange holidays do not count, so nothing is refetched while the market is shut).
+CACHE_TTL_HOURS = float(os.getenv("SYMBOL_CACHE_TTL_HOURS", "0"))
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_DB) or ".", exist_ok=True)
+        _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS fundamentals (
+                symbol     TEXT NOT NULL,
+                source     TEXT NOT NULL,
+                pe         REAL,
+                sector_pe  REAL,
+                slug       TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (symbol, source)
+            )
+        """)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS slugs (
+                symbol TEXT NOT NULL,
+                source TEXT NOT NULL,
+                slug   TEXT NOT NULL,
+                ticker TEXT,
+                PRIMARY KEY (symbol, source)
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+def _fresh_after(now=None):
+    """Epoch seconds after which a cached entry still counts as fresh."""
+    now = now or clock.time()
+    if CACHE_TTL_HOURS > 0:
+        return now - CACHE_TTL_HOURS * 3600
+
+    return trading_calendar.last_open("nse", now).timestamp()
+
+
+def get_fundamentals(symbol, source="nse"):
+    """Return cached {'pe', 'sector_pe', 'slug', 'fetched_at'} for `symbol` if still fresh, else None."""
+    symbol = symbol.strip().upper()
+    with _lock:
+        row = _connect().execute(
+            "SELECT pe, sector_pe, slug, fetched_at FROM fundamentals WHERE symbol = ? AND source = ?",
+            (symbol, source),
+        ).fetchone()
+    if not row or row[3] < _fresh_after():
+        return None
+    return {"pe": row[0], "sector_pe": row[1], "slug": row[2], "fetched_at": row[3]}
+
+
+def get_many(symbols, source="nse", max_age_hours=None):
+    """
+    Bulk variant of get_fundamentals: {symbol: entry} for every fresh symbol.
+    `max_age_hours` overrides the freshness rule (for slow-moving values).
+    """
+    symbols = [s.strip().upper() for s in symbols if s and s.strip()]
+    if not symbols:
+        return {}
+    cutoff = _fresh_after() if max_age_hours is None else clock.time() - max_age_hours * 3600
+    out = {}
+    with _lock:
+        conn = _connect()
+        # SQLite caps bound parameters, so query in slices
+        for i in range(0, len(symbols), 500):
+            part = symbols[i:i + 500]
+            marks = ",".join("?" * len(part))
+            rows = conn.execute(
+                f"SELECT symbol, pe, sector_pe, slug, fetched_at FROM fundamentals "
+                f"WHERE source = ? AND fetched_at >= ? AND symbol IN ({marks})",
+                (source, cutoff, *part),
+            ).fetchall()
+            for sym, pe, sector_pe, slug, fetched_at in rows:
+                out[sym] = {"pe": pe, "sector_pe": sector_pe, "slug": slug, "fetched_at": fetched_at}
+    return out
+
+
+def store_fundamentals(symbol, pe, sector_pe, slug=None, source="nse"):
+    symbol = symbol.strip().upper()
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO fundamentals (symbol, source, pe, sector_pe, slug, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (symbol, source, pe, sector_pe, slug, clock.time()),
+        )
+        conn.commit()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Persistent symbol -> slug map (slugs don't change, so no TTL)
+# ──────────────────────────────────────────────────────────────────────────────
+def get_slug(symbol, source="tickertape"):
+    """Return (slug, ticker) for `symbol` or None if it was never resolved."""
+    symbol = symbol.strip().upper()
+    with _lock:
+        row = _connect().execute(
+            "SELECT slug, ticker FROM slugs WHERE symbol = ? AND source = ?", (symbol, source)
+        ).fetchone()
+    return tuple(row) if row else None
+
+
+def store_slug(symbol, slug, ticker=None, source="tickertape"):
+    symbol = symbol.strip().upper()
+    with _lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO slugs (symbol, source, slug, ticker) VALUES (?, ?, ?, ?)",
+            (symbol, source, slug, ticker),
+        )
+        conn.commit()
@@ -0,0 +1,107 @@
+import os
+import json
+import math
+import time
+import threading
+import logging
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Bar-close-to-alert tracing
+#
+# Every signal carries a Trace that is stamped as it moves through the
+# pipeline:
+#     bar_close -> fetched -> detected -> enqueued -> acked (Telegram 200)
+# Finished traces go to a ring buffer (for percentiles on the health server)
+# and, one JSON line each, to a size-rotated log file.
+# ──────────────────────────────────────────────────────────────────────────────
+STAGES = ("bar_close", "fetched", "detected", "enqueued", "acked")
+
+TRACE_LOG = os.getenv("SIGNAL_TRACE_LOG", "signal_traces.log")
+TRACE_LOG_BYTES = int(os.getenv("SIGNAL_TRACE_LOG_BYTES", str(5 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("SIGNAL_TRACE_LOG_BACKUPS", "3"))
+TRACE_WINDOW = int(os.getenv("SIGNAL_TRACE_WINDOW", "1000"))  # traces kept for percentiles
+
+
+class Trace:
+    def __init__(self, instrument, timeframe, pattern, bar_close=None, clock=time.time):
+        self.instrument = instrument
+        self.timeframe = timeframe
+        self.pattern = pattern
+        self._clock = clock
+        self.stamps = {}
+        if bar_close is not None:
+            self.stamps["bar_close"] = bar_close
+
+    def mark(self, stage, ts=None):
+        self.stamps[stage] = self._clock() if ts is None else ts
+        return self
+
+    def as_dict(self):
+        return {"instrument": self.instrument, "timeframe": self.timeframe,
+                "pattern": self.pattern, **self.stamps}
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Tracer:
+    def __init__(self, window=TRACE_WINDOW, log_path=TRACE_LOG, clock=time.time):
+        self.clock = clock
+        self._done = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.log = None
+        if log_path:
+            self.log = logging.getLogger(f"signal_trace.{os.path.abspath(log_path)}")
+            self.log.setLevel(logging.INFO)
+            self.log.propagate = False
+            if not self.log.handlers:
+                handler = RotatingFileHandler(log_path, maxBytes=TRACE_LOG_BYTES,
+                                              backupCount=TRACE_LOG_BACKUPS, encoding="utf-8",
+                                              delay=True)  # no file until the first trace
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self.log.addHandler(handler)
+
+    def start(self, instrument, timeframe, pattern, bar_close=None):
+        return Trace(instrument, timeframe, pattern, bar_close, clock=self.clock)
+
+    def on_finish(self, fn):
+        """fn(trace) is called for every finished trace (e.g. to feed a histogram)."""
+        self._listeners.append(fn)
+
+    def finish(self, trace):
+        with self._lock:
+            self._done.append(trace)
+        if self.log:
+            self.log.info(json.dumps(trace.as_dict()))
+        for fn in self._listeners:
+            try:
+                fn(trace)
+            except Exception as e:
+                print(f"trace listener error: {e}")
+
+    def summary(self, quantiles=(50, 90, 99)):
+        """
+        Percentiles (seconds) for each stage measured from bar close, plus the
+        stage-to-stage gaps, over the traces in the window.
+        """
+        with self._lock:
+            traces = list(self._done)
+        spans = {f"bar_close->{s}": ("bar_close", s) for s in STAGES[1:]}
+        spans.update({f"{a}->{b}": (a, b) for a, b in zip(STAGES[1:], STAGES[2:])})
+        out = {"count": len(traces), "spans": {}}
+        for name, (a, b) in spans.items():
+            vals = sorted(t.stamps[b] - t.stamps[a] for t in traces if a in t.stamps and b in t.stamps)
+            if not vals:
+                continue
+            entry = {f"p{q}": round(percentile(vals, q), 3) for q in quantiles}
+            entry.update(n=len(vals), max=round(vals[-1], 3))
+            out["spans"][name] = entry
+        return out
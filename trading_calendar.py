@@ -0,0 +1,165 @@
+import os
+import json
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+import clock
+
+try:
+    from zoneinfo import ZoneInfo  # Py3.9+
+except Exception:
+    ZoneInfo = None
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Trading calendar: when is a market open?
+#
+#   fx     : Sunday 17:00 -> Friday 17:00 New York (metals follow the FX week)
+#   crypto : 24/7
+#   nse    : 09:15-15:30 IST, Monday-Friday, minus exchange holidays
+#
+# Schedulers ask next_check() before sleeping so a monitor idles through the
+# weekend / overnight instead of waking every bar to fetch nothing new.
+# ──────────────────────────────────────────────────────────────────────────────
+NY_TZ = ZoneInfo("America/New_York") if ZoneInfo else timezone(timedelta(hours=-5))
+IST = ZoneInfo("Asia/Kolkata") if ZoneInfo else timezone(timedelta(hours=5, minutes=30))
+
+FX_ROLLOVER_HOUR = 17
+NSE_OPEN = (9, 15)
+NSE_CLOSE = (15, 30)
+
+CRYPTO_ASSETS = {"BTC", "ETH", "LTC", "BCH", "XRP", "SOL", "DOGE", "ADA", "DOT", "LINK", "AVAX", "MATIC"}
+CRYPTO_QUOTES = {"USDT", "USDC"}
+
+# NSE trading holidays (weekdays only). Extend or override with NSE_HOLIDAYS_FILE,
+# a JSON list of "YYYY-MM-DD" dates, when the exchange publishes a new year.
+NSE_HOLIDAYS_FILE = os.getenv("NSE_HOLIDAYS_FILE", "nse_holidays.json")
+NSE_HOLIDAYS = {
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18",
+    "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22",
+    "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14",
+    "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20",
+    "2026-11-10", "2026-11-24", "2026-12-25",
+}
+
+_holidays = None
+
+
+def nse_holidays():
+    """Set of NSE holiday dates (built-in table plus NSE_HOLIDAYS_FILE, loaded once)."""
+    global _holidays
+    if _holidays is None:
+        days = set(NSE_HOLIDAYS)
+        try:
+            with open(NSE_HOLIDAYS_FILE, "r", encoding="utf-8") as f:
+                days.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        _holidays = {date.fromisoformat(d) for d in days}
+    return _holidays
+
+
+def market_of(instrument):
+    """'nse' for NSE symbols (RELIANCE.NS, NSE:RELIANCE), 'crypto' for coins, else 'fx'."""
+    sym = instrument.upper()
+    if sym.endswith(".NS") or sym.startswith("NSE:"):
+        return "nse"
+    parts = sym.replace("/", "_").split("_")
+    if parts[0] in CRYPTO_ASSETS or parts[-1] in CRYPTO_QUOTES:
+        return "crypto"
+    return "fx"
+
+
+def _ts(ts):
+    if ts is None:
+        ts = clock.time()
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+def is_trading_day(market, day):
+    """Whether `day` (a date in the market's own timezone) has a session."""
+    if market == "crypto":
+        return True
+    if market == "nse":
+        return day.weekday() < 5 and day not in nse_holidays()
+    return day.weekday() < 5
+
+
+def is_open(market, ts=None):
+    """Whether `market` is trading at `ts` (epoch seconds or aware datetime; default now)."""
+    if market == "crypto":
+        return True
+    ts = _ts(ts)
+    if market == "nse":
+        wall = ts.astimezone(IST)
+        return (is_trading_day("nse", wall.date())
+                and dtime(*NSE_OPEN) <= wall.time() < dtime(*NSE_CLOSE))
+    wall = ts.astimezone(NY_TZ)
+    wd, hour = wall.weekday(), wall.hour
+    return not (wd == 5 or (wd == 4 and hour >= FX_ROLLOVER_HOUR) or (wd == 6 and hour < FX_ROLLOVER_HOUR))
+
+
+def next_open(market, ts=None):
+    """`ts` itself if the market is open, else the next session open (aware UTC datetime)."""
+    ts = _ts(ts)
+    if is_open(market, ts):
+        return ts
+    if market == "nse":
+        wall = ts.astimezone(IST)
+        day = wall.date()
+        for _ in range(366):
+            if is_trading_day("nse", day):
+                opens = datetime.combine(day, dtime(*NSE_OPEN), IST)
+                if opens > wall:
+                    return opens.astimezone(timezone.utc)
+            day += timedelta(days=1)
+        raise ValueError("no NSE session within a year; check the holiday table")
+    wall = ts.astimezone(NY_TZ)
+    sunday = wall.date() + timedelta(days=(6 - wall.weekday()) % 7)
+    opens = datetime.combine(sunday, dtime(FX_ROLLOVER_HOUR), NY_TZ)
+    if opens <= wall:
+        opens = datetime.combine(sunday + timedelta(days=7), dtime(FX_ROLLOVER_HOUR), NY_TZ)
+    return opens.astimezone(timezone.utc)
+
+
+def last_open(market, ts=None):
+    """Open of the session in progress at `ts`, or of the most recent one (aware UTC datetime)."""
+    ts = _ts(ts)
+    if market == "crypto":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if market == "nse":
+        wall = ts.astimezone(IST)
+        day = wall.date()
+        for _ in range(366):
+            if is_trading_day("nse", day):
+                opens = datetime.combine(day, dtime(*NSE_OPEN), IST)
+                if opens <= wall:
+                    return opens.astimezone(timezone.utc)
+            day -= timedelta(days=1)
+        raise ValueError("no NSE session within a year; check the holiday table")
+    wall = ts.astimezone(NY_TZ)
+    sunday = wall.date() - timedelta(days=(wall.weekday() + 1) % 7)
+    opens = datetime.combine(sunday, dtime(FX_ROLLOVER_HOUR), NY_TZ)
+    if opens > wall:
+        opens = datetime.combine(sunday - timedelta(days=7), dtime(FX_ROLLOVER_HOUR), NY_TZ)
+    return opens.astimezone(timezone.utc)
+
+
+def seconds_until_open(market, ts=None):
+    """0 while the market is open, else seconds until it reopens."""
+    ts = _ts(ts)
+    return (next_open(market, ts) - ts).total_seconds()
+
+
+def next_check(market, at, step):
+    """
+    Epoch time at which a bar-close check planned for `at` is worth running:
+    `at` itself if the market traded in the bar ending there, otherwise the
+    close of the first `step`-second bar after the next open.
+    """
+    if is_open(market, at - 1):
+        return at
+    return next_open(market, at).timestamp() + step
@@ -0,0 +1,159 @@
+import os
+import math
+from datetime import timezone
+
+import requests
+import pandas as pd
+from dotenv import load_dotenv
+
+import clock
+from ratelimit import TokenBucket
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Twelve Data fetch layer: batch symbol requests, token bucket, local bar cache
+# ──────────────────────────────────────────────────────────────────────────────
+load_dotenv()
+API_KEY = os.getenv("TWELVE_DATA_API_KEY")
+BASE_URL = "https://api.twelvedata.com"
+EXCHANGE = os.getenv("TWELVE_DATA_EXCHANGE", "")  # e.g. "NSE"; empty = as given
+
+# Plan limit (credits/minute). Every symbol in a batch costs one credit.
+RATE_PER_MIN = int(os.getenv("TWELVE_DATA_RATE", "8"))
+BATCH_SIZE = min(int(os.getenv("TWELVE_DATA_BATCH", str(RATE_PER_MIN))), RATE_PER_MIN)
+
+BAR_CACHE_DIR = os.getenv("BAR_CACHE_DIR", "bars_cache")
+# Bars are requested and cached in UTC (naive), so cache freshness can be checked
+# against the server clock whatever the exchange's timezone is
+BAR_TIMEZONE = "UTC"
+MAX_CACHE_BARS = 5000
+
+INTERVAL_SECONDS = {
+    "1min": 60, "5min": 300, "15min": 900, "30min": 1800, "45min": 2700,
+    "1h": 3600, "2h": 7200, "4h": 14400, "1day": 86400, "1week": 604800,
+}
+# Intervals built locally from a finer cached series instead of being fetched
+DERIVED = {"1week": "1day"}
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+
+bucket = TokenBucket(RATE_PER_MIN, per=60.0)
+
+
+def _cache_path(symbol, interval):
+    safe = symbol.replace("/", "_").replace(":", "_")
+    # exchange-local caches written before BAR_TIMEZONE live beside this one and are ignored
+    return os.path.join(BAR_CACHE_DIR, BAR_TIMEZONE.lower(), interval, f"{safe}.csv")
+
+
+def load_cached(symbol, interval):
+    path = _cache_path(symbol, interval)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, parse_dates=["datetime"])
+    return df if not df.empty else None
+
+
+def _save_cached(symbol, interval, df):
+    path = _cache_path(symbol, interval)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path + ".part", index=False)
+    os.replace(path + ".part", path)
+
+
+def _to_frame(values):
+    df = pd.DataFrame(values)
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    for col in OHLCV:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.sort_values("datetime").reset_index(drop=True)
+
+
+def _request_batch(symbols, interval, outputsize):
+    """One time_series call for up to BATCH_SIZE symbols. Returns {symbol: DataFrame}."""
+    bucket.acquire(len(symbols))
+    params = {
+        "symbol": ",".join(symbols),
+        "interval": interval,
+        "outputsize": outputsize,
+        "timezone": BAR_TIMEZONE,
+        "apikey": API_KEY,
+    }
+    if EXCHANGE:
+        params["exchange"] = EXCHANGE
+    data = requests.get(f"{BASE_URL}/time_series", params=params, timeout=30).json()
+
+    # Single-symbol responses are not keyed by symbol
+    per_symbol = {symbols[0]: data} if len(symbols) == 1 else data
+    out = {}
+    for sym in symbols:
+        payload = per_symbol.get(sym) or {}
+        if "values" in payload:
+            out[sym] = _to_frame(payload["values"])
+        else:
+            print(f"Failed to fetch {sym} {interval}: {payload.get('message', 'No data')}")
+    return out
+
+
+def _bars_needed(cached, interval, outputsize, now):
+    """How many bars to request so the cache is brought up to date (0 = nothing new yet)."""
+    if cached is None or len(cached) < outputsize:
+        return outputsize
+    step = INTERVAL_SECONDS.get(interval, 86400)
+    elapsed = (now - cached["datetime"].iloc[-1].to_pydatetime()).total_seconds()
+    if elapsed < step:
+        return 0
+    # +2: refresh the last (possibly partial) cached bar and cover rounding
+    return min(outputsize, int(math.ceil(elapsed / step)) + 2)
+
+
+def derive_weekly(daily):
+    """Weekly bars (Monday-labelled) built from daily bars."""
+    weekly = (
+        daily.set_index("datetime")
+        .resample("W-MON", label="left", closed="left")
+        .agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+        .dropna(subset=["open"])
+        .reset_index()
+    )
+    return weekly
+
+
+def get_bars(symbols, interval, outputsize=100, now=None):
+    """
+    {symbol: DataFrame} with at least `outputsize` bars where available.
+    Cached bars are reused; only bars newer than the cache are requested, grouped into
+    batch calls and paced by the token bucket. Derived intervals (1week) are built
+    locally from the cached base interval. `now` defaults to the clock; a naive
+    `now` is taken as UTC, like the cached bar times.
+    """
+    if interval in DERIVED:
+        base = DERIVED[interval]
+        step = INTERVAL_SECONDS[interval] // INTERVAL_SECONDS[base]
+        daily = get_bars(symbols, base, outputsize * step, now)
+        return {s: derive_weekly(df).tail(outputsize).reset_index(drop=True) for s, df in daily.items()}
+
+    now = now or clock.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)  # cached bar times are naive UTC
+    cached = {s: load_cached(s, interval) for s in symbols}
+
+    # Group symbols by how many bars they need so each batch shares one outputsize
+    need = {}
+    for s in symbols:
+        n = _bars_needed(cached[s], interval, outputsize, now)
+        if n:
+            need.setdefault(n, []).append(s)
+
+    for n, group in sorted(need.items()):
+        for i in range(0, len(group), BATCH_SIZE):
+            fetched = _request_batch(group[i:i + BATCH_SIZE], interval, n)
+            for s, new in fetched.items():
+                old = cached[s]
+                merged = new if old is None else pd.concat([old, new], ignore_index=True)
+                merged = (merged.drop_duplicates("datetime", keep="last")
+                          .sort_values("datetime").tail(MAX_CACHE_BARS).reset_index(drop=True))
+                _save_cached(s, interval, merged)
+                cached[s] = merged
+
+    return {s: df.tail(outputsize).reset_index(drop=True) for s, df in cached.items() if df is not None}
@@ -0,0 +1,235 @@
+import os
+import json
+import threading
+from collections import namedtuple
+
+import clock
+import instruments
+import resample
+
+try:
+    import yaml  # optional: only needed for .yaml/.yml watchlists
+except ImportError:
+    yaml = None
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Watchlist: what to monitor, on which timeframes, with which patterns,
+# thresholds and Telegram chat.
+#
+#   {
+#     "defaults": {"timeframes": ["M30"], "chat": "main"},
+#     "chats": {"main": "env:TELEGRAM_CHAT_ID", "metals": "-1001234567890"},
+#     "instruments": [
+#       "EUR_USD",
+#       {"instrument": "XAU_USD", "timeframes": ["H1"], "chat": "metals",
+#        "patterns": ["cpr_engulfing"], "thresholds": {"cpr_engulfing": {"atr_mult": 0.15}}},
+#       {"instrument": "GBP_JPY", "enabled": false}
+#     ]
+#   }
+#
+# Each bot passes its own pattern map (pattern -> accepted threshold names), so
+# unknown patterns or thresholds are rejected in every bot that reads the file.
+# The bots share the names engulfing / cpr_engulfing / body_breakout (recoverya.py
+# has no plain engulfing check). cpr_engulfing takes min_pips everywhere, plus
+# atr_mult (x daily ATR) in fxalert or range_mult (x yesterday's range, see
+# cpr.py) in forexnews, a.py and recoverya.py. "chat" routes alerts in every bot.
+# An entry without "patterns" runs the bot's default set.
+#
+# The file is polled for changes. A reload diffs the old and new job sets so
+# only added/removed instruments start or stop a worker; edits to an existing
+# entry are picked up by its worker on its next cycle. A bad file is reported
+# and ignored, a bad entry is dropped on its own.
+# ──────────────────────────────────────────────────────────────────────────────
+WATCHLIST_FILE = os.getenv("WATCHLIST_FILE",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlist.json"))
+WATCHLIST_POLL_SECONDS = int(os.getenv("WATCHLIST_POLL_SECONDS", "30"))
+
+Job = namedtuple("Job", "instrument timeframes patterns thresholds chat")
+
+
+class WatchlistError(ValueError):
+    pass
+
+
+def read(path=None):
+    path = path or WATCHLIST_FILE
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise WatchlistError("PyYAML is required for YAML watchlists")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _chat(ref, chats):
+    """Chat id for a chat name / literal id; 'env:VAR' reads the id from the environment."""
+    if ref is None:
+        return None
+    ref = chats.get(ref, ref)
+    if isinstance(ref, str) and ref.startswith("env:"):
+        return os.getenv(ref[4:]) or None
+    return str(ref)
+
+
+def _job(entry, defaults, chats, patterns, known, default_patterns=None):
+    name = str(entry.get("instrument") or "").upper()
+    if not name:
+        raise WatchlistError("missing 'instrument'")
+    if known and name not in known:
+        raise WatchlistError(f"{name} is not in the OANDA instrument list")
+
+    tfs = tuple(resample.canonical(tf) for tf in entry.get("timeframes", defaults.get("timeframes", ["M30"])))
+    bad = [tf for tf in tfs if tf not in resample.TF_SECONDS]
+    if not tfs or bad:
+        raise WatchlistError(f"{name}: unknown timeframes {bad or '(none given)'}")
+
+    fallback = default_patterns if default_patterns is not None else (patterns or ())
+    pats = tuple(entry.get("patterns", defaults.get("patterns", list(fallback))))
+    thresholds = {}
+    for src in (defaults.get("thresholds") or {}, entry.get("thresholds") or {}):
+        for pat, params in src.items():
+            thresholds.setdefault(pat, {}).update({k: float(v) for k, v in params.items()})
+    if patterns is not None:
+        bad = [p for p in set(pats) | set(thresholds) if p not in patterns]
+        if bad:
+            raise WatchlistError(f"{name}: unknown patterns {sorted(bad)}")
+        bad = [f"{p}.{k}" for p, params in thresholds.items() for k in params if k not in patterns[p]]
+        if bad:
+            raise WatchlistError(f"{name}: unknown thresholds {sorted(bad)}")
+
+    return Job(name, tfs, pats, thresholds, _chat(entry.get("chat", defaults.get("chat")), chats))
+
+
+def parse(doc, patterns=None, known=None, default_patterns=None):
+    """
+    ({instrument: Job}, [problems]) from a watchlist document.
+
+    `patterns` maps each pattern the caller implements to its accepted threshold
+    names (None skips pattern validation); `known` is the OANDA instrument
+    metadata, and instruments missing from it are rejected when it is non-empty.
+    `default_patterns` is used for entries without "patterns" (default: all of them).
+    """
+    if not isinstance(doc, dict) or not isinstance(doc.get("instruments"), list):
+        raise WatchlistError("watchlist needs an 'instruments' list")
+    defaults = doc.get("defaults") or {}
+    chats = doc.get("chats") or {}
+    jobs, problems = {}, []
+    for i, entry in enumerate(doc["instruments"]):
+        if isinstance(entry, str):
+            entry = {"instrument": entry}
+        if not isinstance(entry, dict):
+            problems.append(f"entry {i}: expected an object or instrument name")
+            continue
+        if entry.get("enabled", True) is False:
+            continue
+        try:
+            job = _job(entry, defaults, chats, patterns, known, default_patterns)
+        except (WatchlistError, TypeError, ValueError, AttributeError) as e:
+            problems.append(f"entry {i}: {e}")
+            continue
+        if job.instrument in jobs:
+            problems.append(f"entry {i}: duplicate {job.instrument}")
+            continue
+        jobs[job.instrument] = job
+    return jobs, problems
+
+
+def load(path=None, patterns=None, known=None, default_patterns=None):
+    """Jobs from the watchlist file; problems with single entries are printed and skipped."""
+    jobs, problems = parse(read(path), patterns, known, default_patterns)
+    for p in problems:
+        print(f"Watchlist: {p}")
+    return jobs
+
+
+def diff(old, new):
+    """(added, removed, changed) instrument names between two job dicts."""
+    added = sorted(new.keys() - old.keys())
+    removed = sorted(old.keys() - new.keys())
+    changed = sorted(k for k in new.keys() & old.keys() if new[k] != old[k])
+    return added, removed, changed
+
+
+class Runner:
+    """
+    Keeps one worker thread per watchlist instrument in step with the file.
+
+    target(instrument, timeframes, runner) runs a job; each cycle it reads the
+    current spec with runner.job(instrument) and returns once that is None.
+    `select(instrument)` restricts the runner to a subset (e.g. one shard);
+    after changing it call reload(force=True).
+    """
+
+    def __init__(self, target, patterns=None, path=None, known=instruments.metadata, select=None,
+                 default_patterns=None):
+        self.target = target
+        self.patterns = patterns
+        self.default_patterns = default_patterns
+        self.path = path or WATCHLIST_FILE
+        self.known = known
+        self.select = select
+        self.jobs = {}
+        self.problems = []
+        self._threads = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def job(self, instrument):
+        with self._lock:
+            job = self.jobs.get(instrument)
+            if job is None and self._threads.get(instrument) is threading.current_thread():
+                del self._threads[instrument]  # worker retires; a later re-add starts a fresh one
+            return job
+
+    def _start(self, instrument):
+        if instrument in self._threads:
+            return  # removed and re-added before its worker noticed
+        t = threading.Thread(target=self.target, args=(instrument, self.jobs[instrument].timeframes, self),
+                             name=f"watch-{instrument}", daemon=True)
+        self._threads[instrument] = t
+        t.start()
+
+    def reload(self, force=False):
+        """Apply the file if it changed; returns (added, removed, changed), or None if nothing was applied."""
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            print(f"Watchlist {self.path} unavailable: {e}")
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp and not force:
+            return None
+        self._stamp = stamp
+        try:
+            jobs, problems = parse(read(self.path), self.patterns, self.known() if self.known else None,
+                                   self.default_patterns)
+        except Exception as e:
+            print(f"Watchlist {self.path} not applied, keeping the previous one: {e}")
+            return None
+        for p in problems:
+            print(f"Watchlist: {p}")
+        if self.select is not None:
+            jobs = {k: v for k, v in jobs.items() if self.select(k)}
+        with self._lock:
+            added, removed, changed = diff(self.jobs, jobs)
+            self.jobs, self.problems = jobs, problems
+            for inst in added:
+                self._start(inst)
+        print(f"Watchlist: {len(jobs)} instruments "
+              f"(+{len(added)} -{len(removed)} ~{len(changed)})")
+        return added, removed, changed
+
+    def watch(self, poll=WATCHLIST_POLL_SECONDS):
+        """Poll the file forever (run in a daemon thread)."""
+        while True:
+            clock.sleep(poll)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Watchlist reload error: {e}")
+
+    def summary(self):
+        with self._lock:
+            jobs = {k: v._asdict() for k, v in self.jobs.items()}
+            return {"path": self.path, "instruments": len(jobs), "jobs": jobs,
+                    "problems": list(self.problems), "workers": len(self._threads)}